@@ -1,11 +1,10 @@
 from django.contrib import admin
-from django.contrib.sessions.models import Session
 from django.db.models import QuerySet
-from django.db.models.query_utils import Q
 from django.http import HttpRequest
 from django.utils import timezone
 
 from basket_app.models import Basket, BasketItem
+from basket_app.utils import SWEEP_BATCH_SIZE, sweep_anonymous_baskets
 from mainsite.main_logger import logger
 
 
@@ -18,25 +17,12 @@ def delete_anonim_basket_with_expired_sessions(
     request: HttpRequest,
     queryset: QuerySet,
 ):
-    expired_sessions_keys = Session.objects.filter(
-        expire_date__lt=timezone.now()
-    ).values_list("session_key", flat=True)
-    logger.debug("expired sessions keys: %s", expired_sessions_keys)
-
-    not_expired_keys = Session.objects.filter(
-        expire_date__gt=timezone.now()
-    ).values_list("session_key", flat=True)
-    logger.debug("not expired sessions keys: %s", not_expired_keys)
-
-    baskets = queryset.filter(user=None).filter(
-        Q(session_key__in=expired_sessions_keys) | ~Q(session_key__in=not_expired_keys)
-    )
-    logger.debug("basket with expired sessions: %s", baskets)
+    deleted = sum(sweep_anonymous_baskets(SWEEP_BATCH_SIZE, timezone.now(), queryset))
+    logger.debug("deleted baskets with expired sessions: %s", deleted)
     modeladmin.message_user(
         request,
-        message="Удалено {} корзин".format(baskets.count()),
+        message="Удалено {} корзин".format(deleted),
     )
-    baskets.delete()
 
 
 class BasketItemInline(admin.TabularInline):
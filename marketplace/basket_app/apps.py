@@ -5,3 +5,8 @@ class BasketAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "basket_app"
     verbose_name = "Корзина"
+
+    def ready(self) -> None:
+        """Подключение обработчиков сигналов"""
+
+        from basket_app import signals  # noqa: F401
@@ -0,0 +1,70 @@
+import time
+from typing import Iterator
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from basket_app.utils import (
+    SWEEP_BATCH_SIZE,
+    sweep_anonymous_baskets,
+    sweep_expired_sessions,
+)
+
+
+class Command(BaseCommand):
+    """
+    Команда удаления устаревших сессий и корзин неавторизованных пользователей
+
+    * сначала удаляются сессии с истекшим сроком действия, затем корзины
+      неавторизованных пользователей без действующей сессии
+    * удаление выполняется пачками ограниченного размера, по каждому этапу
+      выводится количество удаленных строк и скорость удаления
+    * предназначена для периодического запуска (cron, отдельный сервис)
+    """
+
+    help = "Delete expired sessions and anonymous baskets in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help="Number of rows (or basket ids) handled per statement",
+        )
+        parser.add_argument(
+            "--skip-sessions",
+            action="store_true",
+            help="Do not delete expired sessions",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive number")
+
+        self.verbosity: int = options["verbosity"]
+        now = timezone.now()
+        if not options["skip_sessions"]:
+            self.report("sessions", sweep_expired_sessions(batch_size, now))
+        self.report("anonymous baskets", sweep_anonymous_baskets(batch_size, now))
+
+    def report(self, name: str, batches: Iterator[int]) -> None:
+        """Выполнение этапа удаления и вывод его статистики"""
+
+        started = time.monotonic()
+        deleted = batches_count = 0
+        for batch_deleted in batches:
+            deleted += batch_deleted
+            batches_count += 1
+            if self.verbosity > 1:
+                self.stdout.write(
+                    f"{name}: batch {batches_count} deleted {batch_deleted}"
+                )
+        elapsed = time.monotonic() - started
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} {name} in {batches_count} batches, "
+                f"{elapsed:.2f} s ({rate:.0f} rows/s)"
+            )
+        )
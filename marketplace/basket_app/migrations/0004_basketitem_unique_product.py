@@ -0,0 +1,47 @@
+# Generated by Django 5.1.11 on 2026-10-17 06:56
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_basket_items(apps, schema_editor):
+    """
+    Объединение повторяющихся товаров в корзине перед созданием
+    ограничения уникальности: количество суммируется в первой записи
+    """
+
+    BasketItem = apps.get_model("basket_app", "BasketItem")
+    duplicates = (
+        BasketItem.objects.values("basket", "product")
+        .annotate(items_count=Count("pk"), first_id=Min("pk"), total=Sum("quantity"))
+        .filter(items_count__gt=1)
+    )
+    for duplicate in duplicates:
+        BasketItem.objects.filter(pk=duplicate["first_id"]).update(
+            quantity=duplicate["total"]
+        )
+        BasketItem.objects.filter(
+            basket=duplicate["basket"], product=duplicate["product"]
+        ).exclude(pk=duplicate["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "basket_app",
+            "0003_alter_basketitem_added_at_alter_basketitem_basket_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_basket_items, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="basketitem",
+            constraint=models.UniqueConstraint(
+                fields=("basket", "product"), name="unique_basket_product"
+            ),
+        ),
+    ]
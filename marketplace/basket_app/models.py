@@ -44,9 +44,13 @@ class Basket(models.Model):
         return sum([item.quantity for item in self.items.all()])
 
     def flush(self) -> None:
-        """Очистка корзины"""
-        for item in self.items.all():
-            item.delete()
+        """
+        Очистка корзины одним запросом DELETE
+
+        * у элементов корзины нет зависимых объектов и обработчиков
+          сигналов удаления, поэтому Django удаляет их без загрузки
+        """
+        self.items.all().delete()
 
     def __str__(self) -> str:
         if self.user:
@@ -60,6 +64,11 @@ class BasketItem(models.Model):
     class Meta:
         verbose_name = "Товары в корзине"
         verbose_name_plural = "Товары в корзинах"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["basket", "product"], name="unique_basket_product"
+            ),
+        ]
 
     basket = models.ForeignKey(
         Basket,
@@ -3,8 +3,8 @@ from drf_spectacular.utils import extend_schema_field
 
 from basket_app.models import BasketItem
 from mainsite.main_logger import logger
+from products_app.pricing import get_product_prices
 from products_app.serializers import ProductShortSerializer
-from products_app.models import SaleItems
 
 
 class BasketItemSerializer(serializers.ModelSerializer):
@@ -14,6 +14,10 @@ class BasketItemSerializer(serializers.ModelSerializer):
         model = BasketItem
         fields = ("id", "quantity", "product")
         depth = 1
+        # Связи, используемые полями 'SerializerMethodField'
+        prefetch_hints = {
+            "product": [("product", ProductShortSerializer)],
+        }
 
     product = serializers.SerializerMethodField(method_name="get_product")
 
@@ -24,16 +28,14 @@ class BasketItemSerializer(serializers.ModelSerializer):
         # Замена количества товаров на складе на количество товаров в корзине
         instance.product.count = instance.quantity
 
-        # Если товар участвует в распродаже к нему применяется скидка
-        sale_items = SaleItems.objects.select_related("product").filter(
-            product=instance.product
-        )
-        if sale_items.exists():
-            sale_price = min([item.salePrice for item in sale_items])
-            logger.debug("sale_price: %s", sale_price)
-
-            # Замена исходной цены товара на цену со скидкой по распродаже
-            instance.product.price = sale_price
+        # Замена исходной цены товара на цену с учетом скидки по распродаже
+        prices = self.context.get("prices")
+        if prices is None:
+            prices = get_product_prices([instance.product_id])
+        product_price = prices.get(instance.product_id)
+        if product_price is not None:
+            logger.debug("sale_price: %s", product_price.price)
+            instance.product.price = product_price.price
 
         serializer = ProductShortSerializer(instance.product)
         return serializer.data
@@ -44,3 +46,25 @@ class ProductAddOrDeleteSerializer(serializers.Serializer):
 
     id = serializers.IntegerField(min_value=1)
     count = serializers.IntegerField(min_value=1)
+
+
+class BasketOperationSerializer(serializers.Serializer):
+    """
+    Сериализатор операции пакетного изменения корзины
+
+    * add - добавление 'count' товаров, remove - удаление 'count' товаров,
+      set - установка количества товара ('count' = 0 удаляет товар)
+    """
+
+    OPERATIONS = ("add", "remove", "set")
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    id = serializers.IntegerField(min_value=1)
+    count = serializers.IntegerField(min_value=0)
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs["op"] != "set" and attrs["count"] < 1:
+            raise serializers.ValidationError(
+                {"count": "Ensure this value is greater than or equal to 1."}
+            )
+        return attrs
@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+from django.http import HttpRequest
+
+from basket_app.utils import move_anonymous_basket
+
+
+@receiver(user_logged_in)
+def move_anonymous_basket_on_login(
+    sender, request: HttpRequest | None, user: User, **kwargs
+) -> None:
+    """Перенос корзины неавторизованного пользователя при входе на сайт"""
+
+    if request is not None:
+        move_anonymous_basket(request, user)
@@ -0,0 +1,199 @@
+import uuid
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
+from django.utils.module_loading import import_string
+
+from basket_app.models import Basket, BasketItem
+from mainsite.main_logger import logger
+
+# Cookie с подписанным идентификатором корзины неавторизованного пользователя
+BASKET_COOKIE_NAME = "basket_id"
+BASKET_COOKIE_SALT = "basket_app.basket_id"
+BASKET_CACHE_KEY_PREFIX = "basket"
+
+DEFAULT_ANONYMOUS_STORE = "basket_app.stores.CacheBasketStore"
+DEFAULT_ANONYMOUS_MAX_AGE = 60 * 60 * 24 * 30
+
+
+class BaseBasketStore(ABC):
+    """
+    Хранилище корзины
+
+    * содержимое корзины - словарь {id товара: количество} в порядке
+      добавления товаров
+    * 'update_response' вызывается перед отправкой ответа, например
+      для установки cookie
+    """
+
+    def __init__(self, request: HttpRequest):
+        self.request = request
+
+    @abstractmethod
+    def get_items(self) -> dict[int, int]:
+        """Получение содержимого корзины"""
+
+    @abstractmethod
+    def save_items(self, items: dict[int, int]) -> None:
+        """Сохранение содержимого корзины"""
+
+    def clear(self) -> None:
+        """Очистка корзины"""
+
+        self.save_items({})
+
+    def lock(self) -> None:
+        """
+        Блокировка корзины до конца транзакции для изменения
+        по прочитанному содержимому
+        """
+
+    def update_response(self, response: HttpResponse) -> None:
+        """Изменение ответа после работы с корзиной"""
+
+
+class DatabaseBasketStore(BaseBasketStore):
+    """Корзина авторизованного пользователя в таблицах Basket и BasketItem"""
+
+    def __init__(self, request: HttpRequest, user=None):
+        super().__init__(request)
+        self.user = user or request.user
+        self._basket: Basket | None = None
+
+    def get_basket(self, create: bool = False) -> Basket | None:
+        """Получение корзины пользователя (создается только при изменении)"""
+
+        if self._basket is None:
+            if create:
+                self._basket, _ = Basket.objects.get_or_create(user=self.user)
+            else:
+                self._basket = Basket.objects.filter(user=self.user).first()
+        return self._basket
+
+    def get_items(self) -> dict[int, int]:
+        basket = self.get_basket()
+        if basket is None:
+            return {}
+        return dict(
+            basket.items.order_by("added_at", "pk").values_list(
+                "product_id", "quantity"
+            )
+        )
+
+    def lock(self) -> None:
+        """Блокировка строки корзины (корзина создается, если ее нет)"""
+
+        self._basket, _ = Basket.objects.select_for_update().get_or_create(
+            user=self.user
+        )
+
+    def save_items(self, items: dict[int, int]) -> None:
+        """
+        Сохранение изменившихся элементов корзины
+
+        * удаленные товары удаляются одним запросом DELETE, добавленные
+          и измененные сохраняются одним запросом INSERT ... ON CONFLICT
+          по паре (корзина, товар)
+        """
+
+        current_items = self.get_items()
+        if current_items == items:
+            return
+
+        with transaction.atomic():
+            basket = self.get_basket(create=True)
+            removed_ids = set(current_items) - set(items)
+            if removed_ids:
+                basket.items.filter(product_id__in=removed_ids).delete()
+
+            changed_items = [
+                BasketItem(basket=basket, product_id=product_id, quantity=quantity)
+                for product_id, quantity in items.items()
+                if current_items.get(product_id) != quantity
+            ]
+            if changed_items:
+                BasketItem.objects.bulk_create(
+                    changed_items,
+                    update_conflicts=True,
+                    unique_fields=["basket", "product"],
+                    update_fields=["quantity"],
+                )
+            basket.save(update_fields=["updated_at"])
+
+
+class CacheBasketStore(BaseBasketStore):
+    """
+    Корзина неавторизованного пользователя в кэше
+
+    * идентификатор корзины хранится в подписанном cookie и создается
+      только при первом изменении корзины, поэтому просмотр корзины
+      не создает ни сессий, ни записей в базе данных
+    """
+
+    def __init__(self, request: HttpRequest):
+        super().__init__(request)
+        self.max_age: int = getattr(
+            settings, "BASKET_ANONYMOUS_MAX_AGE", DEFAULT_ANONYMOUS_MAX_AGE
+        )
+        self.basket_id: str | None = request.get_signed_cookie(
+            BASKET_COOKIE_NAME,
+            default=None,
+            salt=BASKET_COOKIE_SALT,
+            max_age=self.max_age,
+        )
+        self.modified = False
+
+    def get_cache_key(self) -> str:
+        return f"{BASKET_CACHE_KEY_PREFIX}:{self.basket_id}"
+
+    def get_items(self) -> dict[int, int]:
+        if self.basket_id is None:
+            return {}
+        items = cache.get(self.get_cache_key(), [])
+        return {product_id: quantity for product_id, quantity in items}
+
+    def save_items(self, items: dict[int, int]) -> None:
+        if self.basket_id is None:
+            if not items:
+                return
+            self.basket_id = uuid.uuid4().hex
+            logger.debug("Anonymous basket %s created", self.basket_id)
+        cache.set(self.get_cache_key(), list(items.items()), timeout=self.max_age)
+        self.modified = True
+
+    def clear(self) -> None:
+        if self.basket_id is not None:
+            cache.delete(self.get_cache_key())
+
+    def update_response(self, response: HttpResponse) -> None:
+        """Продление срока действия cookie при изменении корзины"""
+
+        if self.modified:
+            response.set_signed_cookie(
+                BASKET_COOKIE_NAME,
+                self.basket_id,
+                salt=BASKET_COOKIE_SALT,
+                max_age=self.max_age,
+                httponly=True,
+                samesite="Lax",
+            )
+
+
+def get_anonymous_basket_store(request: HttpRequest) -> BaseBasketStore:
+    """Хранилище корзины неавторизованного пользователя из настроек"""
+
+    store_class = import_string(
+        getattr(settings, "BASKET_ANONYMOUS_STORE", DEFAULT_ANONYMOUS_STORE)
+    )
+    return store_class(request)
+
+
+def get_basket_store(request: HttpRequest) -> BaseBasketStore:
+    """Хранилище корзины текущего пользователя"""
+
+    if request.user.is_authenticated:
+        return DatabaseBasketStore(request)
+    return get_anonymous_basket_store(request)
@@ -1,3 +1,215 @@
+import datetime
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from basket_app.models import Basket, BasketItem
+from basket_app.stores import BASKET_COOKIE_NAME
+from products_app.models import Product
+
+
+class BasketTests(TestCase):
+    """Тесты корзины"""
+
+    fixtures = ["db_data_fixture.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.path = reverse("basket_app:basket")
+        self.products = list(Product.objects.all()[:2])
+
+    def change_basket(self, method: str, product: Product, count: int):
+        return getattr(self.client, method)(
+            path=self.path,
+            data={"id": product.pk, "count": count},
+            content_type="application/json",
+        )
+
+    def test_anonymous_basket_is_not_stored_in_database(self):
+        """Тест - корзина неавторизованного пользователя не пишет в базу данных"""
+
+        baskets_count = Basket.objects.count()
+        sessions_count = Session.objects.count()
+
+        response = self.client.get(path=self.path)
+        self.assertEqual(response.json(), [])
+
+        self.change_basket("post", self.products[0], 2)
+        response = self.change_basket("post", self.products[0], 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item["id"], item["count"]) for item in response.json()],
+            [(self.products[0].pk, 3)],
+        )
+
+        self.change_basket("post", self.products[1], 1)
+        response = self.change_basket("delete", self.products[1], 1)
+        self.assertEqual(response.json(), ["product deleted"])
+        response = self.change_basket("delete", self.products[1], 1)
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(path=self.path)
+        self.assertEqual(
+            [item["id"] for item in response.json()], [self.products[0].pk]
+        )
+        self.assertEqual(Basket.objects.count(), baskets_count)
+        self.assertEqual(Session.objects.count(), sessions_count)
+
+    def test_anonymous_basket_is_merged_on_login(self):
+        """
+        Тест - корзина неавторизованного пользователя объединяется
+        с корзиной пользователя при входе
+        """
+
+        first, second = self.products
+        Product.objects.filter(pk=first.pk).update(count=4)
+        Product.objects.filter(pk=second.pk).update(count=10)
+        user = User.objects.create_user(username="basket_user", password="password")
+        basket = Basket.objects.create(user=user)
+        BasketItem.objects.create(basket=basket, product=first, quantity=3)
+
+        self.change_basket("post", first, 2)
+        self.change_basket("post", second, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                path=reverse("auth_app:sign_in"),
+                data=json.dumps({"username": "basket_user", "password": "password"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+        # Количество суммируется и ограничивается остатком на складе
+        self.assertEqual(
+            list(basket.items.order_by("pk").values_list("product_id", "quantity")),
+            [(first.pk, 4), (second.pk, 1)],
+        )
+        response = self.client.get(path=self.path)
+        self.assertEqual(len(response.json()), 2)
+
+        # Корзина неавторизованного пользователя удалена
+        basket_cookie = self.client.cookies[BASKET_COOKIE_NAME]
+        self.client.logout()
+        self.client.cookies[BASKET_COOKIE_NAME] = basket_cookie
+        response = self.client.get(path=self.path)
+        self.assertEqual(response.json(), [])
+
+    def test_can_apply_batch_operations(self):
+        """Тест - пакетные операции применяются к корзине атомарно"""
+
+        user = User.objects.create_user(username="batch_user")
+        self.client.force_login(user)
+        path = reverse("basket_app:basket_batch")
+        first, second = self.products
+
+        response = self.client.post(
+            path=path,
+            data=[
+                {"op": "add", "id": first.pk, "count": 2},
+                {"op": "add", "id": second.pk, "count": 1},
+                {"op": "add", "id": first.pk, "count": 1},
+            ],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item["id"], item["count"]) for item in response.json()],
+            [(first.pk, 3), (second.pk, 1)],
+        )
+
+        response = self.client.post(
+            path=path,
+            data=[
+                {"op": "set", "id": first.pk, "count": 5},
+                {"op": "remove", "id": second.pk, "count": 1},
+            ],
+            content_type="application/json",
+        )
+        self.assertEqual(
+            [(item["id"], item["count"]) for item in response.json()],
+            [(first.pk, 5)],
+        )
+
+        # Ошибка в любой операции отменяет все изменения
+        missing_id = Product.objects.order_by("-pk").first().pk + 1
+        for operations, status_code in (
+            (
+                [
+                    {"op": "set", "id": first.pk, "count": 1},
+                    {"op": "add", "id": missing_id, "count": 1},
+                ],
+                404,
+            ),
+            (
+                [
+                    {"op": "set", "id": first.pk, "count": 1},
+                    {"op": "add", "id": first.pk, "count": 0},
+                ],
+                400,
+            ),
+        ):
+            with self.subTest(operations=operations):
+                response = self.client.post(
+                    path=path, data=operations, content_type="application/json"
+                )
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(
+                    list(user.basket.items.values_list("product_id", "quantity")),
+                    [(first.pk, 5)],
+                )
+
+    def test_basket_flush_is_single_query(self):
+        """Тест - очистка корзины выполняется одним запросом"""
+
+        basket = Basket.objects.create(user=User.objects.create_user("flush_user"))
+        BasketItem.objects.bulk_create(
+            [BasketItem(basket=basket, product=product) for product in self.products]
+        )
+        with self.assertNumQueries(1):
+            basket.flush()
+        self.assertFalse(basket.items.exists())
+
+    def test_sweep_removes_expired_sessions_and_baskets(self):
+        """Тест - команда удаляет устаревшие сессии и корзины анонимов пачками"""
+
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        Session.objects.bulk_create(
+            [
+                Session(session_key="live", session_data="", expire_date=now + day),
+                Session(session_key="expired", session_data="", expire_date=now - day),
+            ]
+        )
+        user_basket = Basket.objects.create(user=User.objects.create_user("sweep"))
+        live_basket = Basket.objects.create(session_key="live")
+        expired_baskets = Basket.objects.bulk_create(
+            [Basket(session_key="expired"), Basket(session_key=None)]
+            + [Basket(session_key=f"missing_{number}") for number in range(5)]
+        )
+        BasketItem.objects.create(basket=live_basket, product=self.products[0])
+        BasketItem.objects.create(basket=expired_baskets[0], product=self.products[0])
+        created_ids = [user_basket.pk, live_basket.pk] + [
+            basket.pk for basket in expired_baskets
+        ]
+
+        output = StringIO()
+        call_command("sweep_anonymous_baskets", batch_size=2, stdout=output)
 
-# Create your tests here.
+        self.assertEqual(
+            set(Basket.objects.filter(pk__in=created_ids).values_list("pk", flat=True)),
+            {user_basket.pk, live_basket.pk},
+        )
+        self.assertFalse(Basket.objects.filter(user=None).exclude(pk=live_basket.pk))
+        self.assertFalse(Session.objects.filter(expire_date__lt=now).exists())
+        self.assertTrue(Session.objects.filter(session_key="live").exists())
+        self.assertTrue(live_basket.items.exists())
+        self.assertFalse(
+            BasketItem.objects.filter(basket_id=expired_baskets[0].pk).exists()
+        )
+        self.assertIn("anonymous baskets in", output.getvalue())
@@ -1,10 +1,11 @@
 from django.urls import path
 
-from basket_app.views import BasketAPIView
+from basket_app.views import BasketAPIView, BasketBatchAPIView
 
 
 app_name = "basket_app"
 
 urlpatterns = [
     path("basket", BasketAPIView.as_view(), name="basket"),
+    path("basket/batch", BasketBatchAPIView.as_view(), name="basket_batch"),
 ]
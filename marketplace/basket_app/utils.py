@@ -1,36 +1,32 @@
+import datetime
+from typing import Iterator
+
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef, QuerySet
 from django.http.response import Http404
 from django.shortcuts import get_object_or_404
 
 from mainsite.handle_errors import handle_serializer_not_valid
 from mainsite.main_logger import logger
+from mainsite.prefetch import optimize_queryset
 from products_app.models import Product
+from products_app.pricing import get_product_prices
+from products_app.serializers import ProductShortSerializer
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.request import Request
 
-from basket_app.models import Basket
+from basket_app.models import Basket, BasketItem
 from basket_app.serializers import (
     BasketItemSerializer,
     ProductAddOrDeleteSerializer,
 )
+from basket_app.stores import DatabaseBasketStore, get_anonymous_basket_store
 
-
-def get_or_create_basket(request: Request) -> Basket:
-    """Получение или создание корзины"""
-
-    user: User = request.user
-    if user.is_authenticated:
-        basket, created = Basket.objects.get_or_create(user=user)
-    else:
-        if not request.session.session_key:
-            request.session.create()
-        session_key = request.session.session_key
-        basket, create = Basket.objects.get_or_create(
-            user=None,
-            session_key=session_key,
-        )
-    return basket
+# Размер пачки при удалении устаревших корзин и сессий
+SWEEP_BATCH_SIZE = 1000
 
 
 def get_product_and_product_quantity(
@@ -58,10 +54,155 @@ def get_product_and_product_quantity(
     return product, product_quantity
 
 
-def get_products_data_from_basket(basket: Basket) -> list[dict]:
-    """Получение списка данных о товарах в корзине"""
+def get_products_data_from_items(items: dict[int, int]) -> list[dict]:
+    """
+    Получение списка данных о товарах в корзине
+
+    * 'items' - содержимое корзины {id товара: количество}; данные
+      строятся по несохраненным элементам корзины, поэтому одинаково
+      работают для любого хранилища корзины
+    """
+
+    products = optimize_queryset(
+        Product.objects.filter(pk__in=items), ProductShortSerializer
+    ).in_bulk()
+    basket_items = [
+        BasketItem(product=products[product_id], quantity=quantity)
+        for product_id, quantity in items.items()
+        if product_id in products
+    ]
+    prices = get_product_prices(products)
+    serializer = BasketItemSerializer(
+        basket_items, many=True, context={"prices": prices}
+    )
+    products_data: list[dict] = [item["product"] for item in serializer.data]
+    return products_data
+
+
+def apply_basket_operations(
+    items: dict[int, int], operations: list[dict]
+) -> dict[int, int]:
+    """Применение операций пакетного изменения к содержимому корзины"""
+
+    items = dict(items)
+    for operation in operations:
+        product_id, count = operation["id"], operation["count"]
+        quantity = items.get(product_id, 0)
+        if operation["op"] == "add":
+            quantity += count
+        elif operation["op"] == "remove":
+            quantity -= count
+        else:
+            quantity = count
+
+        if quantity > 0:
+            items[product_id] = quantity
+        else:
+            items.pop(product_id, None)
+    return items
+
+
+def move_anonymous_basket(request: Request, user: User) -> None:
+    """
+    Перенос корзины неавторизованного пользователя в корзину пользователя
+
+    * количество товаров суммируется с корзиной пользователя и
+      ограничивается остатком товара на складе
+    * элементы корзины сохраняются одним запросом INSERT ... ON CONFLICT
+      по паре (корзина, товар) под блокировкой корзины пользователя
+    * корзина неавторизованного пользователя удаляется после фиксации
+      транзакции, поэтому при ошибке она не теряется
+    """
+
+    anonymous_store = get_anonymous_basket_store(request)
+    anonymous_items = anonymous_store.get_items()
+    if not anonymous_items:
+        return
+
+    with transaction.atomic():
+        store = DatabaseBasketStore(request, user)
+        store.lock()
+        basket = store.get_basket()
+        user_items = dict(
+            basket.items.filter(product_id__in=anonymous_items).values_list(
+                "product_id", "quantity"
+            )
+        )
+        stock = dict(
+            Product.objects.filter(pk__in=anonymous_items).values_list("pk", "count")
+        )
+
+        merged_items = []
+        for product_id, quantity in anonymous_items.items():
+            if product_id not in stock:
+                continue
+            quantity = min(user_items.get(product_id, 0) + quantity, stock[product_id])
+            if quantity > 0:
+                merged_items.append(
+                    BasketItem(basket=basket, product_id=product_id, quantity=quantity)
+                )
+        if merged_items:
+            BasketItem.objects.bulk_create(
+                merged_items,
+                update_conflicts=True,
+                unique_fields=["basket", "product"],
+                update_fields=["quantity"],
+            )
+            basket.save(update_fields=["updated_at"])
+        transaction.on_commit(anonymous_store.clear)
+
+    logger.debug(
+        "Anonymous basket merged to basket of user %s: %s items",
+        user.pk,
+        len(merged_items),
+    )
+
+
+def sweep_expired_sessions(batch_size: int, now: datetime.datetime) -> Iterator[int]:
+    """
+    Удаление сессий с истекшим сроком действия пачками
+
+    * каждая пачка - отдельный короткий запрос DELETE по первичным ключам,
+      выбранным по индексу 'expire_date'; возвращается количество
+      удаленных строк в каждой пачке
+    """
+
+    expired = Session.objects.filter(expire_date__lt=now).order_by("expire_date")
+    while True:
+        session_keys = list(expired.values_list("pk", flat=True)[:batch_size])
+        if not session_keys:
+            return
+        deleted, _ = Session.objects.filter(pk__in=session_keys).delete()
+        yield deleted
+
+
+def sweep_anonymous_baskets(
+    batch_size: int, now: datetime.datetime, baskets: QuerySet | None = None
+) -> Iterator[int]:
+    """
+    Удаление корзин неавторизованных пользователей без действующей сессии
+
+    * 'baskets' ограничивает проверяемые корзины (по умолчанию - все)
+    * корзины перебираются диапазонами 'id' по 'batch_size', наличие
+      действующей сессии проверяется подзапросом NOT EXISTS без загрузки
+      списков ключей сессий
+    * возвращается количество удаленных корзин в каждой пачке
+    """
+
+    if baskets is None:
+        baskets = Basket.objects.all()
+    anonymous_baskets = baskets.filter(user=None)
+    bounds = anonymous_baskets.aggregate(first_id=Min("pk"), last_id=Max("pk"))
+    if bounds["first_id"] is None:
+        return
 
-    basket_items = basket.items
-    serializer = BasketItemSerializer(basket_items, many=True)
-    products: list[dict] = [item["product"] for item in serializer.data]
-    return products
+    live_session = Session.objects.filter(
+        session_key=OuterRef("session_key"), expire_date__gte=now
+    )
+    for start in range(bounds["first_id"], bounds["last_id"] + 1, batch_size):
+        expired_baskets = anonymous_baskets.filter(
+            pk__gte=start, pk__lt=start + batch_size
+        ).filter(~Exists(live_session))
+        # Элементы корзин удаляются вместе с корзинами одним запросом на пачку
+        _, deleted = expired_baskets.delete()
+        yield deleted.get(Basket._meta.label, 0)
@@ -1,28 +1,36 @@
-from django.http.response import Http404
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from drf_spectacular.utils import (
     OpenApiResponse,
     extend_schema,
 )
+from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from basket_app.models import Basket, BasketItem
 from basket_app.serializers import (
+    BasketOperationSerializer,
     ProductAddOrDeleteSerializer,
 )
+from basket_app.stores import get_basket_store
 from basket_app.utils import (
-    get_or_create_basket,
+    apply_basket_operations,
     get_product_and_product_quantity,
-    get_products_data_from_basket,
+    get_products_data_from_items,
 )
+from mainsite.handle_errors import handle_serializer_not_valid
 from mainsite.main_logger import logger
+from products_app.models import Product
 from products_app.serializers import ProductShortSerializer
 
 
 class BasketAPIView(APIView):
-    """Представление корзины"""
+    """
+    Представление корзины
+
+    * корзина авторизованного пользователя хранится в базе данных,
+      неавторизованного - в хранилище из 'BASKET_ANONYMOUS_STORE'
+    """
 
     http_method_names = ["get", "post", "delete"]
 
@@ -42,8 +50,8 @@ class BasketAPIView(APIView):
     ) -> Response[list[ProductShortSerializer]]:
         """Получение сведений о товарах в корзине"""
 
-        basket = get_or_create_basket(request)
-        products_data: list[dict] = get_products_data_from_basket(basket)
+        store = get_basket_store(request)
+        products_data: list[dict] = get_products_data_from_items(store.get_items())
         logger.debug("Count product items in basket: %s", len(products_data))
         return Response(products_data, 200)
 
@@ -64,19 +72,15 @@ class BasketAPIView(APIView):
     ) -> Response[list[ProductShortSerializer]]:
         """Добавление товара в корзину"""
 
-        basket: Basket = get_or_create_basket(request)
-        product, product_quantity = get_product_and_product_quantity(request)
+        store = get_basket_store(request)
+        result = get_product_and_product_quantity(request)
+        if isinstance(result, Response):
+            return result
+        product, product_quantity = result
 
-        basket_item, created = BasketItem.objects.get_or_create(
-            basket=basket,
-            product=product,
-        )
-        if created:
-            basket_item.quantity = product_quantity
-        else:
-            basket_item.quantity += product_quantity
-        basket_item.save()
-        basket.save(update_fields=["updated_at"])
+        items = store.get_items()
+        items[product.pk] = items.get(product.pk, 0) + product_quantity
+        store.save_items(items)
         logger.debug(
             "added %s product%s '%s' to basket",
             product_quantity,
@@ -84,8 +88,10 @@ class BasketAPIView(APIView):
             product,
         )
 
-        products_data: list[dict] = get_products_data_from_basket(basket)
-        return Response(products_data, 200)
+        products_data: list[dict] = get_products_data_from_items(items)
+        response = Response(products_data, 200)
+        store.update_response(response)
+        return response
 
     @extend_schema(
         tags=["basket"],
@@ -102,23 +108,25 @@ class BasketAPIView(APIView):
     def delete(self, request: Request, *args, **kwargs) -> Response[list[str]]:
         """Удаление товара из корзины"""
 
-        basket: Basket = get_or_create_basket(request)
-        product, product_quantity = get_product_and_product_quantity(request)
+        store = get_basket_store(request)
+        result = get_product_and_product_quantity(request)
+        if isinstance(result, Response):
+            return result
+        product, product_quantity = result
 
-        try:
-            basket_item = get_object_or_404(BasketItem, basket=basket, product=product)
-            logger.debug("basket item: %s", basket_item)
-        except Http404 as exc:
+        items = store.get_items()
+        if product.pk not in items:
             logger.error("basket item not found")
-            return Response(exc.args[0], status=404)
+            return Response("No BasketItem matches the given query.", status=404)
 
-        if basket_item.quantity <= product_quantity:
-            basket_item.delete()
+        if items[product.pk] <= product_quantity:
+            del items[product.pk]
+            store.save_items(items)
             logger.debug("deleted product '%s' from basket", product)
-            return Response(data=["product deleted"], status=200)
+            response = Response(data=["product deleted"], status=200)
         else:
-            basket_item.quantity -= product_quantity
-            basket_item.save()
+            items[product.pk] -= product_quantity
+            store.save_items(items)
             logger.debug(
                 "deleted %s product%s '%s' from basket",
                 product_quantity,
@@ -126,5 +134,62 @@ class BasketAPIView(APIView):
                 product,
             )
 
-            products_data: list[dict] = get_products_data_from_basket(basket)
-            return Response(products_data, 200)
+            products_data: list[dict] = get_products_data_from_items(items)
+            response = Response(products_data, 200)
+        store.update_response(response)
+        return response
+
+
+class BasketBatchAPIView(APIView):
+    """
+    Представление пакетного изменения корзины
+
+    * все операции применяются в одной транзакции, корзина сохраняется
+      и сериализуется один раз
+    """
+
+    http_method_names = ["post"]
+
+    @extend_schema(
+        tags=["basket"],
+        summary="Apply several changes to basket",
+        description="Apply add/remove/set operations to basket atomically",
+        request=BasketOperationSerializer(many=True),
+        responses={
+            200: OpenApiResponse(
+                description="successful operation",
+                response=ProductShortSerializer(many=True),
+            )
+        },
+    )
+    def post(
+        self, request: Request, *args, **kwargs
+    ) -> Response[list[ProductShortSerializer]]:
+        """Применение операций к корзине"""
+
+        serializer = BasketOperationSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return handle_serializer_not_valid(serializer)
+        operations: list[dict] = serializer.validated_data
+
+        product_ids = {operation["id"] for operation in operations}
+        missing_ids = product_ids - set(
+            Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True)
+        )
+        if missing_ids:
+            logger.error("Products %s not found", sorted(missing_ids))
+            return Response(
+                {"id": [f"Product {pk} not found" for pk in sorted(missing_ids)]},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        store = get_basket_store(request)
+        with transaction.atomic():
+            store.lock()
+            items = apply_basket_operations(store.get_items(), operations)
+            store.save_items(items)
+        logger.debug("Applied %s operations to basket", len(operations))
+
+        response = Response(get_products_data_from_items(items), 200)
+        store.update_response(response)
+        return response
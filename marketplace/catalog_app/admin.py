@@ -1,16 +1,25 @@
-from django.contrib import admin
+import time
+from typing import Iterator
+
+from django.contrib import admin, messages
 from django.contrib.admin.decorators import action
 from django.core.paginator import Paginator
 from django.http import HttpResponseRedirect, HttpResponse
 from django.http.request import HttpRequest
 from django.shortcuts import redirect, render
+from django.template.response import TemplateResponse
 from django.urls import path
 from django import forms
 from django.db import models
 
 from catalog_app.forms import CSVImportForm, JsonImportForm
 from catalog_app.models import Category, CategoryImage
-from catalog_app.utils import save_csv_categories, save_json_categories
+from catalog_app.utils import (
+    ImportBatch,
+    save_csv_categories,
+    save_json_categories,
+)
+from mainsite.cache_utils import invalidate_model_cache
 from products_app.models import Product
 
 
@@ -36,6 +45,8 @@ def set_favorite(modeladmin, request, queryset) -> None:
     """Действие в админке для добавления категорий в избранные"""
 
     queryset.update(favorite=True)
+    # UPDATE не вызывает сигналов, версию категорий для кэша меняем явно
+    invalidate_model_cache(Category)
 
 
 @action(description="Убрать из избранных")
@@ -43,6 +54,8 @@ def unset_favorite(modeladmin, request, queryset) -> None:
     """Действие в админке для удаления категорий из избранных"""
 
     queryset.update(favorite=False)
+    # UPDATE не вызывает сигналов, версию категорий для кэша меняем явно
+    invalidate_model_cache(Category)
 
 
 @admin.register(Category)
@@ -73,19 +86,11 @@ class CategoryAdmin(admin.ModelAdmin):
                 context = {"form": form}
                 return render(request, "admin/csv_form.html", context, status=400)
 
-            result = save_csv_categories(
+            batches = save_csv_categories(
                 file=form.files["csv_file"].file,
-                encoding=request.encoding,
+                encoding=request.encoding or "utf-8",
             )
-            if not result:
-                self.message_user(
-                    request,
-                    f"Successfully imported {len(result)} entries from CSV.",
-                )
-            else:
-                self.message_user(request, "New entries not found.")
-
-            return redirect("..")
+            return self.report_import(request, batches, "CSV")
 
     def import_json(self, request: HttpRequest) -> HttpResponse | HttpResponseRedirect:
         """Метод импорта категорий из JSON файла"""
@@ -100,20 +105,60 @@ class CategoryAdmin(admin.ModelAdmin):
                 context = {"form": form}
                 return render(request, "admin/json_form.html", context, status=400)
 
-            result = save_json_categories(
+            batches = save_json_categories(
                 file=form.files["json_file"].file,
-                encoding=request.encoding,
+                encoding=request.encoding or "utf-8",
             )
-            if result:
-                self.message_user(
-                    request,
-                    f"Successfully imported {len(result)} entries from JSON.",
-                )
-            else:
-                self.message_user(request, "New entries not found.")
+            return self.report_import(request, batches, "JSON")
 
         return redirect("..")
 
+    def report_import(
+        self, request: HttpRequest, batches: Iterator[ImportBatch], source: str
+    ) -> HttpResponse:
+        """
+        Выполнение импорта и отчет о нем
+
+        * выводится количество строк, созданных категорий и скорость
+          обработки для каждой пачки и для файла в целом
+        * при ошибке в файле уже обработанные пачки остаются сохраненными
+        """
+
+        results: list[ImportBatch] = []
+        started = time.monotonic()
+        try:
+            for batch in batches:
+                results.append(batch)
+        except (ValueError, KeyError) as exc:
+            self.message_user(
+                request,
+                f"Import from {source} stopped after {len(results)} batches: {exc!r}",
+                level=messages.ERROR,
+            )
+        elapsed = time.monotonic() - started
+
+        rows = sum(batch.rows for batch in results)
+        created = sum(batch.created for batch in results)
+        if created:
+            self.message_user(
+                request,
+                f"Successfully imported {created} entries from {source}.",
+            )
+        else:
+            self.message_user(request, "New entries not found.")
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": f"Import from {source}",
+            "opts": self.model._meta,
+            "batches": results,
+            "rows": rows,
+            "created": created,
+            "elapsed": elapsed,
+            "rate": rows / elapsed if elapsed else 0,
+        }
+        return TemplateResponse(request, "admin/import_report.html", context)
+
     def get_urls(self) -> list:
         """Обновление urls с учетом добавления методов import_csv и import_json"""
 
@@ -5,3 +5,8 @@ class CatalogAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "catalog_app"
     verbose_name = "Категории товаров"
+
+    def ready(self) -> None:
+        """Подключение обработчиков сигналов"""
+
+        from catalog_app import signals  # noqa: F401
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.11 on 2026-10-17 06:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_category_closure(apps, schema_editor):
+    """Заполнение таблицы замыканий по существующему дереву категорий"""
+
+    Category = apps.get_model("catalog_app", "Category")
+    CategoryClosure = apps.get_model("catalog_app", "CategoryClosure")
+
+    parents = dict(Category.objects.values_list("pk", "parent_id"))
+    links = []
+    for category_id in parents:
+        ancestor_id, depth, visited = category_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in visited:
+            visited.add(ancestor_id)
+            links.append(
+                CategoryClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=category_id,
+                    depth=depth,
+                )
+            )
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    CategoryClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog_app", "0003_category_available_alter_category_favorite_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "depth",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Глубина вложенности"
+                    ),
+                ),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="catalog_app.category",
+                        verbose_name="Категория-предок",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="catalog_app.category",
+                        verbose_name="Категория-потомок",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Связь категорий",
+                "verbose_name_plural": "Связи категорий",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ancestor", "descendant"),
+                        name="unique_category_closure",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            fill_category_closure,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
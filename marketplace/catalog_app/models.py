@@ -1,6 +1,8 @@
-from typing import Any
+from collections import defaultdict
+from typing import Any, Iterable
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 
 
 def category_image_path(instance: "CategoryImage", filename: str) -> str:
@@ -82,6 +84,27 @@ class Category(models.Model):
         verbose_name="Доступна",
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values) -> "Category":
+        """Запоминаем загруженного из базы родителя для обновления дерева категорий"""
+
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_parent_id = dict(zip(field_names, values)).get("parent_id")
+        return instance
+
+    def clean(self) -> None:
+        """Проверка, что категория не становится потомком самой себя"""
+
+        super().clean()
+        if self.pk is None or self.parent_id is None:
+            return
+        if CategoryClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=self.parent_id
+        ).exists():
+            raise ValidationError(
+                {"parent": "Category cannot be nested into itself or its subcategory"}
+            )
+
     def delete(self, *args: Any, **kwargs: Any) -> None:
         """Вместо удаления помечаем как недоступный"""
 
@@ -90,3 +113,154 @@ class Category(models.Model):
 
     def __str__(self) -> str:
         return f"{self.title}"
+
+
+class CategoryClosureManager(models.Manager):
+    """Менеджер таблицы замыканий дерева категорий"""
+
+    def descendant_ids(self, category_id: int) -> models.QuerySet:
+        """
+        Подзапрос идентификаторов категории и всех её подкатегорий
+        на любой глубине
+        """
+
+        return self.filter(ancestor_id=category_id).values("descendant_id")
+
+    def link_categories(self, categories: Iterable[Category]) -> None:
+        """
+        Инкрементальное обновление дерева для созданных или перемещенных категорий
+
+        * категории обрабатываются в переданном порядке, поэтому родительские
+          категории должны идти раньше дочерних
+        """
+
+        for category in categories:
+            self.move_subtree(category.pk, category.parent_id)
+
+    def link_new_categories(self, categories: Iterable[Category]) -> None:
+        """
+        Добавление в дерево новых категорий без подкатегорий
+
+        * родительские категории должны идти раньше дочерних
+        * связи существующих родителей с предками выбираются одним запросом,
+          связи всех новых категорий создаются одним запросом
+        """
+
+        categories = list(categories)
+        new_ids = {category.pk for category in categories}
+        ancestors: dict[int, list[tuple[int, int]]] = defaultdict(list)
+        for ancestor_id, descendant_id, depth in self.filter(
+            descendant_id__in={
+                category.parent_id
+                for category in categories
+                if category.parent_id is not None and category.parent_id not in new_ids
+            }
+        ).values_list("ancestor_id", "descendant_id", "depth"):
+            ancestors[descendant_id].append((ancestor_id, depth))
+
+        links = []
+        for category in categories:
+            category_ancestors = [(category.pk, 0)]
+            if category.parent_id is not None:
+                category_ancestors.extend(
+                    (ancestor_id, depth + 1)
+                    for ancestor_id, depth in ancestors[category.parent_id]
+                )
+            ancestors[category.pk] = category_ancestors
+            links.extend(
+                self.model(
+                    ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth
+                )
+                for ancestor_id, depth in category_ancestors
+            )
+        self.bulk_create(links)
+
+    def move_subtree(self, category_id: int, parent_id: int | None) -> None:
+        """
+        Привязка поддерева категории к новому родителю
+
+        * удаляются связи поддерева со старыми предками
+        * добавляются связи каждого узла поддерева со всеми новыми предками
+        * все изменения выполняются в одной транзакции, чтобы поддерево
+          не осталось отвязанным при ошибке
+        """
+
+        with transaction.atomic():
+            self.bulk_create(
+                [
+                    self.model(
+                        ancestor_id=category_id, descendant_id=category_id, depth=0
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+            subtree = list(
+                self.filter(ancestor_id=category_id).values_list(
+                    "descendant_id", "depth"
+                )
+            )
+            subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+            self.filter(descendant_id__in=subtree_ids).exclude(
+                ancestor_id__in=subtree_ids
+            ).delete()
+
+            if parent_id is None:
+                return
+
+            ancestors = self.filter(descendant_id=parent_id).values_list(
+                "ancestor_id", "depth"
+            )
+            self.bulk_create(
+                [
+                    self.model(
+                        ancestor_id=ancestor_id,
+                        descendant_id=descendant_id,
+                        depth=ancestor_depth + 1 + descendant_depth,
+                    )
+                    for ancestor_id, ancestor_depth in ancestors
+                    for descendant_id, descendant_depth in subtree
+                ]
+            )
+
+
+class CategoryClosure(models.Model):
+    """
+    Модель таблицы замыканий дерева категорий
+
+    * для каждой категории хранятся связи со всеми её предками и с собой
+      (depth = 0), что позволяет выбрать все подкатегории на любой глубине
+      одним запросом
+    """
+
+    class Meta:
+        verbose_name = "Связь категорий"
+        verbose_name_plural = "Связи категорий"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"],
+                name="unique_category_closure",
+            ),
+        ]
+
+    ancestor = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="descendant_links",
+        verbose_name="Категория-предок",
+    )
+    descendant = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="ancestor_links",
+        verbose_name="Категория-потомок",
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Глубина вложенности",
+    )
+
+    objects = CategoryClosureManager()
+
+    def __str__(self) -> str:
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from catalog_app.models import Category, CategoryClosure
+
+
+@receiver(post_save, sender=Category)
+def update_category_tree(
+    sender, instance: Category, created: bool, raw: bool, **kwargs
+) -> None:
+    """Обновление дерева категорий при создании или перемещении категории"""
+
+    if raw:
+        return
+
+    loaded_parent_id = getattr(instance, "_loaded_parent_id", None)
+    if created or loaded_parent_id != instance.parent_id:
+        CategoryClosure.objects.move_subtree(instance.pk, instance.parent_id)
+    instance._loaded_parent_id = instance.parent_id
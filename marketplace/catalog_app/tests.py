@@ -1,3 +1,192 @@
+import json
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.urls import reverse
+
+from catalog_app.models import Category, CategoryClosure
+from catalog_app.utils import (
+    JsonStreamReader,
+    iter_json_object_items,
+    save_csv_categories,
+)
+from products_app.models import Product
+
+
+class CategoryTreeTests(TestCase):
+    """Тесты дерева категорий"""
+
+    fixtures = ["db_data_fixture.json"]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_catalog_ids(self, category: Category) -> set[int]:
+        """Получение id товаров каталога, отфильтрованных по категории"""
+
+        response = self.client.get(
+            path=reverse("products_app:products_short_list"),
+            query_params={"filter[category]": category.pk, "limit": 100},
+        )
+        self.assertEqual(response.status_code, 200)
+        return {item["id"] for item in response.json()["items"]}
+
+    def test_can_filter_products_by_category_at_any_depth(self):
+        """Тест - фильтр по категории включает товары всех подкатегорий"""
+
+        root = Category.objects.create(title="Корневая категория")
+        middle = Category.objects.create(title="Средняя категория", parent=root)
+        leaf = Category.objects.create(title="Вложенная категория", parent=middle)
+        product = Product.objects.create(category=leaf, price=100, title="Товар")
+
+        self.assertEqual(self.get_catalog_ids(root), {product.pk})
+        self.assertEqual(self.get_catalog_ids(middle), {product.pk})
+        self.assertEqual(self.get_catalog_ids(leaf), {product.pk})
+
+    def test_tree_is_updated_when_category_is_moved(self):
+        """Тест - при перемещении категории обновляются связи всего поддерева"""
+
+        old_root = Category.objects.create(title="Старая категория")
+        new_root = Category.objects.create(title="Новая категория")
+        middle = Category.objects.create(title="Средняя категория", parent=old_root)
+        leaf = Category.objects.create(title="Вложенная категория", parent=middle)
+
+        middle = Category.objects.get(pk=middle.pk)
+        middle.parent = new_root
+        middle.save()
+
+        ancestors = set(
+            CategoryClosure.objects.filter(descendant=leaf).values_list(
+                "ancestor_id", "depth"
+            )
+        )
+        self.assertEqual(ancestors, {(leaf.pk, 0), (middle.pk, 1), (new_root.pk, 2)})
+
+    def test_fixture_tree_matches_categories(self):
+        """Тест - подкатегории из дерева совпадают с прямыми подкатегориями"""
+
+        for category in Category.objects.filter(parent__isnull=True):
+            descendant_ids = set(
+                CategoryClosure.objects.filter(ancestor=category, depth=1).values_list(
+                    "descendant_id", flat=True
+                )
+            )
+            subcategory_ids = set(category.subcategories.values_list("pk", flat=True))
+            self.assertEqual(descendant_ids, subcategory_ids)
+
+
+class CategoryImportTests(TestCase):
+    """Тесты импорта категорий"""
+
+    fixtures = ["db_data_fixture.json"]
+
+    def test_csv_import_creates_categories_in_batches(self):
+        """Тест - импорт CSV создает отсутствующие категории и дерево пачками"""
+
+        existing = Category.objects.filter(parent__isnull=True).first()
+        content = "\n".join(
+            [
+                "title;parent",
+                f"Импорт 1;{existing.title}",
+                "Импорт 2;Новый раздел",
+                "Импорт 3;Импорт 2",
+                f"{existing.title};Импорт 1",
+                "Импорт 1;Новый раздел",
+                "Импорт 4;",
+            ]
+        )
+
+        batches = list(
+            save_csv_categories(BytesIO(content.encode()), "utf-8", batch_size=3)
+        )
+
+        self.assertEqual([batch.rows for batch in batches], [3, 3])
+        self.assertEqual([batch.created for batch in batches], [4, 1])
+        categories = {
+            category.title: category
+            for category in Category.objects.filter(
+                title__in=[
+                    "Импорт 1",
+                    "Импорт 2",
+                    "Импорт 3",
+                    "Импорт 4",
+                    "Новый раздел",
+                ]
+            )
+        }
+        self.assertEqual(categories["Импорт 1"].parent_id, existing.pk)
+        self.assertIsNone(categories["Новый раздел"].parent_id)
+        self.assertIsNone(categories["Импорт 4"].parent_id)
+        self.assertIsNone(Category.objects.get(pk=existing.pk).parent_id)
+        self.assertEqual(
+            set(
+                CategoryClosure.objects.filter(
+                    descendant=categories["Импорт 3"]
+                ).values_list("ancestor_id", "depth")
+            ),
+            {
+                (categories["Импорт 3"].pk, 0),
+                (categories["Импорт 2"].pk, 1),
+                (categories["Новый раздел"].pk, 2),
+            },
+        )
+
+    def test_json_is_parsed_incrementally(self):
+        """Тест - JSON файл читается по частям с тем же результатом"""
+
+        data = {
+            "Раздел": ["Подраздел 1", "Подраздел, 2"],
+            "Пустой раздел": [],
+            'Раздел "3"': ["Подраздел 3"],
+        }
+        content = json.dumps(data, ensure_ascii=False, indent=2)
+
+        items = list(iter_json_object_items(StringIO(content), chunk_size=5))
+
+        self.assertEqual(dict(items), data)
+
+    def test_json_arrays_are_streamed_by_element(self):
+        """
+        Тест - подкатегории читаются по одной: буфер не растет вместе
+        с массивом, числа на границе фрагментов не обрезаются
+        """
+
+        sub_categories = [f"Подраздел {number}" for number in range(1000)]
+        content = json.dumps({"Раздел": sub_categories}, ensure_ascii=False)
+        reader = JsonStreamReader(StringIO(content), chunk_size=16)
+
+        pairs, max_buffer = [], 0
+        for category in reader.iter_object_keys():
+            for sub_category in reader.iter_array():
+                pairs.append((sub_category, category))
+                max_buffer = max(max_buffer, len(reader.buffer))
+
+        self.assertEqual(pairs, [(title, "Раздел") for title in sub_categories])
+        self.assertLess(max_buffer, 100)
+        self.assertEqual(
+            list(JsonStreamReader(StringIO("[12345, 678]"), chunk_size=2).iter_array()),
+            [12345, 678],
+        )
+
+    def test_admin_json_import_reports_batches(self):
+        """Тест - импорт JSON из админки выводит отчет по пачкам"""
+
+        admin = User.objects.create_superuser("import_admin")
+        self.client.force_login(admin)
+        content = json.dumps({"Раздел импорта": ["Подраздел импорта"]})
+        upload = SimpleUploadedFile("categories.json", content.encode())
+
+        response = self.client.post(
+            reverse("admin:import_categories_json"), {"json_file": upload}
+        )
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["batches"]), 1)
+        self.assertContains(response, "Successfully imported 2 entries from JSON.")
+        self.assertEqual(
+            Category.objects.get(title="Подраздел импорта").parent.title,
+            "Раздел импорта",
+        )
@@ -1,67 +1,272 @@
 import json
+import time
 from csv import DictReader
 from io import TextIOWrapper
+from itertools import islice
+from typing import Any, Iterable, Iterator, NamedTuple
 
-from catalog_app.models import Category
+from django.db import transaction
 
+from catalog_app.models import Category, CategoryClosure
+from mainsite.cache_utils import invalidate_model_cache
+from mainsite.main_logger import logger
 
-def is_category_exists(title: str) -> bool:
-    """Проверка существования категории в базе данных"""
+# Количество строк файла, обрабатываемых одной пачкой
+IMPORT_BATCH_SIZE = 500
+# Размер фрагмента JSON файла, читаемого за один раз (в символах)
+JSON_READ_CHUNK_SIZE = 64 * 1024
 
-    category = Category.objects.filter(title=title).first()
-    return category is not None
 
+class ImportBatch(NamedTuple):
+    """Результат обработки пачки строк файла"""
 
-def save_csv_categories(file, encoding) -> list[Category | None]:
+    number: int
+    rows: int
+    created: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """Скорость обработки (строк в секунду)"""
+
+        return self.rows / self.elapsed if self.elapsed else 0
+
+
+def iter_csv_categories(file, encoding) -> Iterator[tuple[str, str | None]]:
+    """Построчное чтение пар (категория, родительская категория) из CSV файла"""
+
+    csv_file = TextIOWrapper(buffer=file, encoding=encoding)
+    for row in DictReader(csv_file, delimiter=";"):
+        yield row["title"], row.get("parent") or None
+
+
+class JsonStreamReader:
     """
-    Функция извлекает данные из CSV файла и создает категории,
-    если они не существуют в базе данных
+    Последовательное чтение JSON из текстового файла фрагментами
+
+    * объекты и массивы верхних уровней читаются по элементам через
+      'iter_object_keys' и 'iter_array', в памяти хранится только
+      текущий элемент
+    * если элемент не помещается в буфер, размер читаемого фрагмента
+      удваивается, поэтому элемент длиной n символов разбирается за O(n)
+      и занимает в памяти не более ~3n символов
     """
 
-    csv_file = TextIOWrapper(
-        buffer=file,
-        encoding=encoding,
-    )
-    reader = DictReader(csv_file, delimiter=";")
-
-    created_categories = []
-    for row in reader:
-        title_value = row["title"]
-        if not is_category_exists(title_value):
-            parent_value = row["parent"]
-            parent, created = Category.objects.get_or_create(title=parent_value)
-            if created:
-                created_categories.append(parent)
-            category = Category(
-                title=title_value,
-                parent=parent,
-            )
-            category.save()
-            created_categories.append(category)
+    def __init__(self, text_file, chunk_size: int = JSON_READ_CHUNK_SIZE):
+        self.text_file = text_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def read_more(self, size: int) -> None:
+        chunk = self.text_file.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+
+    def peek(self) -> str:
+        """Пропуск пробелов и получение следующего символа ('' в конце файла)"""
+
+        while True:
+            while (
+                self.position < len(self.buffer)
+                and self.buffer[self.position].isspace()
+            ):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                return ""
+            self.read_more(self.chunk_size)
 
-    return created_categories
+    def expect(self, char: str, message: str) -> None:
+        if self.peek() != char:
+            raise ValueError(message)
+        self.position += 1
 
+    def decode_value(self) -> Any:
+        """Разбор очередного значения целиком"""
 
-def save_json_categories(file, encoding) -> list[Category | None]:
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # Число в конце буфера может продолжаться в следующем фрагменте
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            self.read_more(size)
+            size *= 2
+
+    def iter_items(self, start: str, end: str) -> Iterator[None]:
+        """Перебор элементов объекта или массива (элемент читает вызывающий код)"""
+
+        self.expect(start, f"'{start}' is expected")
+        first = True
+        while self.peek() != end:
+            if not first:
+                self.expect(",", f"',' or '{end}' is expected")
+            first = False
+            yield
+        self.position += 1
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """
+        Перебор ключей JSON-объекта
+
+        * после получения ключа вызывающий код должен прочитать значение
+          ('decode_value' или 'iter_array')
+        """
+
+        for _ in self.iter_items("{", "}"):
+            key = self.decode_value()
+            if not isinstance(key, str):
+                raise ValueError("JSON object key must be a string")
+            self.expect(":", "':' is expected after JSON object key")
+            yield key
+
+    def iter_array(self) -> Iterator[Any]:
+        """Перебор элементов JSON-массива по одному"""
+
+        for _ in self.iter_items("[", "]"):
+            yield self.decode_value()
+
+
+def iter_json_object_items(
+    text_file, chunk_size: int = JSON_READ_CHUNK_SIZE
+) -> Iterator[tuple[str, Any]]:
+    """Последовательное чтение пар (ключ, значение) JSON-объекта верхнего уровня"""
+
+    reader = JsonStreamReader(text_file, chunk_size)
+    for key in reader.iter_object_keys():
+        yield key, reader.decode_value()
+
+
+def iter_json_categories(
+    file, encoding, chunk_size: int = JSON_READ_CHUNK_SIZE
+) -> Iterator[tuple[str, str | None]]:
     """
-    Функция извлекает данные из JSON файла и создает категории,
-    если они не существуют в базе данных
+    Последовательное чтение пар (категория, родительская категория)
+    из JSON файла вида {"категория": ["подкатегория", ...], ...}
+
+    * подкатегории читаются по одной, поэтому размер массива подкатегорий
+      не влияет на потребление памяти
     """
 
     json_file = TextIOWrapper(buffer=file, encoding=encoding)
-    categories_data: dict[str, list[str]] = json.load(json_file)
-
-    created_categories = []
-    for category, sub_categories in categories_data.items():
-        parent, parent_created = Category.objects.get_or_create(title=category)
-        if parent_created:
-            created_categories.append(parent)
-
-        for sub_category in sub_categories:
-            child, child_created = Category.objects.get_or_create(title=sub_category)
-            if child_created:
-                child.parent = parent
-                child.save()
-                created_categories.append(child)
-
-    return created_categories
+    reader = JsonStreamReader(json_file, chunk_size)
+    for category in reader.iter_object_keys():
+        yield category, None
+        for sub_category in reader.iter_array():
+            yield sub_category, category
+
+
+def save_categories_batch(rows: list[tuple[str, str | None]]) -> list[Category]:
+    """
+    Создание отсутствующих категорий пачки строк
+
+    * существующие категории и родители выбираются одним запросом IN
+    * строки обрабатываются по порядку: существующая категория не изменяется,
+      отсутствующая родительская категория создается без родителя
+    * категории создаются через 'bulk_create' по уровням вложенности
+      (родители раньше дочерних), дерево категорий дополняется одним запросом
+    """
+
+    titles = {title for row in rows for title in row if title}
+    category_ids = dict(
+        Category.objects.filter(title__in=titles).values_list("title", "pk")
+    )
+
+    # {название: название родителя} в порядке первого появления
+    planned: dict[str, str | None] = {}
+    for title, parent in rows:
+        if not title or title in category_ids or title in planned:
+            continue
+        if parent == title:
+            parent = None
+        if parent and parent not in category_ids and parent not in planned:
+            planned[parent] = None
+        planned[title] = parent
+
+    levels: dict[str, int] = {}
+    for title, parent in planned.items():
+        levels[title] = levels[parent] + 1 if parent in levels else 0
+
+    created = []
+    with transaction.atomic():
+        for level in sorted(set(levels.values())):
+            categories = Category.objects.bulk_create(
+                [
+                    Category(
+                        title=title,
+                        parent_id=(
+                            category_ids[planned[title]] if planned[title] else None
+                        ),
+                    )
+                    for title, title_level in levels.items()
+                    if title_level == level
+                ]
+            )
+            for category in categories:
+                category_ids[category.title] = category.pk
+            created.extend(categories)
+        CategoryClosure.objects.link_new_categories(created)
+    return created
+
+
+def import_categories(
+    rows: Iterable[tuple[str, str | None]], batch_size: int = IMPORT_BATCH_SIZE
+) -> Iterator[ImportBatch]:
+    """
+    Импорт категорий из потока пар (категория, родительская категория)
+
+    * строки обрабатываются пачками по 'batch_size', каждая пачка -
+      в своей транзакции
+    * возвращает результат обработки каждой пачки
+    """
+
+    rows = iter(rows)
+    number = 0
+    try:
+        while batch := list(islice(rows, batch_size)):
+            number += 1
+            started = time.monotonic()
+            created = save_categories_batch(batch)
+            result = ImportBatch(
+                number, len(batch), len(created), time.monotonic() - started
+            )
+            logger.debug(
+                "Categories batch %s: %s rows, %s created",
+                number,
+                result.rows,
+                result.created,
+            )
+            yield result
+    finally:
+        # bulk_create не вызывает сигналов, версию категорий для кэша меняем явно
+        if number:
+            invalidate_model_cache(Category)
+
+
+def save_csv_categories(
+    file, encoding, batch_size: int = IMPORT_BATCH_SIZE
+) -> Iterator[ImportBatch]:
+    """Импорт категорий из CSV файла (колонки 'title' и 'parent')"""
+
+    return import_categories(iter_csv_categories(file, encoding), batch_size)
+
+
+def save_json_categories(
+    file, encoding, batch_size: int = IMPORT_BATCH_SIZE
+) -> Iterator[ImportBatch]:
+    """Импорт категорий из JSON файла"""
+
+    return import_categories(iter_json_categories(file, encoding), batch_size)
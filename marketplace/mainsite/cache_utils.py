@@ -0,0 +1,151 @@
+import hashlib
+import json
+import uuid
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db.utils import DEFAULT_DB_ALIAS
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+MODEL_VERSION_KEY_PREFIX = "model_version"
+RESPONSE_CACHE_KEY_PREFIX = "response"
+
+
+def get_model_version_key(model: type[Model]) -> str:
+    """Ключ кэша с версией модели"""
+
+    return "{prefix}:{label}".format(
+        prefix=MODEL_VERSION_KEY_PREFIX, label=model._meta.label_lower
+    )
+
+
+def get_models_versions(models: tuple[type[Model], ...]) -> list[str]:
+    """
+    Получение текущих версий моделей
+
+    * отсутствующая в кэше версия создается, значения хранятся без срока
+      действия и меняются только при изменении данных модели
+    """
+
+    keys = [get_model_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model: type[Model]) -> None:
+    """
+    Смена версии модели
+
+    * новая версия - случайное значение, поэтому конкурентные изменения
+      не могут вернуть ранее использованную версию
+    """
+
+    cache.set(get_model_version_key(model), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_model_cache(
+    versioned_model: type[Model], using: str = DEFAULT_DB_ALIAS, **kwargs
+) -> None:
+    """
+    Обработчик сигналов изменения данных модели
+
+    * версия меняется сразу, чтобы запросы внутри транзакции не получали
+      устаревшие ответы, и повторно после фиксации транзакции, чтобы
+      сбросить ответы, сохраненные другими запросами до фиксации
+    """
+
+    bump_model_version(versioned_model)
+    transaction.on_commit(partial(bump_model_version, versioned_model), using=using)
+
+
+def track_model_versions(*models: type[Model]) -> None:
+    """
+    Подключение смены версии моделей к сигналам сохранения и удаления
+
+    * для связей многие-ко-многим версия модели, объявившей связь,
+      меняется также при изменении связи
+    """
+
+    for model in models:
+        handler = partial(invalidate_model_cache, model)
+        uid = "cache_version_{label}".format(label=model._meta.label_lower)
+        post_save.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+        for field in model._meta.local_many_to_many:
+            m2m_changed.connect(
+                handler,
+                sender=field.remote_field.through,
+                weak=False,
+                dispatch_uid=f"{uid}_{field.name}",
+            )
+
+
+def get_versioned_cache_key(
+    name: str, params: dict | list, models: tuple[type[Model], ...]
+) -> str:
+    """
+    Ключ кэша данных, зависящих от параметров и версий моделей
+
+    * при изменении любой из моделей 'models' ключ меняется, поэтому
+      устаревшая запись перестает использоваться
+    """
+
+    key_data = json.dumps(
+        [params, get_models_versions(models)], sort_keys=True, default=str
+    )
+    return "{prefix}:{name}:{digest}".format(
+        prefix=RESPONSE_CACHE_KEY_PREFIX,
+        name=name,
+        digest=hashlib.sha1(key_data.encode()).hexdigest(),
+    )
+
+
+class VersionedCacheMixin:
+    """
+    Кэширование ответов представлений на GET-запросы
+
+    * ключ кэша строится по параметрам запроса и версиям моделей из
+      'cache_models', поэтому при изменении данных запись перестает
+      использоваться без ожидания истечения срока действия
+    * 'cache_timeout' ограничивает время хранения неиспользуемых записей
+    """
+
+    cache_models: tuple[type[Model], ...] = ()
+    cache_timeout: int | None = 60 * 60 * 24
+
+    def get_cache_key_params(self, request: Request) -> dict:
+        """Параметры запроса, от которых зависит ответ"""
+
+        return {
+            key: sorted(request.query_params.getlist(key))
+            for key in sorted(request.query_params)
+        }
+
+    def get_cache_key(self, request: Request) -> str:
+        """Ключ кэша ответа"""
+
+        return get_versioned_cache_key(
+            type(self).__name__, self.get_cache_key_params(request), self.cache_models
+        )
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        """Получение ответа из кэша или его формирование и сохранение"""
+
+        cache_key = self.get_cache_key(request)
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data, status=status.HTTP_200_OK)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, response.data, timeout=self.cache_timeout)
+        return response
@@ -0,0 +1,158 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Model, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Количество строк, получаемых из базы данных за один раз
+EXPORT_CHUNK_SIZE = 2000
+
+# Форматы выгрузки: {формат: тип содержимого}
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+# Первые символы, с которых электронные таблицы начинают формулу
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def escape_csv_cell(value):
+    """
+    Экранирование строки, которую электронная таблица выполнит как формулу
+
+    * к строке, начинающейся с '=', '+', '-', '@' или управляющего символа,
+      добавляется префикс "'"
+    """
+
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(header: list[str], rows: Iterable[list]) -> Iterator[str]:
+    """Построчное формирование CSV (строковые значения экранируются)"""
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([escape_csv_cell(value) for value in row])
+
+
+def iter_ndjson(records: Iterable[dict]) -> Iterator[str]:
+    """Построчное формирование NDJSON (один JSON-объект в строке)"""
+
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+class Exporter(ABC):
+    """
+    Базовый класс выгрузки данных
+
+    * 'model' - модель выгружаемых записей
+    * 'get_records' возвращает записи в виде словарей (для NDJSON),
+      'get_rows' - строки с колонками 'header' (для CSV)
+    * записи читаются через '.iterator(chunk_size=...)', на PostgreSQL
+      при этом используется серверный курсор, поэтому потребление памяти
+      не зависит от объема выгрузки
+    """
+
+    name = "export"
+    model: type[Model]
+    header: list[str] = []
+
+    def __init__(self, queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    @abstractmethod
+    def get_records(self) -> Iterator[dict]:
+        """Выгружаемые записи в виде словарей"""
+
+    def get_rows(self) -> Iterator[list]:
+        for record in self.get_records():
+            yield [record[name] for name in self.header]
+
+    def iter_lines(self, export_format: str) -> Iterator[str]:
+        """Построчное формирование выгрузки в формате 'export_format'"""
+
+        if export_format == "csv":
+            return iter_csv(self.header, self.get_rows())
+        if export_format == "ndjson":
+            return iter_ndjson(self.get_records())
+        raise ValueError(f"Unknown export format '{export_format}'")
+
+    def get_filename(self, export_format: str) -> str:
+        return "{name}_{date:%Y%m%d_%H%M%S}.{ext}".format(
+            name=self.name, date=timezone.localtime(), ext=export_format
+        )
+
+    def get_response(self, export_format: str) -> StreamingHttpResponse:
+        """Потоковый ответ с файлом выгрузки"""
+
+        response = StreamingHttpResponse(
+            self.iter_lines(export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response["Content-Disposition"] = 'attachment; filename="{}"'.format(
+            self.get_filename(export_format)
+        )
+        return response
+
+
+class ExportCommand(BaseCommand):
+    """
+    Базовая команда выгрузки данных в файл или стандартный вывод
+
+    * 'exporter_class' - класс выгрузки, 'get_queryset' - выгружаемые записи
+      (по умолчанию - все записи модели выгрузки)
+    """
+
+    exporter_class: type[Exporter]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=sorted(EXPORT_FORMATS),
+            default="csv",
+            help="Export format",
+        )
+        parser.add_argument(
+            "--output",
+            help="Output file path (standard output by default)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help="Number of rows fetched from the database at a time",
+        )
+
+    def get_queryset(self) -> QuerySet:
+        return self.exporter_class.model._default_manager.all()
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be a positive number")
+
+        exporter = self.exporter_class(self.get_queryset(), options["chunk_size"])
+        lines = exporter.iter_lines(options["format"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as file:
+                file.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
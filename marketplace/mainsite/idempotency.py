@@ -0,0 +1,156 @@
+import datetime
+import hashlib
+import json
+from functools import wraps
+from typing import Callable
+
+from django.conf import settings
+from django.utils import timezone
+from drf_spectacular import utils
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from mainsite.main_logger import logger
+from orders_app.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Описание заголовка для схемы API
+IDEMPOTENCY_KEY_PARAMETER = utils.OpenApiParameter(
+    name=IDEMPOTENCY_KEY_HEADER,
+    location=utils.OpenApiParameter.HEADER,
+    type=utils.OpenApiTypes.STR,
+    required=False,
+    description="unique key of the request: a repeated request with the same key "
+    "returns the result of the first one",
+)
+
+
+def get_request_fingerprint(request: Request) -> str:
+    """Отпечаток запроса: метод, путь и данные запроса"""
+
+    request_data = json.dumps(
+        [request.method, request.path, request.data], sort_keys=True, default=str
+    )
+    return hashlib.sha1(request_data.encode()).hexdigest()
+
+
+def get_idempotency_scope(request: Request) -> str:
+    """
+    Владелец ключа: пользователь или сессия неавторизованного пользователя
+
+    * ключи разных пользователей и разных сессий не пересекаются; для
+      запроса без сессии она создается, и ее cookie отправляется в ответе
+    """
+
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    session = request.session
+    if session.session_key is None:
+        session.create()
+    return f"session:{session.session_key}"
+
+
+def claim_idempotency_key(
+    scope: str, key: str, fingerprint: str
+) -> tuple[IdempotencyKey, bool]:
+    """
+    Захват ключа идемпотентности
+
+    * ключ захватывается вставкой строки с уникальной парой (scope, key):
+      из параллельных запросов строку создает только один, остальные
+      получают существующую запись
+    * запись старше 'IDEMPOTENCY_KEY_TTL' секунд удаляется и ключ
+      захватывается заново
+    * возвращает запись и признак того, что ключ захвачен этим запросом
+    """
+
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    expired_before = timezone.now() - datetime.timedelta(
+        seconds=settings.IDEMPOTENCY_KEY_TTL
+    )
+    IdempotencyKey.objects.filter(
+        scope=scope, key=digest, created_at__lt=expired_before
+    ).delete()
+    return IdempotencyKey.objects.get_or_create(
+        scope=scope, key=digest, defaults={"fingerprint": fingerprint}
+    )
+
+
+def idempotent(view_method: Callable) -> Callable:
+    """
+    Поддержка заголовка 'Idempotency-Key' для метода представления
+
+    * запись о запросе хранится в таблице IdempotencyKey
+      'IDEMPOTENCY_KEY_TTL' секунд и содержит отпечаток запроса
+      и сохраненный ответ
+    * повторный запрос с тем же ключом и теми же данными получает
+      сохраненный ответ без повторного выполнения метода
+    * если первый запрос еще выполняется, повторный получает 409,
+      если данные запроса отличаются - 422
+    * ответы с ошибкой сервера не сохраняются, такой запрос можно повторить
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request: Request, *args, **kwargs) -> Response:
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return Response(
+                {"error": f"Invalid '{IDEMPOTENCY_KEY_HEADER}' header"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = get_request_fingerprint(request)
+        record, claimed = claim_idempotency_key(
+            get_idempotency_scope(request), key, fingerprint
+        )
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                logger.error("Idempotency key %s reused with other data", key)
+                return Response(
+                    {"error": "Idempotency key is used with other request data"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is None:
+                return Response(
+                    {"error": "Request with this idempotency key is in progress"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            logger.debug("Replay response for idempotency key %s", key)
+            return Response(
+                record.response_data,
+                status=record.status_code,
+                headers={IDEMPOTENCY_REPLAYED_HEADER: "true"},
+            )
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response_data = response.data
+            record.save(update_fields=["status_code", "response_data"])
+        return response
+
+    return wrapper
+
+
+def purge_idempotency_keys(now: datetime.datetime | None = None) -> int:
+    """Удаление записей о запросах старше 'IDEMPOTENCY_KEY_TTL' секунд"""
+
+    now = now or timezone.now()
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=now - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ).delete()
+    return deleted
@@ -0,0 +1,182 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, Prefetch, QuerySet, prefetch_related_objects
+from rest_framework import serializers
+
+
+class PrefetchPlan:
+    """
+    План загрузки связанных объектов для модели
+
+    * 'select' - связи "к одному", загружаемые через JOIN
+    * 'prefetch' - связи "ко многим", загружаемые отдельным запросом
+      со своим планом для связанной модели
+    """
+
+    def __init__(self, model: type[Model]):
+        self.model = model
+        self.select: dict[str, PrefetchPlan] = {}
+        self.prefetch: dict[str, PrefetchPlan] = {}
+
+    def add_path(
+        self,
+        path: list[str],
+        serializer: serializers.BaseSerializer | None = None,
+    ) -> None:
+        """
+        Добавление в план пути по атрибутам модели
+
+        * путь обрывается на первом атрибуте, не являющемся связью модели
+          (свойства, методы, обычные поля)
+        * данные вложенного сериализатора добавляются к плану модели,
+          на которой заканчивается путь
+        """
+
+        if not path:
+            if serializer is not None:
+                self.add_serializer(serializer)
+            return
+
+        try:
+            model_field = self.model._meta.get_field(path[0])
+        except FieldDoesNotExist:
+            return
+        if not model_field.is_relation or model_field.related_model is None:
+            return
+
+        relations = (
+            self.prefetch
+            if model_field.one_to_many or model_field.many_to_many
+            else self.select
+        )
+        child = relations.setdefault(path[0], PrefetchPlan(model_field.related_model))
+        child.add_path(path[1:], serializer)
+
+    def add_serializer(self, serializer: serializers.BaseSerializer) -> None:
+        """Добавление в план связей, используемых полями сериализатора"""
+
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+
+        for field_name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, serializers.SerializerMethodField):
+                hints = getattr(getattr(serializer, "Meta", None), "prefetch_hints", {})
+                for lookup, hint_serializer_class in hints.get(field_name, ()):
+                    hint_serializer = (
+                        hint_serializer_class() if hint_serializer_class else None
+                    )
+                    self.add_path(lookup.split("__"), hint_serializer)
+                continue
+
+            if field.source == "*":
+                if isinstance(field, serializers.BaseSerializer):
+                    self.add_serializer(field)
+                continue
+
+            path = field.source_attrs
+            if isinstance(field, serializers.BaseSerializer):
+                self.add_path(path, field)
+            elif isinstance(field, serializers.ManyRelatedField):
+                self.add_path(path)
+            elif isinstance(field, serializers.RelatedField):
+                # Для первичного ключа связанного объекта JOIN не нужен
+                if not field.use_pk_only_optimization() or len(path) > 1:
+                    self.add_path(path)
+            elif len(path) > 1:
+                self.add_path(path[:-1])
+
+    def get_select_related(self, prefix: str = "") -> list[str]:
+        """Список связей для 'select_related'"""
+
+        lookups = []
+        for name, child in self.select.items():
+            lookups.append(f"{prefix}{name}")
+            lookups.extend(child.get_select_related(f"{prefix}{name}__"))
+        return lookups
+
+    def get_prefetches(self, prefix: str = "") -> list[Prefetch]:
+        """Список объектов 'Prefetch', включая связи внутри 'select_related'"""
+
+        prefetches = [
+            Prefetch(
+                f"{prefix}{name}",
+                queryset=child.apply(child.model._default_manager.all()),
+            )
+            for name, child in self.prefetch.items()
+        ]
+        for name, child in self.select.items():
+            prefetches.extend(child.get_prefetches(f"{prefix}{name}__"))
+        return prefetches
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        """Применение плана к набору запросов"""
+
+        select_related = self.get_select_related()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetches = self.get_prefetches()
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+    def apply_to_objects(self, instances: list[Model]) -> None:
+        """
+        Применение плана к уже загруженным объектам
+
+        * связи "к одному" загружаются отдельными запросами,
+          так как JOIN для готовых объектов невозможен
+        """
+
+        relations = {**self.select, **self.prefetch}
+        prefetches = [
+            Prefetch(name, queryset=child.apply(child.model._default_manager.all()))
+            for name, child in relations.items()
+        ]
+        prefetch_related_objects(instances, *prefetches)
+
+
+def get_prefetch_plan(
+    serializer_class: type[serializers.BaseSerializer], model: type[Model]
+) -> PrefetchPlan:
+    """Построение плана загрузки связанных объектов для сериализатора"""
+
+    plan = PrefetchPlan(model)
+    plan.add_serializer(serializer_class())
+    return plan
+
+
+def optimize_queryset(
+    queryset: QuerySet, serializer_class: type[serializers.BaseSerializer]
+) -> QuerySet:
+    """Добавление к набору запросов загрузки связей, нужных сериализатору"""
+
+    return get_prefetch_plan(serializer_class, queryset.model).apply(queryset)
+
+
+def prefetch_for_serializer(
+    instances: list[Model], serializer_class: type[serializers.BaseSerializer]
+) -> None:
+    """Загрузка связей, нужных сериализатору, для уже полученных объектов"""
+
+    instances = [instance for instance in instances if instance is not None]
+    if not instances:
+        return
+    plan = get_prefetch_plan(serializer_class, type(instances[0]))
+    plan.apply_to_objects(instances)
+
+
+class SerializerPrefetchMixin:
+    """
+    Загрузка связанных объектов по полям сериализатора представления
+
+    * 'select_related' и 'prefetch_related' строятся обходом полей
+      сериализатора, вложенных сериализаторов и путей 'source'
+    * для 'SerializerMethodField' связи указываются в 'Meta.prefetch_hints'
+      сериализатора: {имя поля: [(путь, класс сериализатора или None), ...]}
+    """
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        return optimize_queryset(queryset, self.get_serializer_class())
@@ -120,6 +120,9 @@ if DB_ENGINE == "postgresql":
             "PORT": config("DB_PORT", cast=int),
         },
     }
+
+    # Поиск по каталогу использует триграммные lookups из 'django.contrib.postgres'
+    INSTALLED_APPS += ["django.contrib.postgres"]
 else:
     DATABASES = {
         "default": {
@@ -228,6 +231,17 @@ SPECTACULAR_SETTINGS = {
 # Extra options
 APPEND_SLASH = True
 
+# Хранилище корзин неавторизованных пользователей
+BASKET_ANONYMOUS_STORE = "basket_app.stores.CacheBasketStore"
+## Срок хранения корзины неавторизованного пользователя (в секундах):
+BASKET_ANONYMOUS_MAX_AGE = 60 * 60 * 24 * 30
+
+# Срок резервирования товаров неоплаченным заказом (в секундах)
+ORDER_RESERVATION_MAX_AGE = 60 * 60 * 24
+
+# Срок хранения ответов на запросы с заголовком 'Idempotency-Key' (в секундах)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
 # Secure settings
 ## Количество секунд блокировки незащищенного HTTP подключения:
 SECURE_HSTS_SECONDS = 0
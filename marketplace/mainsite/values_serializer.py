@@ -0,0 +1,200 @@
+from collections import defaultdict
+from typing import Any, Iterable
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import F, FileField, ForeignObjectRel, Model, QuerySet
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+# Имя аннотации с первичным ключом родительского объекта в связанных строках
+PARENT_KEY = "values_serializer_parent"
+
+
+class ValuesSerializer:
+    """
+    Быстрое формирование данных сериализатора по строкам '.values()'
+
+    * поля сериализатора один раз сопоставляются со столбцами модели,
+      затем строки преобразуются методами 'to_representation' тех же полей,
+      поэтому результат совпадает с результатом сериализатора
+    * вложенные сериализаторы связей "ко многим" загружаются одним
+      запросом на связь для всей страницы
+    * поддерживаются поля модели, первичные ключи связанных объектов
+      и вложенные сериализаторы с many=True; для остальных полей
+      выбрасывается ImproperlyConfigured
+    """
+
+    def __init__(self, serializer: serializers.Serializer):
+        self.model: type[Model] = serializer.Meta.model
+        self.pk_name = self.model._meta.pk.attname
+        # (имя поля в ответе, столбец '.values()', поле сериализатора)
+        self.columns: list[tuple[str, str, serializers.Field]] = []
+        # (имя поля в ответе, путь связи в модели, сериализатор связанных объектов)
+        self.relations: list[tuple[str, str, ValuesSerializer]] = []
+        self.file_fields: dict[str, FileField] = {}
+        self.field_names: list[str] = []
+
+        for field_name, field in serializer.fields.items():
+            if not field.write_only:
+                self.compile_field(field_name, field)
+                self.field_names.append(field_name)
+
+    def compile_field(self, field_name: str, field: serializers.Field) -> None:
+        """Сопоставление поля сериализатора со столбцом или связью модели"""
+
+        if field.source == "*" or len(field.source_attrs) != 1:
+            raise ImproperlyConfigured(
+                f"Field '{field_name}' with source '{field.source}' is not supported"
+            )
+        try:
+            model_field = self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(
+                f"Field '{field_name}' is not a field of {self.model.__name__}"
+            )
+
+        if isinstance(field, serializers.ListSerializer):
+            if not (model_field.one_to_many or model_field.many_to_many):
+                raise ImproperlyConfigured(
+                    f"Field '{field_name}' must be a to-many relation"
+                )
+            self.relations.append(
+                (field_name, field.source, ValuesSerializer(field.child))
+            )
+        elif isinstance(field, serializers.RelatedField):
+            if not (model_field.many_to_one and field.use_pk_only_optimization()):
+                raise ImproperlyConfigured(
+                    f"Field '{field_name}' must be a primary key of a related object"
+                )
+            self.columns.append((field_name, model_field.attname, field))
+        elif isinstance(field, serializers.BaseSerializer) or model_field.is_relation:
+            raise ImproperlyConfigured(f"Field '{field_name}' is not supported")
+        else:
+            self.columns.append((field_name, model_field.attname, field))
+            if isinstance(model_field, FileField):
+                self.file_fields[model_field.attname] = model_field
+
+    @property
+    def values_fields(self) -> list[str]:
+        """Столбцы, выбираемые через '.values()'"""
+
+        fields = [self.pk_name]
+        fields.extend(column for _, column, _ in self.columns if column not in fields)
+        return fields
+
+    def get_rows(self, queryset: QuerySet, *extra_fields: str) -> QuerySet:
+        """
+        Набор запросов строк для сериализации
+
+        * 'extra_fields' добавляются к выбираемым столбцам, например
+          для аннотаций, по которым выполняется пагинация
+        """
+
+        fields = self.values_fields
+        fields.extend(field for field in extra_fields if field not in fields)
+        return queryset.select_related(None).prefetch_related(None).values(*fields)
+
+    def get_attribute(self, row: dict, column: str, field: serializers.Field) -> Any:
+        """Значение столбца в том виде, в котором его получает поле сериализатора"""
+
+        value = row[column]
+        if column in self.file_fields:
+            model_field = self.file_fields[column]
+            return model_field.attr_class(None, model_field, value)
+        if isinstance(field, serializers.RelatedField):
+            return PKOnlyObject(pk=value)
+        return value
+
+    def get_related_data(
+        self, relation_name: str, child: "ValuesSerializer", parent_ids: list
+    ) -> dict[Any, list[dict]]:
+        """Данные связанных объектов, сгруппированные по родительскому объекту"""
+
+        relation = self.model._meta.get_field(relation_name)
+        if isinstance(relation, ForeignObjectRel):
+            lookup = relation.field.name
+        else:
+            lookup = relation.related_query_name()
+
+        rows = child.get_rows(
+            child.model._default_manager.filter(
+                **{f"{lookup}__in": parent_ids}
+            ).annotate(**{PARENT_KEY: F(lookup)}),
+            PARENT_KEY,
+        )
+        rows = list(rows)
+        data = child.to_representation(rows)
+
+        grouped: dict[Any, list[dict]] = defaultdict(list)
+        for row, item in zip(rows, data):
+            grouped[row[PARENT_KEY]].append(item)
+        return grouped
+
+    def to_representation(self, rows: Iterable[dict]) -> list[dict]:
+        """Формирование данных сериализатора по строкам '.values()'"""
+
+        rows = list(rows)
+        related_data = {}
+        if rows and self.relations:
+            parent_ids = [row[self.pk_name] for row in rows]
+            related_data = {
+                relation_name: self.get_related_data(relation_name, child, parent_ids)
+                for _, relation_name, child in self.relations
+            }
+
+        results = []
+        for row in rows:
+            data = {}
+            for field_name, column, field in self.columns:
+                attribute = self.get_attribute(row, column, field)
+                check_for_none = (
+                    attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+                )
+                data[field_name] = (
+                    None
+                    if check_for_none is None
+                    else field.to_representation(attribute)
+                )
+            for field_name, relation_name, _ in self.relations:
+                data[field_name] = related_data[relation_name].get(
+                    row[self.pk_name], []
+                )
+            results.append(
+                {field_name: data[field_name] for field_name in self.field_names}
+            )
+        return results
+
+
+class ValuesSerializerMixin:
+    """
+    Формирование списка объектов через ValuesSerializer
+
+    * строки выбираются через '.values()' вместе с аннотациями набора
+      запросов, поэтому пагинация и сортировка работают как прежде
+    """
+
+    def get_values_serializer(self) -> ValuesSerializer:
+        """Получение ValuesSerializer для сериализатора представления"""
+
+        return ValuesSerializer(self.get_serializer())
+
+    def list(self, request, *args, **kwargs) -> Response:
+        """Получение списка объектов"""
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.get_values_list_response(queryset)
+
+    def get_values_list_response(self, queryset: QuerySet) -> Response:
+        """Получение ответа со списком объектов (с пагинацией, если она задана)"""
+
+        values_serializer = self.get_values_serializer()
+        # Имена из '.alias()' нельзя выбрать через '.values()', берем только аннотации
+        rows = values_serializer.get_rows(queryset, *queryset.query.annotation_select)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                values_serializer.to_representation(page)
+            )
+        return Response(values_serializer.to_representation(rows))
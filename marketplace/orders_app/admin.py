@@ -1,5 +1,11 @@
 from django.contrib import admin
+from django.contrib.admin.decorators import action
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
 
+from orders_app.analytics import get_sales_dashboard
+from orders_app.exports import OrdersExporter
 from orders_app.models import Order, OrderProduct, Payment, Delivery
 
 
@@ -34,6 +40,16 @@ class PaymentInline(admin.StackedInline):
     ]
 
 
+@action(description="Выгрузить в CSV")
+def export_orders_csv(modeladmin, request, queryset):
+    return OrdersExporter(queryset).get_response("csv")
+
+
+@action(description="Выгрузить в NDJSON")
+def export_orders_ndjson(modeladmin, request, queryset):
+    return OrdersExporter(queryset).get_response("ndjson")
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     """Админка заказов"""
@@ -46,9 +62,12 @@ class OrderAdmin(admin.ModelAdmin):
         "status",
     )
     list_display_links = ("order_name",)
+    actions = [export_orders_csv, export_orders_ndjson]
+    change_list_template = "orders_app/change_list.html"
     readonly_fields = (
         "status",
         "totalCost",
+        "itemsCount",
         "createdAt",
         "user_name",
         "user_full_name",
@@ -62,7 +81,7 @@ class OrderAdmin(admin.ModelAdmin):
     fieldsets = (
         (
             None,
-            {"fields": ("status", "totalCost", "createdAt")},
+            {"fields": ("status", "totalCost", "itemsCount", "createdAt")},
         ),
         (
             "Заказчик товара",
@@ -136,6 +155,39 @@ class OrderAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(user=request.user)
 
+    def sales_dashboard(self, request):
+        """
+        Панель продаж: выручка по дням, самые продаваемые товары
+        и количество заказов по статусам (по таблицам итогов)
+        """
+
+        user = request.user
+        if not (
+            user.is_superuser
+            or user.groups.filter(name__in=["admins", "seller_assistants"]).exists()
+        ):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Аналитика продаж",
+            "opts": self.model._meta,
+            **get_sales_dashboard(),
+        }
+        return TemplateResponse(request, "admin/orders_sales_dashboard.html", context)
+
+    def get_urls(self) -> list:
+        """Обновление urls с учетом добавления панели продаж"""
+
+        urls = super().get_urls()
+        new_urls = [
+            path(
+                "dashboard/",
+                self.admin_site.admin_view(self.sales_dashboard),
+                name="orders_sales_dashboard",
+            ),
+        ]
+        return new_urls + urls
+
 
 @admin.register(Delivery)
 class DeliveryAdmin(admin.ModelAdmin):
@@ -0,0 +1,200 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterator
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Model, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from mainsite.main_logger import logger
+from orders_app.models import (
+    DailyProductSales,
+    DailySales,
+    Order,
+    OrderProduct,
+    OrderStatusCount,
+)
+
+REBUILD_BATCH_SIZE = 1000
+DASHBOARD_DAYS = 30
+TOP_PRODUCTS_DAYS = 7
+TOP_PRODUCTS_LIMIT = 10
+
+
+def increment_rollup(model: type[Model], lookup: dict, **deltas) -> None:
+    """
+    Увеличение счетчиков строки итогов на 'deltas'
+
+    * счетчики обновляются запросом UPDATE на стороне базы данных,
+      отсутствующая строка создается со значениями 'deltas'
+    """
+
+    rows = model.objects.filter(**lookup)
+    increments = {name: F(name) + delta for name, delta in deltas.items()}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        rows.update(**increments)
+
+
+def update_status_counts(previous_status: str | None, status: str) -> None:
+    """Перенос заказа между счетчиками статусов"""
+
+    if previous_status is not None:
+        increment_rollup(OrderStatusCount, {"status": previous_status}, count=-1)
+    increment_rollup(OrderStatusCount, {"status": status}, count=1)
+
+
+def record_paid_order(order: Order, day: datetime.date | None = None) -> None:
+    """Добавление оплаченного заказа в итоги продаж за день"""
+
+    day = day or timezone.localdate()
+    increment_rollup(
+        DailySales,
+        {"day": day},
+        orders_count=1,
+        items_count=order.itemsCount,
+        revenue=order.totalCost,
+    )
+    for product_id, count, price in order.products.values_list(
+        "product_id", "count", "price"
+    ):
+        increment_rollup(
+            DailyProductSales,
+            {"day": day, "product_id": product_id},
+            units=count,
+            revenue=(price or 0) * count,
+        )
+
+
+def rebuild_sales_rollups(
+    batch_size: int = REBUILD_BATCH_SIZE,
+) -> Iterator[int]:
+    """
+    Полный пересчет таблиц итогов по заказам
+
+    * оплаченные заказы обрабатываются пакетами по 'batch_size' заказов
+      в порядке первичного ключа, итоги пакета суммируются в базе данных
+    * днем оплаты считается дата создания оплаты (или заказа, если
+      оплаты нет)
+    * возвращает количество заказов в каждом обработанном пакете
+    """
+
+    paid_orders = Order.objects.filter(status=Order.OrderStatusChoices.PAIDED).annotate(
+        paid_day=TruncDate(Coalesce("payment__created_at", "createdAt")),
+    )
+
+    daily_sales: dict = defaultdict(lambda: [0, 0, Decimal("0.00")])
+    product_sales: dict = defaultdict(lambda: [0, Decimal("0.00")])
+    last_pk = 0
+    while True:
+        batch = dict(
+            paid_orders.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "paid_day")[:batch_size]
+        )
+        if not batch:
+            break
+        last_pk = max(batch)
+
+        for row in (
+            paid_orders.filter(pk__in=list(batch))
+            .order_by()
+            .values("paid_day")
+            .annotate(
+                orders_count=Count("pk"),
+                items_count=Sum("itemsCount"),
+                revenue=Sum("totalCost"),
+            )
+        ):
+            totals = daily_sales[row["paid_day"]]
+            totals[0] += row["orders_count"]
+            totals[1] += row["items_count"] or 0
+            totals[2] += row["revenue"] or 0
+
+        for order_id, product_id, count, price in OrderProduct.objects.filter(
+            order_id__in=list(batch)
+        ).values_list("order_id", "product_id", "count", "price"):
+            totals = product_sales[(batch[order_id], product_id)]
+            totals[0] += count
+            totals[1] += (price or 0) * count
+
+        yield len(batch)
+
+    status_counts = (
+        Order.objects.order_by().values("status").annotate(count=Count("pk"))
+    )
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+        OrderStatusCount.objects.all().delete()
+        DailySales.objects.bulk_create(
+            [
+                DailySales(
+                    day=day, orders_count=orders, items_count=items, revenue=revenue
+                )
+                for day, (orders, items, revenue) in daily_sales.items()
+            ],
+            batch_size=batch_size,
+        )
+        DailyProductSales.objects.bulk_create(
+            [
+                DailyProductSales(
+                    day=day, product_id=product_id, units=units, revenue=revenue
+                )
+                for (day, product_id), (units, revenue) in product_sales.items()
+            ],
+            batch_size=batch_size,
+        )
+        OrderStatusCount.objects.bulk_create(
+            [
+                OrderStatusCount(status=row["status"], count=row["count"])
+                for row in status_counts
+                if row["status"] is not None
+            ]
+        )
+    logger.debug(
+        "Sales rollups rebuilt: %s days, %s product rows",
+        len(daily_sales),
+        len(product_sales),
+    )
+
+
+def get_sales_dashboard(today: datetime.date | None = None) -> dict:
+    """
+    Данные панели продаж
+
+    * данные читаются только из таблиц итогов: выручка по дням за
+      'DASHBOARD_DAYS' дней, самые продаваемые товары за 'TOP_PRODUCTS_DAYS'
+      дней и количество заказов по статусам
+    """
+
+    today = today or timezone.localdate()
+    daily_sales = list(
+        DailySales.objects.filter(
+            day__gt=today - datetime.timedelta(days=DASHBOARD_DAYS)
+        ).order_by("-day")
+    )
+    top_products = (
+        DailyProductSales.objects.filter(
+            day__gt=today - datetime.timedelta(days=TOP_PRODUCTS_DAYS)
+        )
+        .values("product_id", "product__title")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-units", "-revenue")[:TOP_PRODUCTS_LIMIT]
+    )
+    return {
+        "daily_sales": daily_sales,
+        "total_orders": sum(row.orders_count for row in daily_sales),
+        "total_revenue": sum((row.revenue for row in daily_sales), Decimal("0.00")),
+        "top_products": list(top_products),
+        "status_counts": list(OrderStatusCount.objects.all()),
+        "dashboard_days": DASHBOARD_DAYS,
+        "top_products_days": TOP_PRODUCTS_DAYS,
+    }
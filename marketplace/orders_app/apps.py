@@ -5,3 +5,8 @@ class OrdersAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "orders_app"
     verbose_name = "Оформление заказов"
+
+    def ready(self) -> None:
+        """Подключение обработчиков сигналов"""
+
+        from orders_app import signals  # noqa: F401
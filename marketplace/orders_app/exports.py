@@ -0,0 +1,70 @@
+from typing import Iterator
+
+from django.db.models import Prefetch
+
+from mainsite.export import Exporter
+from orders_app.models import Order, OrderProduct
+
+# Выгружаемые поля заказа и товара в заказе
+ORDER_EXPORT_FIELDS = [
+    "id",
+    "createdAt",
+    "status",
+    "user_id",
+    "fullName",
+    "email",
+    "phone",
+    "deliveryType",
+    "paymentType",
+    "totalCost",
+    "itemsCount",
+    "city",
+    "address",
+]
+ORDER_PRODUCT_EXPORT_FIELDS = ["product_id", "count", "price"]
+
+
+class OrdersExporter(Exporter):
+    """
+    Выгрузка заказов вместе с товарами в заказе
+
+    * NDJSON: один заказ в строке, товары - в списке 'products'
+    * CSV: одна строка на товар в заказе (заказ без товаров - одна строка
+      с пустыми колонками товара)
+    * товары загружаются одним запросом на каждую порцию заказов
+    """
+
+    name = "orders"
+    model = Order
+    header = ORDER_EXPORT_FIELDS + ["product_id", "product_count", "product_price"]
+
+    def get_orders(self) -> Iterator[Order]:
+        order_products = OrderProduct.objects.only(
+            "order_id", *ORDER_PRODUCT_EXPORT_FIELDS
+        ).order_by("pk")
+        return (
+            self.queryset.order_by("pk")
+            .only(*ORDER_EXPORT_FIELDS)
+            .prefetch_related(Prefetch("products", queryset=order_products))
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+    def get_records(self) -> Iterator[dict]:
+        for order in self.get_orders():
+            record = {field: getattr(order, field) for field in ORDER_EXPORT_FIELDS}
+            record["products"] = [
+                {field: getattr(item, field) for field in ORDER_PRODUCT_EXPORT_FIELDS}
+                for item in order.products.all()
+            ]
+            yield record
+
+    def get_rows(self) -> Iterator[list]:
+        empty_line = [None] * len(ORDER_PRODUCT_EXPORT_FIELDS)
+        for record in self.get_records():
+            order_row = [record[field] for field in ORDER_EXPORT_FIELDS]
+            lines = [
+                [item[field] for field in ORDER_PRODUCT_EXPORT_FIELDS]
+                for item in record["products"]
+            ]
+            for line in lines or [empty_line]:
+                yield order_row + line
@@ -16,3 +16,18 @@ def handle_already_paided(order: Order) -> Response:
         f"Order {order.id} already paided",
         status=status.HTTP_406_NOT_ACCEPTABLE,
     )
+
+
+def handle_transition_conflict(order: Order, action: str) -> Response:
+    """Логируем невозможный переход статуса заказа и возвращаем ответ"""
+
+    logger.error(
+        "Order %s: transition '%s' from status '%s' is not allowed",
+        order.id,
+        action,
+        order.status,
+    )
+    return Response(
+        f"Order {order.id} has status '{order.status}'",
+        status=status.HTTP_409_CONFLICT,
+    )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders_app.utils import SWEEP_BATCH_SIZE, sweep_expired_orders
+
+
+class Command(BaseCommand):
+    """
+    Команда отмены неоплаченных заказов с истекшим сроком резервирования
+
+    * товары отмененных заказов возвращаются на склад
+    * предназначена для периодического запуска (cron, отдельный сервис)
+    """
+
+    help = "Cancel unpaid orders older than ORDER_RESERVATION_MAX_AGE and release stock"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help="Number of orders fetched per query",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive number")
+
+        started = time.monotonic()
+        canceled = batches_count = 0
+        for batch_canceled in sweep_expired_orders(batch_size):
+            canceled += batch_canceled
+            batches_count += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(
+                    f"batch {batches_count} canceled {batch_canceled} orders"
+                )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Canceled {canceled} orders in {batches_count} batches, "
+                f"{elapsed:.2f} s"
+            )
+        )
@@ -0,0 +1,10 @@
+from mainsite.export import ExportCommand
+from orders_app.exports import OrdersExporter
+
+
+class Command(ExportCommand):
+    """Команда выгрузки заказов с товарами в CSV или NDJSON"""
+
+    help = "Stream orders with their products as CSV or NDJSON"
+
+    exporter_class = OrdersExporter
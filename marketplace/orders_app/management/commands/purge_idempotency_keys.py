@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from mainsite.idempotency import purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    """Команда удаления устаревших записей о запросах с 'Idempotency-Key'"""
+
+    help = "Delete idempotency key records older than IDEMPOTENCY_KEY_TTL"
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys()
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} idempotency key records")
+        )
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders_app.analytics import REBUILD_BATCH_SIZE, rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    """
+    Команда пересчета таблиц итогов продаж
+
+    * итоги по дням, продажи товаров по дням и счетчики статусов строятся
+      заново по заказам, например после загрузки данных в обход сигналов
+    * оплаченные заказы читаются пачками ограниченного размера, таблицы
+      итогов заменяются одной транзакцией после обработки всех пачек
+    """
+
+    help = "Rebuild daily sales, product sales and order status rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help="Number of paid orders handled per batch",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive number")
+
+        started = time.monotonic()
+        processed = batches_count = 0
+        for batch_processed in rebuild_sales_rollups(batch_size):
+            processed += batch_processed
+            batches_count += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(
+                    f"batch {batches_count}: {batch_processed} paid orders"
+                )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sales rollups rebuilt from {processed} paid orders "
+                f"in {batches_count} batches, {elapsed:.2f} s"
+            )
+        )
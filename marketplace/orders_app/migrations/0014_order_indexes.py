@@ -0,0 +1,23 @@
+# Generated by Django 5.1.11 on 2026-10-17 06:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0013_alter_payment_options"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-createdAt"],
+                name="order_user_available_idx",
+                condition=models.Q(available=True),
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_orders_total_cost(apps, schema_editor):
+    """
+    Заполнение итоговой стоимости заказов, для которых она раньше
+    рассчитывалась только при первом просмотре заказа
+    """
+
+    Order = apps.get_model("orders_app", "Order")
+    OrderProduct = apps.get_model("orders_app", "OrderProduct")
+
+    products_cost = (
+        OrderProduct.objects.filter(order=OuterRef("pk"), price__isnull=False)
+        .order_by()
+        .values("order")
+        .annotate(
+            cost=Sum(
+                ExpressionWrapper(
+                    F("price") * F("count"),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                )
+            )
+        )
+        .values("cost")
+    )
+    Order.objects.filter(totalCost=0).update(
+        totalCost=Coalesce(
+            Subquery(products_cost),
+            Decimal("0.00"),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0014_order_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_orders_total_cost, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.11 on 2026-10-17 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0015_order_total_cost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="version",
+            field=models.PositiveIntegerField(default=0, verbose_name="Версия"),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.11 on 2026-10-17 07:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_orders_items_count(apps, schema_editor):
+    """Заполнение количества товаров в существующих заказах"""
+
+    Order = apps.get_model("orders_app", "Order")
+    OrderProduct = apps.get_model("orders_app", "OrderProduct")
+
+    items_count = (
+        OrderProduct.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(items_count=Sum("count"))
+        .values("items_count")
+    )
+    Order.objects.update(itemsCount=Coalesce(Subquery(items_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0016_order_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="order",
+            name="order_user_available_idx",
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="itemsCount",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество товаров"
+            ),
+        ),
+        migrations.RunPython(
+            fill_orders_items_count, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["user", "-createdAt", "-id"],
+                name="order_user_available_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,162 @@
+# Generated by Django 5.1.11 on 2026-10-17 07:06
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_order_status_counts(apps, schema_editor):
+    """
+    Заполнение счетчиков статусов по существующим заказам
+
+    * итоги продаж заполняются командой 'rebuild_sales_rollups'
+    """
+
+    Order = apps.get_model("orders_app", "Order")
+    OrderStatusCount = apps.get_model("orders_app", "OrderStatusCount")
+
+    OrderStatusCount.objects.bulk_create(
+        [
+            OrderStatusCount(status=row["status"], count=row["count"])
+            for row in Order.objects.order_by()
+            .values("status")
+            .annotate(count=Count("pk"))
+            if row["status"] is not None
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0017_order_items_count"),
+        ("products_app", "0009_product_popularity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True, verbose_name="День")),
+                (
+                    "orders_count",
+                    models.IntegerField(default=0, verbose_name="Количество заказов"),
+                ),
+                (
+                    "items_count",
+                    models.IntegerField(default=0, verbose_name="Количество товаров"),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=12,
+                        verbose_name="Выручка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Продажи за день",
+                "verbose_name_plural": "Продажи по дням",
+                "ordering": ["-day"],
+            },
+        ),
+        migrations.CreateModel(
+            name="OrderStatusCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("NEW", "new"),
+                            ("CONFIRMED", "confirmed"),
+                            ("AWAITING_PAYMENT", "awaiting_payment"),
+                            ("PAYMENT_ERROR", "payment_error"),
+                            ("PAIDED", "paided"),
+                        ],
+                        max_length=100,
+                        unique=True,
+                        verbose_name="Статус заказа",
+                    ),
+                ),
+                (
+                    "count",
+                    models.IntegerField(default=0, verbose_name="Количество заказов"),
+                ),
+            ],
+            options={
+                "verbose_name": "Количество заказов в статусе",
+                "verbose_name_plural": "Количество заказов по статусам",
+                "ordering": ["status"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyProductSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "units",
+                    models.IntegerField(default=0, verbose_name="Продано единиц"),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=12,
+                        verbose_name="Выручка",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="products_app.product",
+                        verbose_name="Товар",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Продажи товара за день",
+                "verbose_name_plural": "Продажи товаров по дням",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "product"), name="unique_daily_product_sales"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            fill_order_status_counts, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.11 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+STATUS_CHOICES = [
+    ("NEW", "new"),
+    ("CONFIRMED", "confirmed"),
+    ("AWAITING_PAYMENT", "awaiting_payment"),
+    ("PAYMENT_ERROR", "payment_error"),
+    ("PAIDED", "paided"),
+    ("CANCELED", "canceled"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0018_sales_rollups"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="status",
+            field=models.CharField(
+                choices=STATUS_CHOICES,
+                default="NEW",
+                max_length=100,
+                null=True,
+                verbose_name="Статус заказа",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderstatuscount",
+            name="status",
+            field=models.CharField(
+                choices=STATUS_CHOICES,
+                max_length=100,
+                unique=True,
+                verbose_name="Статус заказа",
+            ),
+        ),
+    ]
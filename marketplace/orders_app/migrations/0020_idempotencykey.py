@@ -0,0 +1,70 @@
+# Generated by Django 5.1.11 on 2026-10-17 12:30
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0019_order_canceled_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        max_length=64,
+                        verbose_name="Владелец ключа (пользователь или сессия)",
+                    ),
+                ),
+                ("key", models.CharField(max_length=40, verbose_name="Хэш ключа")),
+                (
+                    "fingerprint",
+                    models.CharField(max_length=40, verbose_name="Отпечаток запроса"),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(
+                        null=True, verbose_name="Код ответа"
+                    ),
+                ),
+                (
+                    "response_data",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        null=True,
+                        verbose_name="Данные ответа",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, db_index=True, verbose_name="Дата создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ключ идемпотентности",
+                "verbose_name_plural": "Ключи идемпотентности",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "key"),
+                        name="idempotency_key_scope_key_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -2,10 +2,16 @@ from decimal import Decimal
 from typing import Any
 
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.dispatch import Signal
 
 from products_app.models import Product
 
+# Смена статуса заказа методом 'Order.transition' (аргументы: instance,
+# previous_status); отправляется внутри транзакции, выполнившей переход
+order_status_changed = Signal()
+
 
 class Order(models.Model):
     """Модель заказа"""
@@ -34,6 +40,7 @@ class Order(models.Model):
         AWAITING_PAYMENT = ("AWAITING_PAYMENT", "awaiting_payment")
         PAYMENT_ERROR = ("PAYMENT_ERROR", "payment_error")
         PAIDED = ("PAIDED", "paided")
+        CANCELED = ("CANCELED", "canceled")
 
     class OrderDeliveryTypeChoices(OrderChoices):
         """Выбор способа доставки заказа"""
@@ -47,10 +54,55 @@ class Order(models.Model):
         ONLINE = ("ONLINE", "online")
         SOMEONE = ("SOMEONE", "someone")
 
+    # Переходы между статусами заказа: {действие: (исходные статусы, новый статус)}
+    TRANSITIONS = {
+        "confirm": (
+            (
+                OrderStatusChoices.NEW,
+                OrderStatusChoices.CONFIRMED,
+                OrderStatusChoices.AWAITING_PAYMENT,
+                OrderStatusChoices.PAYMENT_ERROR,
+            ),
+            OrderStatusChoices.CONFIRMED,
+        ),
+        "start_payment": (
+            (
+                OrderStatusChoices.CONFIRMED,
+                OrderStatusChoices.AWAITING_PAYMENT,
+                OrderStatusChoices.PAYMENT_ERROR,
+            ),
+            OrderStatusChoices.AWAITING_PAYMENT,
+        ),
+        "fail_payment": (
+            (OrderStatusChoices.AWAITING_PAYMENT,),
+            OrderStatusChoices.PAYMENT_ERROR,
+        ),
+        "pay": (
+            (OrderStatusChoices.AWAITING_PAYMENT,),
+            OrderStatusChoices.PAIDED,
+        ),
+        "cancel": (
+            (
+                OrderStatusChoices.NEW,
+                OrderStatusChoices.CONFIRMED,
+                OrderStatusChoices.AWAITING_PAYMENT,
+                OrderStatusChoices.PAYMENT_ERROR,
+            ),
+            OrderStatusChoices.CANCELED,
+        ),
+    }
+
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ["-createdAt"]
+        indexes = [
+            models.Index(
+                fields=["user", "-createdAt", "-id"],
+                name="order_user_available_idx",
+                condition=models.Q(available=True),
+            ),
+        ]
 
     user = models.ForeignKey(
         User,
@@ -119,17 +171,62 @@ class Order(models.Model):
         default=True,
         verbose_name="Доступен",
     )
+    itemsCount = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Количество товаров",
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Версия",
+    )
 
     @property
     def is_paided(self) -> bool:
         """Свойство проверяющее оплачен ли заказ"""
         return self.status == Order.OrderStatusChoices.PAIDED
 
+    def transition(self, action: str, **fields: Any) -> bool:
+        """
+        Переход заказа в новый статус по таблице 'TRANSITIONS'
+
+        * переход выполняется одним запросом UPDATE с условием на статус
+          и версию заказа и изменяет только статус, версию и поля 'fields'
+        * если заказ уже в новом статусе с теми же значениями полей,
+          запрос не выполняется (повторный запрос - пустая операция)
+        * возвращает False, если переход из текущего статуса запрещен
+          или заказ был изменен параллельным запросом
+        """
+
+        sources, target = self.TRANSITIONS[action]
+        if self.status == target and all(
+            getattr(self, name) == value for name, value in fields.items()
+        ):
+            return True
+        if self.status not in sources:
+            return False
+
+        updated = Order.objects.filter(
+            pk=self.pk, status=self.status, version=self.version
+        ).update(status=target, version=models.F("version") + 1, **fields)
+        if not updated:
+            return False
+
+        previous_status = self.status
+        self.status = target
+        self.version += 1
+        for name, value in fields.items():
+            setattr(self, name, value)
+        if previous_status != target:
+            order_status_changed.send(
+                sender=Order, instance=self, previous_status=previous_status
+            )
+        return True
+
     def delete(self, *args: Any, **kwargs: Any) -> None:
         """Вместо удаления помечаем как недоступный"""
 
         self.available = False
-        self.save()
+        self.save(update_fields=["available"])
 
     def __str__(self) -> str:
         return f"Заказ № {self.id}"
@@ -252,3 +349,116 @@ class Delivery(models.Model):
         default=2000,
         verbose_name="Стоимость заказа для бесплатной доставки",
     )
+
+
+class DailySales(models.Model):
+    """
+    Модель итогов продаж за день
+
+    * учитываются заказы, перешедшие в статус 'PAIDED' в этот день
+    """
+
+    class Meta:
+        verbose_name = "Продажи за день"
+        verbose_name_plural = "Продажи по дням"
+        ordering = ["-day"]
+
+    day = models.DateField(unique=True, verbose_name="День")
+    orders_count = models.IntegerField(default=0, verbose_name="Количество заказов")
+    items_count = models.IntegerField(default=0, verbose_name="Количество товаров")
+    revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        verbose_name="Выручка",
+    )
+
+    def __str__(self) -> str:
+        return f"Продажи за {self.day}"
+
+
+class DailyProductSales(models.Model):
+    """Модель продаж товара за день (по оплаченным заказам)"""
+
+    class Meta:
+        verbose_name = "Продажи товара за день"
+        verbose_name_plural = "Продажи товаров по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product"], name="unique_daily_product_sales"
+            ),
+        ]
+
+    day = models.DateField(verbose_name="День")
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="daily_sales",
+        verbose_name="Товар",
+    )
+    units = models.IntegerField(default=0, verbose_name="Продано единиц")
+    revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        verbose_name="Выручка",
+    )
+
+    def __str__(self) -> str:
+        return f"Продажи товара {self.product_id} за {self.day}"
+
+
+class OrderStatusCount(models.Model):
+    """Модель количества заказов в каждом статусе"""
+
+    class Meta:
+        verbose_name = "Количество заказов в статусе"
+        verbose_name_plural = "Количество заказов по статусам"
+        ordering = ["status"]
+
+    status = models.CharField(
+        choices=Order.OrderStatusChoices.choices,
+        max_length=100,
+        unique=True,
+        verbose_name="Статус заказа",
+    )
+    count = models.IntegerField(default=0, verbose_name="Количество заказов")
+
+    def __str__(self) -> str:
+        return f"{self.get_status_display()}: {self.count}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Модель записи о запросе с заголовком 'Idempotency-Key'
+
+    * пара (scope, key) уникальна: запрос захватывает ключ вставкой
+      строки, поэтому из параллельных запросов с одним ключом
+      выполняется только один
+    * запись без 'status_code' означает, что запрос еще выполняется
+    """
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "key"], name="idempotency_key_scope_key_unique"
+            ),
+        ]
+
+    scope = models.CharField(
+        max_length=64, verbose_name="Владелец ключа (пользователь или сессия)"
+    )
+    key = models.CharField(max_length=40, verbose_name="Хэш ключа")
+    fingerprint = models.CharField(max_length=40, verbose_name="Отпечаток запроса")
+    status_code = models.PositiveSmallIntegerField(null=True, verbose_name="Код ответа")
+    response_data = models.JSONField(
+        null=True, encoder=DjangoJSONEncoder, verbose_name="Данные ответа"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name="Дата создания"
+    )
+
+    def __str__(self) -> str:
+        return f"{self.scope}: {self.key}"
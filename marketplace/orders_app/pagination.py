@@ -0,0 +1,7 @@
+from products_app.pagination import KeysetPagination
+
+
+class OrderCursorPagination(KeysetPagination):
+    """Пагинация истории заказов по курсору (createdAt, id)"""
+
+    page_size_query_param = "limit"
@@ -60,30 +60,39 @@ class OrderDeliveryInfoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("address is required")
         return value
 
-    def update(self, instance, validated_data):
-        """Обновление заказа сведениями о доставке"""
+    def get_order_fields(self) -> dict:
+        """
+        Значения полей заказа по провалидированным данным
 
-        instance.fullName = validated_data.get("fullName", instance.fullName)
-        instance.email = validated_data.get("email", instance.email)
-        instance.phone = validated_data.get("phone", instance.phone)
-        instance.city = validated_data.get("city", instance.city)
-        instance.address = validated_data.get("address", instance.address)
+        * названия способов доставки и оплаты заменяются их значениями
+        """
+
+        fields = {
+            name: self.validated_data[name]
+            for name in ("fullName", "email", "phone", "city", "address")
+            if name in self.validated_data
+        }
 
-        delivery_type_label = validated_data.get("deliveryType")
+        delivery_type_label = self.validated_data.get("deliveryType")
         if delivery_type_label:
-            delivery_type_value = Order.OrderDeliveryTypeChoices.get_value_by_label(
+            fields["deliveryType"] = Order.OrderDeliveryTypeChoices.get_value_by_label(
                 delivery_type_label
             )
-            instance.deliveryType = delivery_type_value
 
-        payment_type_label = validated_data.get("paymentType")
+        payment_type_label = self.validated_data.get("paymentType")
         if payment_type_label:
-            payment_type_value = Order.OrderPaymentTypeChoices.get_value_by_label(
+            fields["paymentType"] = Order.OrderPaymentTypeChoices.get_value_by_label(
                 payment_type_label
             )
-            instance.paymentType = payment_type_value
+        return fields
 
-        instance.save()
+    def update(self, instance, validated_data):
+        """Обновление заказа сведениями о доставке"""
+
+        fields = self.get_order_fields()
+        for name, value in fields.items():
+            setattr(instance, name, value)
+        instance.save(update_fields=list(fields))
         return instance
 
 
@@ -106,6 +115,10 @@ class OrderSerializer(serializers.ModelSerializer):
             "address",
             "products",
         ]
+        # Связи, используемые полями 'SerializerMethodField'
+        prefetch_hints = {
+            "products": [("products__product", ProductShortSerializer)],
+        }
 
     deliveryType = serializers.CharField(
         source="get_deliveryType_display", read_only=True
@@ -145,6 +158,26 @@ class OrderSerializer(serializers.ModelSerializer):
         return products
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """
+    Краткий сериализатор заказа для истории заказов
+
+    * использует только столбцы заказа, без загрузки товаров в заказе
+    """
+
+    class Meta:
+        model = Order
+        fields = ["id", "createdAt", "status", "totalCost", "itemsCount"]
+
+    status = serializers.CharField(source="get_status_display", read_only=True)
+    totalCost = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        coerce_to_string=False,
+        read_only=True,
+    )
+
+
 class PaymentPayloadSerializer(serializers.ModelSerializer):
     """Сериализатор данных об оплате из запроса"""
 
@@ -251,10 +284,8 @@ class PaymentSerializer(serializers.ModelSerializer):
         if len(value) == 2:
             value = "20" + value
         if not len(value) == 4:
-            raise serializers.ValidationError(
-                "Is not a valid length. \
-                Place 4 digits or last 2 digits of the year"
-            )
+            raise serializers.ValidationError("Is not a valid length. \
+                Place 4 digits or last 2 digits of the year")
         if int(value) > datetime.now().year:
             raise serializers.ValidationError(
                 "Year cannot be greater than current year"
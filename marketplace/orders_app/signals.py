@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from orders_app.analytics import record_paid_order, update_status_counts
+from orders_app.models import Order, order_status_changed
+
+
+@receiver(post_save, sender=Order)
+def count_created_order_status(
+    sender, instance: Order, created: bool, raw: bool = False, **kwargs
+) -> None:
+    """Учет нового заказа в счетчиках статусов"""
+
+    if created and not raw and instance.status is not None:
+        update_status_counts(None, instance.status)
+
+
+@receiver(order_status_changed, sender=Order)
+def update_sales_rollups_on_status_change(
+    sender, instance: Order, previous_status: str | None, **kwargs
+) -> None:
+    """
+    Обновление итогов продаж при смене статуса заказа
+
+    * заказ переносится между счетчиками статусов
+    * оплаченный заказ добавляется в итоги продаж за день
+    """
+
+    update_status_counts(previous_status, instance.status)
+    if instance.status == Order.OrderStatusChoices.PAIDED:
+        record_paid_order(instance)
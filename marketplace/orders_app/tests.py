@@ -1,13 +1,38 @@
+import csv
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+
 from faker import Faker
 
+from django.db import connection
 from django.db.models.query_utils import Q
 from django.test import TestCase
 from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.utils import timezone
 from django.urls import reverse
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from mainsite.idempotency import idempotent
 
-from orders_app.models import Order
+from orders_app.models import (
+    DailyProductSales,
+    DailySales,
+    IdempotencyKey,
+    Order,
+    OrderProduct,
+    OrderStatusCount,
+)
+from orders_app.utils import cancel_order
 from products_app.models import Product
+from products_app.pricing import get_product_prices
 
 
 class OrdersTests(TestCase):
@@ -28,10 +53,63 @@ class OrdersTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_orders_list_queries_do_not_depend_on_orders_count(self):
+        """Тест - количество запросов списка заказов не зависит от числа заказов"""
+
+        path = reverse("orders_app:orders_list_or_create")
+        with CaptureQueriesContext(connection) as initial_queries:
+            self.test_client.get(path=path)
+
+        user = User.objects.first()
+        for product in Product.objects.all()[:3]:
+            order = Order.objects.create(user=user, totalCost=product.price)
+            OrderProduct.objects.create(
+                order=order, product=product, count=1, price=product.price
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.test_client.get(path=path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), len(initial_queries))
+
+    def test_orders_summary_is_paginated_by_cursor(self):
+        """Тест - краткая история заказов выдается страницами по курсору"""
+
+        user = User.objects.first()
+        Order.objects.filter(user=user).update(available=False)
+        orders = [
+            Order.objects.create(user=user, totalCost=number, itemsCount=number)
+            for number in range(1, 4)
+        ]
+        path = reverse("orders_app:orders_list_or_create")
+
+        with CaptureQueriesContext(connection) as queries:
+            first_page = self.test_client.get(path, {"cursor": "", "limit": 2}).json()
+        self.assertFalse(
+            any(
+                OrderProduct._meta.db_table in query["sql"]
+                for query in queries.captured_queries
+            )
+        )
+        second_page = self.test_client.get(
+            path, {"cursor": first_page["nextCursor"], "limit": 2}
+        ).json()
+
+        self.assertEqual(
+            [item["id"] for item in first_page["items"] + second_page["items"]],
+            [order.id for order in reversed(orders)],
+        )
+        self.assertEqual(
+            set(first_page["items"][0]),
+            {"id", "createdAt", "status", "totalCost", "itemsCount"},
+        )
+        self.assertEqual(first_page["items"][0]["itemsCount"], 3)
+        self.assertIsNone(second_page["nextCursor"])
+
     def test_can_create_order(self):
         """Тест - возможно создать заказ"""
 
-        product = Product.objects.first()
+        product = Product.objects.filter(available=True, count__gte=1).first()
         payload = [
             {
                 "id": product.id,
@@ -45,6 +123,207 @@ class OrdersTests(TestCase):
             content_type="application/json",
         )
         self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get(pk=response.json()["orderId"]).itemsCount, 1)
+
+        # Цена товара в заказе берется из сервиса цен, а не из запроса
+        order_product = OrderProduct.objects.get(order_id=response.json()["orderId"])
+        self.assertEqual(
+            order_product.price, get_product_prices([product.pk])[product.pk].price
+        )
+
+    def test_order_creation_with_idempotency_key_is_replayed(self):
+        """
+        Тест - повторный запрос создания заказа с тем же ключом идемпотентности
+        возвращает исходный ответ и не создает новый заказ
+        """
+
+        product = Product.objects.filter(available=True, count__gte=1).first()
+        payload = [{"id": product.id, "count": 1, "price": 200}]
+        path = reverse("orders_app:orders_list_or_create")
+        key = uuid.uuid4().hex
+
+        first = self.test_client.post(
+            path=path,
+            data=payload,
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+        orders_count = Order.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.test_client.post(
+                path=path,
+                data=payload,
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY=key,
+            )
+        other = self.test_client.post(
+            path=path,
+            data=[{"id": product.id, "count": 2, "price": 200}],
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertFalse(
+            any(
+                Order._meta.db_table in query["sql"]
+                for query in queries.captured_queries
+            )
+        )
+        self.assertEqual(Order.objects.count(), orders_count)
+        self.assertEqual(other.status_code, 422)
+
+    def test_concurrent_idempotent_requests_run_once(self):
+        """
+        Тест - из двух одновременных запросов с одним ключом идемпотентности
+        выполняется только первый, второй получает 409
+        """
+
+        factory = APIRequestFactory()
+        user = User.objects.first()
+        calls, concurrent_responses = [], []
+
+        def make_request():
+            request = factory.post(
+                "/", {"value": 1}, format="json", HTTP_IDEMPOTENCY_KEY="race"
+            )
+            force_authenticate(request, user=user)
+            return request
+
+        class RaceView(APIView):
+            @idempotent
+            def post(self, request):
+                calls.append(request)
+                if len(calls) == 1:
+                    # Второй запрос приходит, пока первый еще выполняется
+                    concurrent_responses.append(RaceView.as_view()(make_request()))
+                return Response({"done": True}, status=201)
+
+        first = RaceView.as_view()(make_request())
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(concurrent_responses[0].status_code, 409)
+
+        replayed = RaceView.as_view()(make_request())
+        self.assertEqual(replayed.status_code, 201)
+        self.assertEqual(replayed.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            IdempotencyKey.objects.filter(scope=f"user:{user.pk}").count(), 1
+        )
+
+    def test_anonymous_idempotency_keys_are_scoped_by_session(self):
+        """Тест - одинаковые ключи разных анонимных сессий не пересекаются"""
+
+        product = Product.objects.filter(available=True, count__gte=2).first()
+        path = reverse("orders_app:orders_list_or_create")
+        responses = [
+            Client().post(
+                path=path,
+                data=[{"id": product.id, "count": 1, "price": 200}],
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="shared-key",
+            )
+            for _ in range(2)
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertNotEqual(
+            responses[0].json()["orderId"], responses[1].json()["orderId"]
+        )
+        self.assertNotIn("Idempotent-Replayed", responses[1].headers)
+
+    def test_order_creation_reserves_stock(self):
+        """
+        Тест - создание заказа резервирует товар на складе, при нехватке
+        товара заказ не создается
+        """
+
+        first, second = Product.objects.filter(available=True)[:2]
+        Product.objects.filter(pk__in=[first.pk, second.pk]).update(count=3)
+        path = reverse("orders_app:orders_list_or_create")
+        orders_count = Order.objects.count()
+
+        response = self.test_client.post(
+            path=path,
+            data=[
+                {"id": first.pk, "count": 1, "price": 1},
+                {"id": second.pk, "count": 2, "price": 1},
+                {"id": first.pk, "count": 1, "price": 1},
+            ],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.json()["orderId"])
+        prices = get_product_prices([first.pk, second.pk])
+        self.assertEqual(
+            order.totalCost, prices[first.pk].price * 2 + prices[second.pk].price * 2
+        )
+        self.assertEqual(
+            dict(order.products.values_list("product_id", "count")),
+            {first.pk: 2, second.pk: 2},
+        )
+
+        response = self.test_client.post(
+            path=path,
+            data=[
+                {"id": first.pk, "count": 1, "price": 1},
+                {"id": second.pk, "count": 2, "price": 1},
+            ],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), orders_count + 1)
+        self.assertEqual(
+            dict(
+                Product.objects.filter(pk__in=[first.pk, second.pk]).values_list(
+                    "pk", "count"
+                )
+            ),
+            {first.pk: 1, second.pk: 1},
+        )
+
+    def test_expired_orders_release_stock(self):
+        """
+        Тест - неоплаченный заказ с истекшим сроком резервирования отменяется
+        и возвращает товары на склад один раз
+        """
+
+        # Устаревшие заказы из фикстуры отменяются заранее
+        call_command("cancel_expired_orders", stdout=io.StringIO())
+        product = Product.objects.filter(available=True).first()
+        Product.objects.filter(pk=product.pk).update(count=3)
+        response = self.test_client.post(
+            path=reverse("orders_app:orders_list_or_create"),
+            data=[{"id": product.pk, "count": 2, "price": 1}],
+            content_type="application/json",
+        )
+        order = Order.objects.get(pk=response.json()["orderId"])
+        product.refresh_from_db()
+        self.assertEqual(product.count, 1)
+
+        call_command("cancel_expired_orders", stdout=io.StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatusChoices.NEW)
+
+        Order.objects.filter(pk=order.pk).update(
+            createdAt=timezone.now() - datetime.timedelta(days=2)
+        )
+        output = io.StringIO()
+        call_command("cancel_expired_orders", stdout=output)
+        self.assertIn("Canceled 1 orders", output.getvalue())
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatusChoices.CANCELED)
+        product.refresh_from_db()
+        self.assertEqual(product.count, 3)
+
+        self.assertFalse(cancel_order(order))
+        call_command("cancel_expired_orders", stdout=io.StringIO())
+        product.refresh_from_db()
+        self.assertEqual(product.count, 3)
 
     def test_can_get_order_by_id(self):
         """Тест - возможно получить заказ по его 'id"""
@@ -82,3 +361,241 @@ class OrdersTests(TestCase):
             content_type="application/json",
         )
         self.assertEqual(response.status_code, 202)
+
+    def test_repeated_confirmation_does_not_change_order(self):
+        """Тест - повторное подтверждение с теми же данными не изменяет заказ"""
+
+        user_data = {
+            "fullName": "Иван Иванов",
+            "email": "ivan@example.com",
+            "phone": "89990000000",
+            "deliveryType": "ordinary",
+            "paymentType": "online",
+            "city": "Москва",
+            "address": "Тверская, 1",
+        }
+        order = Order.objects.filter(~Q(status="PAIDED")).last()
+        path = reverse("orders_app:get_or_update_order", kwargs={"id": order.id})
+
+        response = self.test_client.post(
+            path=path, data=user_data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 202)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatusChoices.CONFIRMED)
+        version = order.version
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.test_client.post(
+                path=path, data=user_data, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 202)
+        order.refresh_from_db()
+        self.assertEqual(order.version, version)
+        self.assertFalse(
+            any(
+                query["sql"].startswith(f'UPDATE "{Order._meta.db_table}"')
+                for query in queries.captured_queries
+            )
+        )
+
+    def test_stale_order_transition_is_rejected(self):
+        """Тест - переход по устаревшей версии заказа не выполняется"""
+
+        order = Order.objects.create(status=Order.OrderStatusChoices.CONFIRMED)
+        stale_order = Order.objects.get(pk=order.pk)
+
+        self.assertTrue(order.transition("start_payment"))
+        self.assertFalse(stale_order.transition("start_payment"))
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatusChoices.AWAITING_PAYMENT)
+        self.assertEqual(order.version, 1)
+
+    def test_repeated_payment_returns_existing_payment(self):
+        """Тест - повторная оплата возвращает уже созданную оплату"""
+
+        order = Order.objects.create(status=Order.OrderStatusChoices.CONFIRMED)
+        payment_data = {
+            "number": "12345678",
+            "name": "Ivan Ivanov",
+            "month": "03",
+            "year": "2020",
+            "code": "123",
+        }
+        path = reverse("orders_app:payment_api", kwargs={"id": order.id})
+
+        first = self.test_client.post(
+            path=path, data=payment_data, content_type="application/json"
+        )
+        second = self.test_client.post(
+            path=path, data=payment_data, content_type="application/json"
+        )
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.data, second.data)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.OrderStatusChoices.PAIDED)
+        self.assertEqual(order.version, 2)
+
+
+class OrdersExportTests(TestCase):
+    fixtures = ["db_data_fixture.json"]
+
+    def test_export_orders_ndjson_from_admin(self):
+        """Тест - выбранные заказы выгружаются из админки в NDJSON"""
+
+        admin = User.objects.create_superuser("export_admin")
+        admin.groups.add(Group.objects.get_or_create(name="admins")[0])
+        self.client.force_login(admin)
+        orders = list(Order.objects.order_by("pk")[:3])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("admin:orders_app_order_changelist"),
+                {
+                    "action": "export_orders_ndjson",
+                    "_selected_action": [order.pk for order in orders],
+                },
+            )
+            content = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([record["id"] for record in records], [o.pk for o in orders])
+        self.assertEqual(
+            [len(record["products"]) for record in records],
+            [order.products.count() for order in orders],
+        )
+        # Товары загружаются одним запросом на порцию заказов
+        self.assertEqual(
+            sum(
+                query["sql"].startswith("SELECT")
+                and f'FROM "{OrderProduct._meta.db_table}"' in query["sql"]
+                for query in queries.captured_queries
+            ),
+            1,
+        )
+
+    def test_export_orders_csv_command(self):
+        """Тест - заказы выгружаются командой в CSV, по строке на товар"""
+
+        output = io.StringIO()
+        call_command("export_orders", format="csv", chunk_size=2, stdout=output)
+
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        expected_rows = sum(
+            max(order.products.count(), 1) for order in Order.objects.all()
+        )
+        self.assertEqual(len(rows), expected_rows)
+
+    def test_export_orders_csv_escapes_formulas(self):
+        """Тест - значения, похожие на формулы, экранируются в CSV"""
+
+        order = Order.objects.first()
+        Order.objects.filter(pk=order.pk).update(
+            fullName='=HYPERLINK("http://evil")', address="-1+2", city="@SUM(A1)"
+        )
+
+        output = io.StringIO()
+        call_command("export_orders", format="csv", stdout=output)
+        row = next(
+            row
+            for row in csv.DictReader(io.StringIO(output.getvalue()))
+            if row["id"] == str(order.pk)
+        )
+        self.assertEqual(row["fullName"], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(row["address"], "'-1+2")
+        self.assertEqual(row["city"], "'@SUM(A1)")
+        self.assertEqual(row["totalCost"], str(order.totalCost))
+
+
+class SalesRollupsTests(TestCase):
+    fixtures = ["db_data_fixture.json"]
+
+    def pay_order(self, order: Order) -> None:
+        """Оплата заказа через API"""
+
+        client = Client()
+        client.force_login(User.objects.first())
+        response = client.post(
+            path=reverse("orders_app:payment_api", kwargs={"id": order.id}),
+            data={
+                "number": "12345678",
+                "name": "Ivan Ivanov",
+                "month": "03",
+                "year": "2020",
+                "code": "123",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def get_status_count(self, status: str) -> int:
+        """Значение счетчика заказов в статусе"""
+
+        row = OrderStatusCount.objects.filter(status=status).first()
+        return row.count if row else 0
+
+    def test_paid_order_updates_rollups(self):
+        """Тест - оплата заказа обновляет итоги продаж и счетчики статусов"""
+
+        product = Product.objects.first()
+        order = Order.objects.create(
+            status=Order.OrderStatusChoices.CONFIRMED,
+            totalCost=Decimal("300.00"),
+            itemsCount=3,
+        )
+        OrderProduct.objects.create(
+            order=order, product=product, count=3, price=Decimal("100.00")
+        )
+        confirmed = self.get_status_count(Order.OrderStatusChoices.CONFIRMED)
+        paided = self.get_status_count(Order.OrderStatusChoices.PAIDED)
+
+        self.pay_order(order)
+        self.pay_order(order)
+
+        today = timezone.localdate()
+        daily_sales = DailySales.objects.get(day=today)
+        self.assertEqual(
+            (daily_sales.orders_count, daily_sales.items_count, daily_sales.revenue),
+            (1, 3, Decimal("300.00")),
+        )
+        product_sales = DailyProductSales.objects.get(day=today, product=product)
+        self.assertEqual(
+            (product_sales.units, product_sales.revenue), (3, Decimal("300.00"))
+        )
+        self.assertEqual(
+            self.get_status_count(Order.OrderStatusChoices.CONFIRMED), confirmed - 1
+        )
+        self.assertEqual(
+            self.get_status_count(Order.OrderStatusChoices.PAIDED), paided + 1
+        )
+
+    def test_rebuild_sales_rollups(self):
+        """Тест - пересчет итогов совпадает с данными заказов"""
+
+        call_command("rebuild_sales_rollups", batch_size=2, stdout=io.StringIO())
+
+        paid_orders = Order.objects.filter(status=Order.OrderStatusChoices.PAIDED)
+        self.assertEqual(
+            sum(DailySales.objects.values_list("orders_count", flat=True)),
+            paid_orders.count(),
+        )
+        self.assertEqual(
+            sum(DailyProductSales.objects.values_list("units", flat=True)),
+            sum(
+                OrderProduct.objects.filter(order__in=paid_orders).values_list(
+                    "count", flat=True
+                )
+            ),
+        )
+        self.assertEqual(
+            sum(OrderStatusCount.objects.values_list("count", flat=True)),
+            Order.objects.count(),
+        )
+
+        admin = User.objects.create_superuser("dashboard_admin")
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse("admin:orders_sales_dashboard"))
+        self.assertEqual(response.status_code, 200)
@@ -1,10 +1,35 @@
+import datetime
+from collections import Counter
+from decimal import Decimal
+from typing import Iterator
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
 from django.http.response import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
 from rest_framework.response import Response
 
+from mainsite.cache_utils import invalidate_model_cache
 from mainsite.main_logger import logger
-from orders_app.models import Order, Delivery
+from orders_app.models import Order, OrderProduct, Delivery
+from products_app.models import Product
+from products_app.pricing import get_product_prices
+from products_app.utils import update_product_popularity
+
+# Количество заказов, проверяемых за один запрос при отмене устаревших заказов
+SWEEP_BATCH_SIZE = 500
+
+
+class OutOfStockError(Exception):
+    """Недостаточно товара на складе для резервирования"""
+
+    def __init__(self, product_id: int):
+        super().__init__(product_id)
+        self.product_id = product_id
 
 
 def get_order_by_id(order_id: int) -> Order | Response:
@@ -32,38 +57,209 @@ def update_order_with_user_data(order: Order, user: User) -> Order:
     order.fullName = user.profile.fullName
     order.email = user.email
     order.phone = user.profile.phone
-    order.save()
+    order.save(update_fields=["user", "fullName", "email", "phone"])
     return order
 
 
-def update_order_total_cost_with_product_cost(order: Order) -> Order:
-    """Обновляем итоговую стоимость заказа с учетом стоимости товаров в заказе"""
+def get_order_products_cost(order: Order) -> Decimal:
+    """Стоимость товаров в заказе"""
 
-    total_price = 0
-    for product in order.products.all():
-        total_price += product.price * product.count
-    order.totalCost = total_price
-    order.save()
-    return order
+    order_products = list(order.products.values_list("product_id", "count", "price"))
+
+    # Для товаров без сохраненной цены используется текущая цена товара
+    prices = get_product_prices(
+        product_id for product_id, _, price in order_products if price is None
+    )
 
+    total_price = Decimal(0)
+    for product_id, count, price in order_products:
+        if price is None:
+            price = prices[product_id].price
+        total_price += price * count
+    return total_price
 
-def update_order_total_cost_with_delivery_price(order: Order) -> Order:
-    """Обновляем итоговую стоимость заказа с учетом стоимости доставки"""
+
+def get_order_cost_with_delivery(products_cost: Decimal, delivery_type: str) -> Decimal:
+    """Стоимость заказа с учетом стоимости доставки"""
 
     delivery = Delivery.objects.first()
 
     # Если стоимость заказа больше 'free_delivery_price', то доставка бесплатная
-    if order.totalCost > delivery.free_delivery_price:
-        total_cost = order.totalCost
+    if products_cost > delivery.free_delivery_price:
+        total_cost = products_cost
     # в противном случае добавляем к стоимости заказа стоимость обычной доставки
     else:
-        total_cost = order.totalCost + delivery.ordinary_price
+        total_cost = products_cost + delivery.ordinary_price
 
     # Если выбрана экспресс доставка, то доплачиваем за неё
-    if order.deliveryType == Order.OrderDeliveryTypeChoices.EXPRESS.value:
+    if delivery_type == Order.OrderDeliveryTypeChoices.EXPRESS.value:
         total_cost += delivery.express_price
+    return total_cost
+
+
+def apply_order_transition(order: Order, action: str, **fields) -> bool:
+    """
+    Переход заказа в новый статус
+
+    * если заказ был изменен параллельным запросом, он перечитывается
+      и переход повторяется один раз: повторный запрос с теми же данными
+      становится пустой операцией, иначе возвращается False
+    """
+
+    if order.transition(action, **fields):
+        return True
+    order.refresh_from_db()
+    return order.transition(action, **fields)
+
+
+def reserve_products(quantities: dict[int, int]) -> None:
+    """
+    Резервирование товаров на складе
+
+    * остаток уменьшается условным запросом UPDATE, который не изменяет
+      строку, если товара недостаточно или он недоступен; в этом случае
+      выбрасывается OutOfStockError и транзакция откатывается
+    * товары обрабатываются по возрастанию 'id', чтобы параллельные
+      заказы блокировали строки в одном порядке
+    """
+
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        reserved = Product.objects.filter(
+            pk=product_id, available=True, count__gte=quantity
+        ).update(count=F("count") - quantity)
+        if not reserved:
+            raise OutOfStockError(product_id)
+
+
+def release_products(quantities: dict[int, int]) -> None:
+    """
+    Возврат зарезервированных товаров на склад
+
+    * остаток увеличивается запросом UPDATE на стороне базы данных,
+      товары обрабатываются по возрастанию 'id', как при резервировании
+    """
+
+    for product_id in sorted(quantities):
+        Product.objects.filter(pk=product_id).update(
+            count=F("count") + quantities[product_id]
+        )
+
+
+def cancel_order(order: Order) -> bool:
+    """
+    Отмена неоплаченного заказа с возвратом товаров на склад
+
+    * переход и возврат товаров выполняются в одной транзакции; переход
+      не повторяется после перечитывания заказа, поэтому при параллельной
+      отмене товары возвращаются только один раз
+    * возвращает False, если заказ уже отменен, оплачен или изменен
+      параллельным запросом
+    """
+
+    if order.status == Order.OrderStatusChoices.CANCELED:
+        return False
+    with transaction.atomic():
+        if not order.transition("cancel"):
+            return False
+        release_products(
+            dict(order.products.values_list("product_id", "count").order_by())
+        )
+        # UPDATE не вызывает сигналов, версию товаров для кэша меняем явно
+        invalidate_model_cache(Product)
+    logger.debug("Order №%s canceled, products released", order.id)
+    return True
+
+
+def sweep_expired_orders(
+    batch_size: int, now: datetime.datetime | None = None
+) -> Iterator[int]:
+    """
+    Отмена неоплаченных заказов старше 'ORDER_RESERVATION_MAX_AGE' секунд
+
+    * заказы перебираются пачками по возрастанию 'id', каждый заказ
+      отменяется в своей транзакции
+    * возвращается количество отмененных заказов в каждой пачке
+    """
+
+    now = now or timezone.now()
+    expired = Order.objects.filter(
+        status__in=Order.TRANSITIONS["cancel"][0],
+        createdAt__lt=now
+        - datetime.timedelta(seconds=settings.ORDER_RESERVATION_MAX_AGE),
+    ).order_by("pk")
+    last_pk = 0
+    while orders := list(expired.filter(pk__gt=last_pk)[:batch_size]):
+        last_pk = orders[-1].pk
+        yield sum(cancel_order(order) for order in orders)
+
+
+def create_order_from_items(items: list[dict]) -> Order | Response:
+    """
+    Создание заказа по товарам из корзины одной транзакцией
+
+    * цены товаров берутся из сервиса цен, а не из запроса
+    * повторяющиеся товары объединяются, товары заказа создаются
+      одним запросом, итоговая стоимость рассчитывается сразу
+    * при нехватке товара заказ не создается и возвращается ответ 409
+    """
+
+    quantities: Counter[int] = Counter()
+    for item in items:
+        quantities[item["id"]] += item["count"]
+
+    prices = get_product_prices(quantities)
+    missing_ids = sorted(set(quantities) - set(prices))
+    if missing_ids:
+        logger.error("Products %s not found", missing_ids)
+        return Response(
+            {"id": [f"Product {product_id} not found" for product_id in missing_ids]},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    for item in items:
+        if prices[item["id"]].price != item["price"]:
+            logger.warning(
+                "Product %s price from basket %s differs from actual price %s",
+                item["id"],
+                item["price"],
+                prices[item["id"]].price,
+            )
+
+    total_cost = sum(
+        (prices[product_id].price * count for product_id, count in quantities.items()),
+        Decimal("0.00"),
+    )
+    try:
+        with transaction.atomic():
+            reserve_products(quantities)
+            order = Order.objects.create(
+                status=Order.OrderStatusChoices.NEW,
+                totalCost=total_cost,
+                itemsCount=sum(quantities.values()),
+            )
+            OrderProduct.objects.bulk_create(
+                [
+                    OrderProduct(
+                        order=order,
+                        product_id=product_id,
+                        count=count,
+                        price=prices[product_id].price,
+                    )
+                    for product_id, count in quantities.items()
+                ]
+            )
+            # bulk_create и update не вызывают сигналов: обновляем популярность
+            # товаров и версию товаров для кэша (в карточках есть остаток)
+            today = timezone.localdate()
+            for product_id in quantities:
+                update_product_popularity(product_id, today, 1)
+            invalidate_model_cache(Product)
+    except OutOfStockError as exc:
+        logger.error("Product %s is out of stock", exc.product_id)
+        return Response(
+            {"id": f"Product {exc.product_id} is out of stock"},
+            status=status.HTTP_409_CONFLICT,
+        )
 
-    # Присваиваем итоговую стоимость заказу
-    order.totalCost = total_cost
-    order.save()
+    logger.debug("Order №%s created. Need to specify the order details", order.id)
     return order
@@ -1,42 +1,43 @@
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 from drf_spectacular import utils
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
+from mainsite.idempotency import IDEMPOTENCY_KEY_PARAMETER, idempotent
 from mainsite.main_logger import logger
-from orders_app.handle_cases import handle_already_paided
+from orders_app.handle_cases import (
+    handle_already_paided,
+    handle_transition_conflict,
+)
 from mainsite.handle_errors import handle_serializer_not_valid
-from orders_app.models import Order, OrderProduct
+from mainsite.prefetch import SerializerPrefetchMixin, prefetch_for_serializer
+from orders_app.models import Order, Payment
+from orders_app.pagination import OrderCursorPagination
 from orders_app.serializers import (
     ItemsFromBasketSerializer,
     OrderDeliveryInfoSerializer,
     OrderSerializer,
+    OrderSummarySerializer,
     PaymentSerializer,
     PaymentPayloadSerializer,
 )
 from orders_app.utils import (
+    apply_order_transition,
+    create_order_from_items,
     update_order_with_user_data,
-    update_order_total_cost_with_product_cost,
     get_order_by_id,
-    update_order_total_cost_with_delivery_price,
+    get_order_cost_with_delivery,
+    get_order_products_cost,
 )
-from products_app.models import Product
 
 
-class OrdersListCreateApiView(generics.ListCreateAPIView):
+class OrdersListCreateApiView(SerializerPrefetchMixin, generics.ListCreateAPIView):
     """Представление для получения списка заказов или создания заказа"""
 
-    queryset = Order.objects.prefetch_related(
-        "user",
-        "products",
-        "products__product",
-        "products__product__category",
-        "products__product__tags",
-        "products__product__images",
-        "products__product__reviews",
-    )
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     http_method_names = ["get", "post"]
 
@@ -49,8 +50,22 @@ class OrdersListCreateApiView(generics.ListCreateAPIView):
 
     @utils.extend_schema(
         tags=["order"],
-        description="Get orders",
+        description="Get orders. With the 'cursor' parameter (an empty value "
+        "for the first page) returns a page of order summaries",
         summary="Get orders",
+        parameters=[
+            utils.OpenApiParameter(
+                name="cursor",
+                type=str,
+                description="opaque cursor of the page, "
+                "pass an empty value to get the first page in cursor mode",
+            ),
+            utils.OpenApiParameter(
+                name="limit",
+                type=int,
+                description="page size in cursor mode",
+            ),
+        ],
         responses=(
             {
                 200: utils.OpenApiResponse(
@@ -61,53 +76,64 @@ class OrdersListCreateApiView(generics.ListCreateAPIView):
         ),
     )
     def get(self, request, *args, **kwargs) -> Response[list[dict]]:
-        """Получение списка заказов пользователя"""
+        """
+        Получение списка заказов пользователя
+
+        * при наличии query-параметра 'cursor' возвращается страница
+          кратких данных заказов, товары заказа загружаются только
+          при получении заказа по его 'id'
+        * без параметра возвращается полный список заказов с товарами
+        """
+
+        if OrderCursorPagination.cursor_query_param in request.query_params:
+            return self.get_summary_page(request)
 
         queryset = self.get_queryset().filter(available=True).filter(user=request.user)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def get_summary_page(self, request) -> Response:
+        """Получение страницы кратких данных заказов пользователя"""
+
+        queryset = (
+            Order.objects.filter(available=True)
+            .filter(user=request.user)
+            .only(*OrderSummarySerializer.Meta.fields)
+        )
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = OrderSummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @utils.extend_schema(
         tags=["order"],
         description="Create order",
         summary="Create order",
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request=ItemsFromBasketSerializer(many=True),
         responses=(
             {
                 201: utils.OpenApiResponse(
                     description="Order created successfully.",
-                )
+                ),
+                404: utils.OpenApiResponse(description="Product not found."),
+                409: utils.OpenApiResponse(description="Product is out of stock."),
             }
         ),
     )
+    @idempotent
     def post(self, request, *args, **kwargs) -> Response:
         """Создание нового заказа"""
 
-        order = Order.objects.create(status="NEW")
-        order.totalCost = 0
-        order.save()
-
         serializer = ItemsFromBasketSerializer(data=request.data, many=True)
         if not serializer.is_valid():
             return handle_serializer_not_valid(serializer)
 
         logger.debug("Items from basket: %s", serializer.validated_data)
 
-        for item in serializer.validated_data:
-            product_id = item["id"]
-            products_count = item["count"]
-            products_total_price = item["price"]
-
-            product = Product.objects.get(id=product_id)
-            order_product, op_created = OrderProduct.objects.get_or_create(
-                order=order,
-                product=product,
-            )
-            order_product.count = products_count
-            order_product.price = products_total_price
-            order_product.save()
-
-        logger.debug("Order №%s created. Need to specify the order details", order.id)
+        order = create_order_from_items(serializer.validated_data)
+        if isinstance(order, Response):
+            return order
 
         return Response(data={"orderId": order.id}, status=status.HTTP_201_CREATED)
 
@@ -151,13 +177,13 @@ class OrderDetailsApiView(generics.RetrieveUpdateAPIView):
 
         user: User = request.user
         order: Order = get_order_by_id(order_id=id)
+        if isinstance(order, Response):
+            return order
 
-        if isinstance(order, Order) and order.user is None and user.is_authenticated:
+        if order.user is None and user.is_authenticated:
             order = update_order_with_user_data(order, user)
 
-        if order.totalCost == 0:
-            order = update_order_total_cost_with_product_cost(order)
-
+        prefetch_for_serializer([order], OrderSerializer)
         serializer = OrderSerializer(order)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -189,6 +215,8 @@ class OrderDetailsApiView(generics.RetrieveUpdateAPIView):
 
         # Получаем заказ по его id
         order: Order = get_order_by_id(order_id=id)
+        if isinstance(order, Response):
+            return order
 
         # Если заказ уже оплачен, завершаем подтверждение заказа
         if order.is_paided:
@@ -204,15 +232,18 @@ class OrderDetailsApiView(generics.RetrieveUpdateAPIView):
         if not serializer.is_valid():
             return handle_serializer_not_valid(serializer)
 
-        # Обновляем данные заказа сведениями о доставке
-        order = serializer.save()
-
-        # Обновляем итоговую стоимость заказа с учетом способа доставки
-        order = update_order_total_cost_with_delivery_price(order)
+        # Сведения о доставке и итоговая стоимость заказа с учетом способа
+        # доставки (стоимость товаров пересчитывается, чтобы повторное
+        # подтверждение не добавляло стоимость доставки дважды)
+        fields = serializer.get_order_fields()
+        fields["totalCost"] = get_order_cost_with_delivery(
+            get_order_products_cost(order),
+            fields.get("deliveryType", order.deliveryType),
+        )
 
-        # Устанавливаем статус заказа в 'confirmed'
-        order.status = Order.OrderStatusChoices.CONFIRMED
-        order.save()
+        # Сохраняем сведения и устанавливаем статус 'confirmed' одним запросом
+        if not apply_order_transition(order, "confirm", **fields):
+            return handle_transition_conflict(order, "confirm")
         logger.debug("Order №%s confirmed", order.id)
 
         # Получаем пользователя из заказа
@@ -248,7 +279,8 @@ class PaymentApiView(generics.CreateAPIView):
                 type=utils.OpenApiTypes.INT,
                 required=True,
                 description="order id",
-            )
+            ),
+            IDEMPOTENCY_KEY_PARAMETER,
         ],
         request=PaymentPayloadSerializer,
         responses={
@@ -261,13 +293,27 @@ class PaymentApiView(generics.CreateAPIView):
             )
         },
     )
+    @idempotent
     def post(self, request, *args, id=None, **kwargs):
         """Выполнение оплаты"""
 
         # Получаем объект заказа
         order = get_order_by_id(order_id=id)
-        order.status = Order.OrderStatusChoices.AWAITING_PAYMENT
-        order.save()
+        if isinstance(order, Response):
+            return order
+
+        # Повторная оплата оплаченного заказа возвращает существующую оплату
+        if order.is_paided:
+            payment = Payment.objects.filter(order=order).first()
+            if payment is None:
+                return handle_already_paided(order)
+            return Response(
+                data={"paymentId": payment.id},
+                status=status.HTTP_200_OK,
+            )
+
+        if not apply_order_transition(order, "start_payment"):
+            return handle_transition_conflict(order, "start_payment")
         logger.debug("Order %s awaiting payment...", order.id)
 
         # Получаем данные об оплате из запроса
@@ -289,17 +335,27 @@ class PaymentApiView(generics.CreateAPIView):
 
         # Валидируем данные, переданные в сериализатор
         if not serializer.is_valid():
-            order.status = Order.OrderStatusChoices.PAYMENT_ERROR
-            order.save()
+            apply_order_transition(order, "fail_payment")
             return handle_serializer_not_valid(serializer)
 
         logger.debug("Payment data is valid")
 
-        # Сохраняем объект оплаты в базу данных
-        payment = serializer.save()
-
-        order.status = Order.OrderStatusChoices.PAIDED
-        order.save()
+        # Оплата сохраняется в одной транзакции с переходом в статус 'paided':
+        # если заказ оплачен параллельным запросом, сохранение отменяется
+        try:
+            with transaction.atomic():
+                payment = serializer.save()
+                paided = order.transition("pay")
+                if not paided:
+                    transaction.set_rollback(True)
+        except IntegrityError:
+            paided = False
+
+        if not paided:
+            order.refresh_from_db()
+            payment = Payment.objects.filter(order=order).first()
+            if not order.is_paided or payment is None:
+                return handle_transition_conflict(order, "pay")
         logger.debug("Order %s was paided", order.id)
 
         return Response(
@@ -1,9 +1,16 @@
+import csv
+import time
+import zipfile
+
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.admin.decorators import action
+from django.core.exceptions import PermissionDenied
 from django.db import models
+from django.http import HttpResponse
 from django.http.request import HttpRequest
 from django.shortcuts import render, redirect
+from django.template.response import TemplateResponse
 from django.urls.conf import path
 
 
@@ -15,7 +22,9 @@ from products_app.models import (
     Sales,
     SaleItems,
 )
-from products_app.forms import ProductAddForm, ProductImageForm
+from products_app.exports import ProductsExporter
+from products_app.forms import ProductAddForm, ProductImageForm, ProductImportForm
+from products_app.importer import ProductImportBatch, ProductImporter
 from catalog_app.models import Category
 
 
@@ -101,6 +110,16 @@ def set_unavailable(modeladmin, request, queryset) -> None:
     queryset.update(available=False)
 
 
+@action(description="Выгрузить в CSV")
+def export_products_csv(modeladmin, request, queryset):
+    return ProductsExporter(queryset).get_response("csv")
+
+
+@action(description="Выгрузить в NDJSON")
+def export_products_ndjson(modeladmin, request, queryset):
+    return ProductsExporter(queryset).get_response("ndjson")
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     """Админка товара"""
@@ -115,6 +134,8 @@ class ProductAdmin(admin.ModelAdmin):
         "freeDelivery",
         "limited",
         "available",
+        "rating_avg",
+        "review_count",
     )
     list_display_links = (
         "id",
@@ -122,6 +143,7 @@ class ProductAdmin(admin.ModelAdmin):
     )
     search_fields = (
         "title",
+        "sku",
         "description",
     )
     actions = [
@@ -131,6 +153,8 @@ class ProductAdmin(admin.ModelAdmin):
         unset_free_delivery,
         set_available,
         set_unavailable,
+        export_products_csv,
+        export_products_ndjson,
     ]
     inlines = (
         ProductImageInline,
@@ -145,7 +169,7 @@ class ProductAdmin(admin.ModelAdmin):
         (
             None,
             {
-                "fields": ["title", "category", "price", "count"],
+                "fields": ["title", "sku", "category", "price", "count"],
             },
         ),
         (
@@ -208,10 +232,92 @@ class ProductAdmin(admin.ModelAdmin):
             self.message_user(request, f"Товар '{product.title}' добавлен")
             return redirect("..")
 
+    def import_products(self, request: HttpRequest) -> HttpResponse:
+        """
+        Импорт товаров из манифеста CSV/NDJSON и ZIP архива изображений
+
+        * прерванный импорт того же манифеста продолжается с последней
+          сохраненной пачки, если не отмечено 'restart'
+        * при ошибке в файле уже обработанные пачки остаются сохраненными
+        * импорт создает и изменяет товары, поэтому требует обоих прав
+        """
+
+        if not (
+            self.has_add_permission(request) and self.has_change_permission(request)
+        ):
+            raise PermissionDenied
+
+        if request.method != "POST":
+            return render(
+                request, "admin/product_import.html", {"form": ProductImportForm()}
+            )
+
+        form = ProductImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(
+                request, "admin/product_import.html", {"form": form}, status=400
+            )
+
+        manifest = form.files["manifest"]
+        images = form.files.get("images")
+        importer = ProductImporter(
+            manifest=manifest.file,
+            manifest_format=manifest.name.rsplit(".", 1)[-1].lower(),
+            images=images.file if images else None,
+            resume=not form.cleaned_data["restart"],
+            encoding=request.encoding or "utf-8",
+        )
+
+        results: list[ProductImportBatch] = []
+        started = time.monotonic()
+        try:
+            for batch in importer.run():
+                results.append(batch)
+        except (ValueError, KeyError, csv.Error, zipfile.BadZipFile) as exc:
+            self.message_user(
+                request,
+                f"Import stopped after {len(results)} batches: {exc!r}",
+                level=messages.ERROR,
+            )
+        elapsed = time.monotonic() - started
+
+        rows = sum(batch.rows for batch in results)
+        products = sum(batch.products for batch in results)
+        errors = [error for batch in results for error in batch.errors]
+        if importer.resumed_from:
+            self.message_user(
+                request, f"Import resumed after {importer.resumed_from} rows."
+            )
+        if products:
+            self.message_user(request, f"Successfully imported {products} products.")
+        if errors:
+            self.message_user(
+                request, f"{len(errors)} rows were skipped.", level=messages.WARNING
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Import products",
+            "opts": self.model._meta,
+            "batches": results,
+            "rows": rows,
+            "products": products,
+            "images": sum(batch.images for batch in results),
+            "errors": errors,
+            "elapsed": elapsed,
+            "rate": rows / elapsed if elapsed else 0,
+        }
+        return TemplateResponse(request, "admin/product_import_report.html", context)
+
     def get_urls(self):
         urls = super().get_urls()
         new_urls = [
             path("product-add/", self.add_product_with_form, name="add_product"),
+            path(
+                "import-products/",
+                self.admin_site.admin_view(self.import_products),
+                name="import_products",
+            ),
         ]
         return new_urls + urls
 
@@ -5,3 +5,8 @@ class ProductsAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "products_app"
     verbose_name = "Склад"
+
+    def ready(self) -> None:
+        """Подключение обработчиков сигналов"""
+
+        from products_app import signals  # noqa: F401
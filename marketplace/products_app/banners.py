@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, OuterRef, QuerySet, Subquery, Window
+from django.db.models.functions import RowNumber
+from django.db.utils import DEFAULT_DB_ALIAS
+
+from catalog_app.models import Category
+from mainsite.cache_utils import get_versioned_cache_key
+from mainsite.values_serializer import ValuesSerializer
+from products_app.models import Product, ProductImage, ProductReview
+from products_app.serializers import ProductShortSerializer
+from tags_app.models import Tag
+
+# Количество баннеров с товарами избранных категорий
+BANNERS_LIMIT = 3
+
+# Модели, от которых зависят данные баннеров
+BANNER_CACHE_MODELS = (Category, Product, ProductImage, ProductReview, Tag)
+BANNER_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Порядок выбора товара внутри категории (как у 'Product.Meta.ordering')
+BANNER_PRODUCT_ORDERING = ("title", "pk")
+
+
+def get_favorite_categories(limit: int) -> QuerySet:
+    """Избранные категории, для которых показываются баннеры"""
+
+    return Category.objects.filter(favorite=True).order_by("title", "pk")[:limit]
+
+
+def get_banner_product_ids_by_window(limit: int, using: str) -> list[int]:
+    """
+    Выбор первого доступного товара каждой избранной категории
+    одним запросом с оконной функцией ROW_NUMBER()
+    """
+
+    rows = (
+        Product.objects.using(using)
+        .filter(
+            available=True,
+            category__in=get_favorite_categories(limit).values("pk"),
+        )
+        .annotate(
+            banner_position=Window(
+                RowNumber(),
+                partition_by=F("category_id"),
+                order_by=[F(field).asc() for field in BANNER_PRODUCT_ORDERING],
+            )
+        )
+        .filter(banner_position=1)
+        .values_list("pk", "category__title", "category_id")
+    )
+    return [
+        product_id for product_id, *_ in sorted(rows, key=lambda row: (row[1], row[2]))
+    ]
+
+
+def get_banner_product_ids_by_subquery(limit: int, using: str) -> list[int]:
+    """
+    Выбор первого доступного товара каждой избранной категории
+    одним запросом с коррелированным подзапросом
+
+    * используется, если база данных не поддерживает оконные функции
+      (SQLite до версии 3.25)
+    """
+
+    first_product = (
+        Product.objects.filter(category=OuterRef("pk"), available=True)
+        .order_by(*BANNER_PRODUCT_ORDERING)
+        .values("pk")[:1]
+    )
+    product_ids = (
+        get_favorite_categories(limit)
+        .using(using)
+        .annotate(banner_product_id=Subquery(first_product))
+        .values_list("banner_product_id", flat=True)
+    )
+    return [product_id for product_id in product_ids if product_id is not None]
+
+
+def get_banner_product_ids(
+    limit: int = BANNERS_LIMIT, using: str = DEFAULT_DB_ALIAS
+) -> list[int]:
+    """Получение id товаров для баннеров в порядке избранных категорий"""
+
+    if connections[using].features.supports_over_clause:
+        return get_banner_product_ids_by_window(limit, using)
+    return get_banner_product_ids_by_subquery(limit, using)
+
+
+def get_banners_data(limit: int = BANNERS_LIMIT) -> list[dict]:
+    """
+    Получение сериализованных товаров для баннеров
+
+    * результат кэшируется по версиям моделей, поэтому изменение
+      признака 'favorite' категории или выбранного товара (его изображений,
+      тегов, отзывов) сбрасывает кэш
+    """
+
+    cache_key = get_versioned_cache_key(
+        "banners", {"limit": limit}, BANNER_CACHE_MODELS
+    )
+    data = cache.get(cache_key)
+    if data is not None:
+        return data
+
+    product_ids = get_banner_product_ids(limit)
+    values_serializer = ValuesSerializer(ProductShortSerializer())
+    rows = {
+        row["id"]: row
+        for row in values_serializer.get_rows(
+            Product.objects.filter(pk__in=product_ids)
+        )
+    }
+    data = values_serializer.to_representation(
+        [rows[product_id] for product_id in product_ids if product_id in rows]
+    )
+    cache.set(cache_key, data, timeout=BANNER_CACHE_TIMEOUT)
+    return data
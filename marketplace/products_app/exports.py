@@ -0,0 +1,44 @@
+from typing import Iterator
+
+from django.db.models import F
+
+from mainsite.export import Exporter
+from products_app.models import Product
+
+# Выгружаемые поля товара
+PRODUCT_EXPORT_FIELDS = [
+    "id",
+    "title",
+    "category_id",
+    "category_title",
+    "price",
+    "count",
+    "date",
+    "freeDelivery",
+    "limited",
+    "available",
+    "rating_avg",
+    "review_count",
+    "description",
+    "fullDescription",
+]
+
+
+class ProductsExporter(Exporter):
+    """
+    Выгрузка каталога товаров
+
+    * строки выбираются через '.values()' одним запросом с категорией
+    """
+
+    name = "products"
+    model = Product
+    header = PRODUCT_EXPORT_FIELDS
+
+    def get_records(self) -> Iterator[dict]:
+        return (
+            self.queryset.order_by("pk")
+            .annotate(category_title=F("category__title"))
+            .values(*PRODUCT_EXPORT_FIELDS)
+            .iterator(chunk_size=self.chunk_size)
+        )
@@ -1,49 +1,55 @@
 import re
 
 import django_filters
-from django.db.models import DecimalField, Value, Avg
 from django.http.request import QueryDict
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters.widgets import BooleanWidget
 from rest_framework.filters import OrderingFilter
-from django.db.models.aggregates import Count
-from django.db.models.functions import Coalesce
 
-from catalog_app.models import Category
+from catalog_app.models import CategoryClosure
 from mainsite.main_logger import logger
 from products_app.models import Product
+from products_app.search import get_search_backend
 
 
-class ProductsFilterBackend(DjangoFilterBackend):
-    def get_filterset_kwargs(self, request, queryset, view):
-        """
-        Функция меняет query-параметры http-запроса
-        если они содержат ключи 'filter[param]'
+def normalize_query_params(initial_query_params: QueryDict) -> QueryDict:
+    """
+    Функция меняет query-параметры http-запроса
+    если они содержат ключи 'filter[param]'
 
-        Например: 'filter[name]' заменяет на 'name'
+    Например: 'filter[name]' заменяет на 'name'
 
-        Остальные параметры остаются неизменными
-        """
+    Пустые значения отбрасываются, остальные параметры остаются неизменными
+    """
+
+    updated_query_params = QueryDict(mutable=True)
+    filter_pattern = re.compile(r"filter\[(\w*?)]")
+    for key, value in initial_query_params.items():
+        if value and isinstance(value, str):
+            match = filter_pattern.search(key)
+            if match:
+                key = match.group(1)
+            elif "tags[]" in key:
+                continue
+            updated_query_params.appendlist(key, value)
+
+    tags = initial_query_params.getlist("tags[]")
+    if tags:
+        updated_query_params.setlist("tags[]", tags)
+
+    return updated_query_params
+
+
+class ProductsFilterBackend(DjangoFilterBackend):
+    def get_filterset_kwargs(self, request, queryset, view):
+        """Нормализация query-параметров http-запроса перед фильтрацией"""
 
         kwargs = super().get_filterset_kwargs(request, queryset, view)
         initial_query_params: QueryDict = kwargs["data"]
         logger.debug("Initial query params: %s", initial_query_params)
         logger.debug("Url query: %s", initial_query_params.urlencode(safe="[]&"))
 
-        updated_query_params = QueryDict(mutable=True)
-        filter_pattern = re.compile(r"filter\[(\w*?)]")
-        for key, value in initial_query_params.items():
-            if value and isinstance(value, str):
-                match = filter_pattern.search(key)
-                if match:
-                    key = match.group(1)
-                elif "tags[]" in key:
-                    continue
-                updated_query_params.appendlist(key, value)
-
-        tags = initial_query_params.getlist("tags[]")
-        if tags:
-            updated_query_params.setlist("tags[]", tags)
+        updated_query_params = normalize_query_params(initial_query_params)
 
         logger.debug("New query params: %s", updated_query_params)
         kwargs["data"] = updated_query_params
@@ -53,8 +59,8 @@ class ProductsFilterBackend(DjangoFilterBackend):
 class ProductFilter(django_filters.FilterSet):
     """Фильтр товаров"""
 
-    # фильтр по имени товара
-    name = django_filters.CharFilter(field_name="title", lookup_expr="icontains")
+    # поиск товара по названию и описаниям
+    name = django_filters.CharFilter(method="search_products")
 
     # фильтр по минимальной цене товара
     minPrice = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
@@ -77,13 +83,22 @@ class ProductFilter(django_filters.FilterSet):
         field_name="category", method="select_category"
     )
 
+    def search_products(self, queryset, name, value):
+        """
+        Поиск товаров
+
+        * поисковый движок выбирается по типу базы данных
+        * найденные товары получают аннотацию релевантности 'search_rank'
+        """
+
+        return get_search_backend(queryset.db).search(queryset, value)
+
     def select_category(self, queryset, name, value):
-        """Получение категории товара"""
+        """Получение товаров категории и всех её подкатегорий"""
 
-        category = Category.objects.get(pk=value)
-        if category.parent is None:
-            return queryset.filter(category__id__in=category.subcategories.all())
-        return queryset.filter(category__id=value)
+        return queryset.filter(
+            category__in=CategoryClosure.objects.descendant_ids(value)
+        )
 
     class Meta:
         model = Product
@@ -108,6 +123,12 @@ class ProductOrdering(OrderingFilter):
         "rating",
     )
 
+    # Соответствие значений параметра 'sort' полям модели товара
+    ordering_fields_map = {
+        "reviews": "review_count",
+        "rating": "rating_avg",
+    }
+
     def filter_queryset(self, request, queryset, view):
         """Переопределение метода для применения сортировки с параметром 'sortType"""
 
@@ -116,28 +137,7 @@ class ProductOrdering(OrderingFilter):
         ordering_direction = "" if sort_type == "inc" else "-"
 
         if ordering:
-            ordering_value = ordering[0]
-
-            if ordering_value == "reviews":
-                return queryset.annotate(review_count=Count("reviews")).order_by(
-                    "{ordering_direction}{ordering_value}".format(
-                        ordering_direction=ordering_direction,
-                        ordering_value="review_count",
-                    )
-                )
-            elif ordering_value == "rating":
-                return queryset.annotate(
-                    avg_rating=Coalesce(
-                        Avg("reviews__rate"),
-                        Value(0),
-                        output_field=DecimalField(),
-                    )
-                ).order_by(
-                    "{ordering_direction}{ordering_value}".format(
-                        ordering_direction=ordering_direction,
-                        ordering_value="avg_rating",
-                    )
-                )
+            ordering_value = self.ordering_fields_map.get(ordering[0], ordering[0])
             return queryset.order_by(
                 "{ordering_direction}{ordering_value}".format(
                     ordering_direction=ordering_direction,
@@ -145,4 +145,8 @@ class ProductOrdering(OrderingFilter):
                 )
             )
 
+        # Без явной сортировки результаты поиска выводятся по релевантности
+        if "search_rank" in queryset.query.annotations:
+            return queryset.order_by("-search_rank")
+
         return queryset
@@ -1,6 +1,8 @@
+import zipfile
 from typing import Any
 
 from django import forms
+from django.core.validators import FileExtensionValidator
 from django_stubs_ext import monkeypatch
 
 from products_app.models import Product, ProductImage
@@ -18,6 +20,7 @@ class ProductAddForm(forms.ModelForm[Product]):
         fields = [
             "category",
             "title",
+            "sku",
             "price",
             "count",
             "description",
@@ -38,6 +41,12 @@ class ProductAddForm(forms.ModelForm[Product]):
                     "placeholder": "Введите название",
                 }
             ),
+            "sku": forms.TextInput(
+                attrs={
+                    "class": "form-control form-text",
+                    "placeholder": "Введите артикул",
+                }
+            ),
             "price": forms.NumberInput(
                 attrs={"class": "form-control", "placeholder": "Введите цену"}
             ),
@@ -83,3 +92,37 @@ class ProductImageForm(forms.ModelForm[ProductImage]):
         widgets = {
             "src": forms.FileInput(attrs={"class": "form-control"}),
         }
+
+
+class ProductImportForm(forms.Form):
+    """Форма для выбора манифеста товаров и архива изображений"""
+
+    manifest = forms.FileField(
+        validators=[FileExtensionValidator(allowed_extensions=["csv", "ndjson"])],
+        label="Manifest file",
+        label_suffix=" ->",
+        help_text="Необходимо выбрать файл с расширением *.csv или *.ndjson",
+    )
+    images = forms.FileField(
+        required=False,
+        validators=[FileExtensionValidator(allowed_extensions=["zip"])],
+        label="Images archive",
+        label_suffix=" ->",
+        help_text="ZIP архив с изображениями, указанными в манифесте",
+    )
+    restart = forms.BooleanField(
+        required=False,
+        label="Restart import",
+        label_suffix=" ->",
+        help_text="Начать импорт сначала, не продолжая прерванный",
+    )
+
+    def clean_images(self):
+        """Проверка, что архив изображений является ZIP архивом"""
+
+        images = self.cleaned_data.get("images")
+        if images and not zipfile.is_zipfile(images):
+            raise forms.ValidationError("Файл не является ZIP архивом")
+        if images:
+            images.seek(0)
+        return images
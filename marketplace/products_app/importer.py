@@ -0,0 +1,564 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from decimal import Decimal
+from io import TextIOWrapper
+from itertools import islice
+from typing import IO, Any, Iterator, NamedTuple
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from catalog_app.models import Category
+from mainsite.cache_utils import invalidate_model_cache
+from mainsite.main_logger import logger
+from products_app.models import (
+    Product,
+    ProductImage,
+    ProductSpecification,
+    upload_product_image_to,
+)
+from products_app.search import get_search_backend
+from tags_app.models import Tag
+
+# Количество строк манифеста, обрабатываемых одной пачкой
+IMPORT_BATCH_SIZE = 500
+# Количество потоков записи изображений
+IMAGE_WORKERS = 4
+# Срок хранения позиции незавершенного импорта (в секундах)
+CHECKPOINT_TIMEOUT = 60 * 60 * 24 * 7
+CHECKPOINT_CACHE_KEY_PREFIX = "products_import"
+
+MANIFEST_FORMATS = ("csv", "ndjson")
+# Разделитель элементов списков в колонках CSV
+LIST_SEPARATOR = "|"
+TRUE_VALUES = {"1", "true", "yes", "да"}
+
+# Поля товара, загружаемые из манифеста; у существующего товара обновляются
+# только поля, указанные в строке манифеста
+PRODUCT_IMPORT_FIELDS = [
+    "title",
+    "category",
+    "price",
+    "count",
+    "description",
+    "fullDescription",
+    "freeDelivery",
+    "limited",
+    "available",
+]
+
+
+class ProductImportRow(NamedTuple):
+    """Строка манифеста импорта товаров"""
+
+    line: int
+    sku: str
+    title: str
+    category: str
+    price: Decimal
+    count: int
+    description: str | None
+    fullDescription: str | None
+    freeDelivery: bool
+    limited: bool
+    available: bool
+    tags: list[str]
+    images: list[str]
+    specifications: list[tuple[str, str]]
+    # Поля из 'PRODUCT_IMPORT_FIELDS', указанные в строке манифеста
+    fields: frozenset[str]
+
+
+class ProductImportBatch(NamedTuple):
+    """Результат обработки пачки строк манифеста"""
+
+    number: int
+    rows: int
+    products: int
+    images: int
+    errors: list[str]
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """Скорость обработки (строк в секунду)"""
+
+        return self.rows / self.elapsed if self.elapsed else 0
+
+
+def iter_manifest(
+    file: IO[bytes], manifest_format: str, encoding: str = "utf-8"
+) -> Iterator[dict]:
+    """
+    Построчное чтение манифеста
+
+    * CSV: разделитель ';', списки в колонках разделяются '|',
+      спецификации записываются как 'имя=значение|...'
+    * NDJSON: один JSON-объект товара в строке
+    """
+
+    text_file = TextIOWrapper(buffer=file, encoding=encoding, newline="")
+    try:
+        if manifest_format == "csv":
+            yield from csv.DictReader(text_file, delimiter=";")
+        elif manifest_format == "ndjson":
+            for line in text_file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unknown manifest format '{manifest_format}'")
+    finally:
+        # Файл манифеста закрывает вызывающий код
+        text_file.detach()
+
+
+def get_max_length(model, field_name: str) -> int:
+    return model._meta.get_field(field_name).max_length
+
+
+def parse_text(data: dict, name: str, model=Product, required: bool = False):
+    """Текстовое значение колонки с проверкой длины"""
+
+    value = data.get(name)
+    value = str(value).strip() if value is not None else ""
+    if not value:
+        if required:
+            raise ValueError(f"'{name}' is required")
+        return None
+    max_length = get_max_length(model, name) if model else None
+    if max_length and len(value) > max_length:
+        raise ValueError(f"'{name}' is longer than {max_length} characters")
+    return value
+
+
+def parse_bool(value: Any, default: bool) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def parse_list(value: Any) -> list[str]:
+    """Список строк из массива JSON или строки с разделителем '|'"""
+
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(LIST_SEPARATOR)
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def parse_specifications(value: Any) -> list[tuple[str, str]]:
+    """
+    Спецификации товара из объекта JSON, массива объектов {name, value}
+    или строки 'имя=значение|...'
+    """
+
+    if not value:
+        return []
+    if isinstance(value, dict):
+        items = list(value.items())
+    elif isinstance(value, str):
+        items = [
+            item.split("=", 1) if "=" in item else (item, "")
+            for item in parse_list(value)
+        ]
+    else:
+        items = [(item["name"], item.get("value", "")) for item in value]
+
+    max_length = get_max_length(ProductSpecification, "name")
+    specifications = []
+    for name, spec_value in items:
+        name, spec_value = str(name).strip(), str(spec_value).strip()
+        if len(name) > max_length or len(spec_value) > max_length:
+            raise ValueError(f"specification is longer than {max_length} characters")
+        specifications.append((name, spec_value))
+    return specifications
+
+
+def parse_manifest_row(line: int, data: dict) -> ProductImportRow:
+    """
+    Проверка и приведение строки манифеста (ValueError при ошибке)
+
+    * поле считается указанным, если колонка (ключ NDJSON) есть
+      и значение не пустое; для неуказанных полей новый товар получает
+      значения по умолчанию, а существующий сохраняет прежние
+    """
+
+    # Цена проверяется валидаторами поля модели (разрядность и знак)
+    try:
+        price = Product._meta.get_field("price").clean(data.get("price"), None)
+    except ValidationError as exc:
+        raise ValueError(
+            "invalid price '{price}': {error}".format(
+                price=data.get("price"), error=" ".join(exc.messages)
+            )
+        )
+    count = int(data.get("count") or 0)
+    if count < 0:
+        raise ValueError("'count' must not be negative")
+
+    tags = parse_list(data.get("tags"))
+    max_length = get_max_length(Tag, "name")
+    if any(len(tag) > max_length for tag in tags):
+        raise ValueError(f"tag is longer than {max_length} characters")
+
+    return ProductImportRow(
+        line=line,
+        sku=parse_text(data, "sku", required=True),
+        title=parse_text(data, "title", required=True),
+        category=parse_text(data, "category", model=None, required=True),
+        price=price,
+        count=count,
+        description=parse_text(data, "description"),
+        fullDescription=parse_text(data, "fullDescription"),
+        freeDelivery=parse_bool(data.get("freeDelivery"), False),
+        limited=parse_bool(data.get("limited"), False),
+        available=parse_bool(data.get("available"), True),
+        tags=tags,
+        images=parse_list(data.get("images")),
+        specifications=parse_specifications(data.get("specifications")),
+        fields=frozenset(
+            field
+            for field in PRODUCT_IMPORT_FIELDS
+            if data.get(field) is not None and data.get(field) != ""
+        ),
+    )
+
+
+class ImageArchive:
+    """
+    ZIP-архив изображений товаров
+
+    * чтение файлов из архива выполняется под блокировкой, поэтому архив
+      можно использовать из нескольких потоков
+    """
+
+    def __init__(self, file: IO[bytes]):
+        self.zip_file = zipfile.ZipFile(file)
+        self.names = set(self.zip_file.namelist())
+        self.lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def read(self, name: str) -> bytes:
+        with self.lock:
+            return self.zip_file.read(name)
+
+    def close(self) -> None:
+        self.zip_file.close()
+
+
+def write_image(archive: ImageArchive, filename: str, name: str) -> str:
+    """
+    Запись изображения из архива в хранилище файлов
+
+    * существующий файл с тем же именем перезаписывается, поэтому
+      повторный импорт не создает копий
+    """
+
+    content = archive.read(filename)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(content))
+
+
+class ProductImporter:
+    """
+    Пакетный импорт товаров из манифеста CSV/NDJSON и ZIP-архива изображений
+
+    * манифест читается построчно, строки обрабатываются пачками:
+      категории и метки пачки выбираются одним запросом IN, товары
+      создаются или обновляются по артикулу (sku) запросом
+      'bulk_create(update_conflicts=True)'; у существующих товаров
+      обновляются только поля, указанные в манифесте
+    * спецификации и метки, указанные в строке, заменяют имеющиеся
+      у товара, изображения добавляются, если еще не загружены
+    * изображения записываются пулом из 'workers' потоков
+    * после каждой пачки в кэше сохраняется количество обработанных
+      строк, поэтому повторный запуск с тем же манифестом продолжает
+      импорт с места остановки
+    """
+
+    def __init__(
+        self,
+        manifest: IO[bytes],
+        manifest_format: str,
+        images: IO[bytes] | None = None,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        workers: int = IMAGE_WORKERS,
+        resume: bool = True,
+        encoding: str = "utf-8",
+    ):
+        if manifest_format not in MANIFEST_FORMATS:
+            raise ValueError(f"Unknown manifest format '{manifest_format}'")
+        self.manifest = manifest
+        self.manifest_format = manifest_format
+        self.images = images
+        self.batch_size = batch_size
+        self.workers = workers
+        self.encoding = encoding
+        self.checkpoint_key = "{prefix}:{fingerprint}".format(
+            prefix=CHECKPOINT_CACHE_KEY_PREFIX, fingerprint=self.get_fingerprint()
+        )
+        self.resumed_from: int = cache.get(self.checkpoint_key, 0) if resume else 0
+
+    def get_fingerprint(self) -> str:
+        """Отпечаток манифеста и архива изображений для позиции импорта"""
+
+        digest = hashlib.sha1()
+        for file in (self.manifest, self.images):
+            if file is None:
+                continue
+            file.seek(0)
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+            file.seek(0)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def run(self) -> Iterator[ProductImportBatch]:
+        """Выполнение импорта с результатом обработки каждой пачки"""
+
+        archive = ImageArchive(self.images) if self.images is not None else None
+        rows = islice(
+            enumerate(
+                iter_manifest(self.manifest, self.manifest_format, self.encoding),
+                start=1,
+            ),
+            self.resumed_from,
+            None,
+        )
+        processed = self.resumed_from
+        number = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while batch := list(islice(rows, self.batch_size)):
+                    number += 1
+                    started = time.monotonic()
+                    products, images, errors = self.save_batch(batch, archive, executor)
+                    processed += len(batch)
+                    cache.set(self.checkpoint_key, processed, CHECKPOINT_TIMEOUT)
+                    result = ProductImportBatch(
+                        number,
+                        len(batch),
+                        products,
+                        images,
+                        errors,
+                        time.monotonic() - started,
+                    )
+                    logger.debug(
+                        "Products batch %s: %s rows, %s products, %s images",
+                        number,
+                        result.rows,
+                        result.products,
+                        result.images,
+                    )
+                    yield result
+            cache.delete(self.checkpoint_key)
+        finally:
+            if archive is not None:
+                archive.close()
+            # bulk_create и update не вызывают сигналов, версии моделей меняем явно
+            if number:
+                for model in (Product, ProductImage, ProductSpecification, Tag):
+                    invalidate_model_cache(model)
+
+    def save_batch(
+        self,
+        batch: list[tuple[int, dict]],
+        archive: ImageArchive | None,
+        executor: ThreadPoolExecutor,
+    ) -> tuple[int, int, list[str]]:
+        """
+        Сохранение пачки строк манифеста
+
+        * возвращает количество сохраненных товаров, изображений и ошибки
+        """
+
+        errors: list[str] = []
+        rows: list[ProductImportRow] = []
+        for line, data in batch:
+            try:
+                rows.append(parse_manifest_row(line, data))
+            except (ValueError, TypeError, KeyError) as exc:
+                errors.append(f"line {line}: {exc}")
+
+        category_ids = dict(
+            Category.objects.filter(
+                title__in={row.category for row in rows}
+            ).values_list("title", "pk")
+        )
+        # При повторе артикула в пачке используется последняя строка
+        valid_rows: dict[str, ProductImportRow] = {}
+        for row in rows:
+            if row.category not in category_ids:
+                errors.append(f"line {row.line}: category '{row.category}' not found")
+                continue
+            valid_rows[row.sku] = row
+        if not valid_rows:
+            return 0, 0, errors
+
+        # Строки с одинаковым набором полей сохраняются одним запросом,
+        # при конфликте артикула обновляются только указанные поля
+        groups: dict[frozenset[str], list[Product]] = defaultdict(list)
+        for row in valid_rows.values():
+            groups[row.fields].append(
+                Product(
+                    sku=row.sku,
+                    category_id=category_ids[row.category],
+                    **{
+                        field: getattr(row, field)
+                        for field in PRODUCT_IMPORT_FIELDS
+                        if field != "category"
+                    },
+                )
+            )
+
+        with transaction.atomic():
+            products = []
+            for fields, group in groups.items():
+                Product.objects.bulk_create(
+                    group,
+                    update_conflicts=True,
+                    unique_fields=["sku"],
+                    update_fields=[
+                        field for field in PRODUCT_IMPORT_FIELDS if field in fields
+                    ],
+                )
+                products.extend(group)
+            product_ids = dict(
+                Product.objects.filter(sku__in=valid_rows).values_list("sku", "pk")
+            )
+            for product in products:
+                product.pk = product_ids[product.sku]
+
+            self.save_specifications(valid_rows, product_ids)
+            self.save_tags(valid_rows, product_ids)
+            get_search_backend().index_products(products)
+
+        images = self.save_images(valid_rows, product_ids, archive, executor, errors)
+        return len(products), images, errors
+
+    @staticmethod
+    def save_specifications(
+        rows: dict[str, ProductImportRow], product_ids: dict[str, int]
+    ) -> None:
+        """Замена спецификаций товаров, для которых они указаны в манифесте"""
+
+        specifications = {
+            product_ids[sku]: row.specifications
+            for sku, row in rows.items()
+            if row.specifications
+        }
+        if not specifications:
+            return
+        ProductSpecification.objects.filter(product_id__in=specifications).delete()
+        ProductSpecification.objects.bulk_create(
+            [
+                ProductSpecification(product_id=product_id, name=name, value=value)
+                for product_id, items in specifications.items()
+                for name, value in items
+            ]
+        )
+
+    @staticmethod
+    def save_tags(
+        rows: dict[str, ProductImportRow], product_ids: dict[str, int]
+    ) -> None:
+        """
+        Замена меток товаров, для которых они указаны в манифесте
+
+        * существующие метки выбираются одним запросом, отсутствующие
+          создаются одним запросом
+        """
+
+        product_tags = {
+            product_ids[sku]: list(dict.fromkeys(row.tags))
+            for sku, row in rows.items()
+            if row.tags
+        }
+        if not product_tags:
+            return
+
+        names = {name for tags in product_tags.values() for name in tags}
+        tag_ids: dict[str, int] = {}
+        for tag_id, name in (
+            Tag.objects.filter(name__in=names).order_by("pk").values_list("pk", "name")
+        ):
+            tag_ids.setdefault(name, tag_id)
+        for tag in Tag.objects.bulk_create(
+            [Tag(name=name) for name in sorted(names) if name not in tag_ids]
+        ):
+            tag_ids[tag.name] = tag.pk
+
+        through = Tag.products.through
+        through.objects.filter(product_id__in=product_tags).delete()
+        through.objects.bulk_create(
+            [
+                through(tag_id=tag_ids[name], product_id=product_id)
+                for product_id, tags in product_tags.items()
+                for name in tags
+            ]
+        )
+
+    @staticmethod
+    def save_images(
+        rows: dict[str, ProductImportRow],
+        product_ids: dict[str, int],
+        archive: ImageArchive | None,
+        executor: ThreadPoolExecutor,
+        errors: list[str],
+    ) -> int:
+        """
+        Запись изображений товаров пулом потоков и создание записей о них
+
+        * изображения, уже загруженные для товара, пропускаются
+        """
+
+        existing = set(
+            ProductImage.objects.filter(
+                product_id__in=[
+                    product_ids[sku] for sku, row in rows.items() if row.images
+                ]
+            ).values_list("product_id", "src")
+        )
+
+        jobs: list[tuple[ProductImage, Future]] = []
+        for sku, row in rows.items():
+            for filename in row.images:
+                if archive is None or filename not in archive:
+                    errors.append(f"line {row.line}: image '{filename}' not found")
+                    continue
+                image = ProductImage(product=Product(pk=product_ids[sku]))
+                name = upload_product_image_to(image, os.path.basename(filename))
+                if (image.product.pk, name) in existing:
+                    continue
+                existing.add((image.product.pk, name))
+                jobs.append(
+                    (image, executor.submit(write_image, archive, filename, name))
+                )
+
+        images = []
+        for image, future in jobs:
+            try:
+                image.src = future.result()
+            except OSError as exc:
+                errors.append(f"image '{image.product.pk}': {exc}")
+                continue
+            image.alt = image.get_alt()[: get_max_length(ProductImage, "alt")]
+            images.append(image)
+        ProductImage.objects.bulk_create(images)
+        return len(images)
@@ -0,0 +1,10 @@
+from mainsite.export import ExportCommand
+from products_app.exports import ProductsExporter
+
+
+class Command(ExportCommand):
+    """Команда выгрузки каталога товаров в CSV или NDJSON"""
+
+    help = "Stream the product catalog as CSV or NDJSON"
+
+    exporter_class = ProductsExporter
@@ -0,0 +1,96 @@
+import csv
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products_app.importer import (
+    IMAGE_WORKERS,
+    IMPORT_BATCH_SIZE,
+    MANIFEST_FORMATS,
+    ProductImporter,
+)
+
+
+class Command(BaseCommand):
+    """
+    Команда импорта товаров из манифеста CSV/NDJSON и ZIP архива изображений
+
+    * прерванный импорт того же манифеста продолжается с последней
+      сохраненной пачки, '--restart' начинает импорт сначала
+    """
+
+    help = "Import products from a CSV or NDJSON manifest and a ZIP of images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", help="Manifest file path")
+        parser.add_argument("--images", help="ZIP archive with product images")
+        parser.add_argument(
+            "--format",
+            choices=MANIFEST_FORMATS,
+            help="Manifest format (by file extension by default)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help="Number of manifest rows saved at a time",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=IMAGE_WORKERS,
+            help="Number of threads writing images",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the saved position of an interrupted import",
+        )
+        parser.add_argument("--encoding", default="utf-8", help="Manifest encoding")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--batch-size and --workers must be positive numbers")
+        manifest_format = (
+            options["format"] or options["manifest"].rsplit(".", 1)[-1].lower()
+        )
+        if manifest_format not in MANIFEST_FORMATS:
+            raise CommandError(f"Unknown manifest format '{manifest_format}'")
+
+        images = open(options["images"], "rb") if options["images"] else None
+        try:
+            with open(options["manifest"], "rb") as manifest:
+                importer = ProductImporter(
+                    manifest=manifest,
+                    manifest_format=manifest_format,
+                    images=images,
+                    batch_size=options["batch_size"],
+                    workers=options["workers"],
+                    resume=not options["restart"],
+                    encoding=options["encoding"],
+                )
+                if importer.resumed_from:
+                    self.stdout.write(f"Resuming after {importer.resumed_from} rows")
+                rows = products = images_count = 0
+                for batch in importer.run():
+                    rows += batch.rows
+                    products += batch.products
+                    images_count += batch.images
+                    for error in batch.errors:
+                        self.stderr.write(error)
+                    self.stdout.write(
+                        f"Batch {batch.number}: {batch.rows} rows, "
+                        f"{batch.products} products, {batch.images} images "
+                        f"({batch.rate:.0f} rows/s)"
+                    )
+        except (OSError, ValueError, csv.Error, zipfile.BadZipFile) as exc:
+            raise CommandError(f"Import stopped: {exc}")
+        finally:
+            if images is not None:
+                images.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {rows} rows: {products} products, {images_count} images"
+            )
+        )
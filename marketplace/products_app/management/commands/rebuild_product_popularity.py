@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from products_app.utils import rebuild_product_popularity
+
+
+class Command(BaseCommand):
+    """
+    Команда пересчета таблицы популярности товаров
+
+    * дневные итоги заказов строятся заново по таблице товаров в заказах,
+      например после загрузки данных в обход сигналов
+    """
+
+    help = "Rebuild daily product popularity rollups from ordered products"
+
+    def handle(self, *args, **options):
+        created = rebuild_product_popularity()
+        self.stdout.write(
+            self.style.SUCCESS(f"Popularity rebuilt: {created} daily rows")
+        )
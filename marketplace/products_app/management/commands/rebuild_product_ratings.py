@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from products_app.models import Product
+from products_app.utils import (
+    get_actual_rating_subqueries,
+    recalculate_products_rating,
+)
+
+
+class Command(BaseCommand):
+    """
+    Команда проверки и пересчета рейтинга товаров
+
+    * сравнивает сохраненные 'rating_sum' и 'review_count' с фактическими
+      значениями по таблице отзывов
+    * пересчитывает рейтинг расхождающихся товаров пачками
+    """
+
+    help = "Check and rebuild denormalized product rating columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report products with outdated rating, do not update them",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products updated per query",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive number")
+
+        actual_sum, actual_count = get_actual_rating_subqueries()
+        outdated_ids = list(
+            Product.objects.annotate(
+                actual_sum=actual_sum,
+                actual_count=actual_count,
+            )
+            .filter(~Q(rating_sum=F("actual_sum")) | ~Q(review_count=F("actual_count")))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        self.stdout.write(f"Products with outdated rating: {len(outdated_ids)}")
+
+        if options["check"]:
+            if outdated_ids:
+                raise CommandError(
+                    "Outdated rating found for products: "
+                    + ", ".join(str(pk) for pk in outdated_ids)
+                )
+            return
+
+        updated = 0
+        for start in range(0, len(outdated_ids), batch_size):
+            updated += recalculate_products_rating(
+                outdated_ids[start : start + batch_size]
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rating rebuilt for {updated} products"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.utils import DEFAULT_DB_ALIAS
+
+from products_app.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Команда полного перестроения поискового индекса товаров
+
+    * нужна после массовых изменений товаров в обход сигналов,
+      например после 'QuerySet.update()'
+    """
+
+    help = "Rebuild the catalog search index for the current database backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias to rebuild the index for",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options["database"])
+        backend.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Search index rebuilt with {backend.__class__.__name__}"
+            )
+        )
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.11 on 2026-10-17 06:31
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_products_rating(apps, schema_editor):
+    """Заполнение рейтинга товаров по существующим отзывам"""
+
+    Product = apps.get_model("products_app", "Product")
+    ProductReview = apps.get_model("products_app", "ProductReview")
+
+    rates = (
+        ProductReview.objects.order_by()
+        .values("product")
+        .annotate(rating_sum=Sum("rate"), review_count=Count("pk"))
+    )
+    for row in rates:
+        rating_avg = (Decimal(row["rating_sum"]) / row["review_count"]).quantize(
+            Decimal("0.1"), rounding=ROUND_HALF_UP
+        )
+        Product.objects.filter(pk=row["product"]).update(
+            rating_sum=row["rating_sum"],
+            review_count=row["review_count"],
+            rating_avg=rating_avg,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products_app", "0005_alter_productimage_product"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_avg",
+            field=models.DecimalField(
+                decimal_places=1,
+                default=Decimal("0.0"),
+                editable=False,
+                max_digits=2,
+                verbose_name="Рейтинг товара",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Сумма оценок товара"
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="review_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество отзывов"
+            ),
+        ),
+        migrations.RunPython(
+            fill_products_rating,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,123 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+from mainsite.main_logger import logger
+
+POSTGRES_FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE products_app_product ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION products_app_product_search_vector(
+        title text, description text, full_description text
+    ) RETURNS tsvector AS $$
+        SELECT
+            setweight(to_tsvector('pg_catalog.russian', coalesce(title, '')), 'A')
+            || setweight(
+                to_tsvector('pg_catalog.russian', coalesce(description, '')), 'B'
+            )
+            || setweight(
+                to_tsvector('pg_catalog.russian', coalesce(full_description, '')), 'C'
+            )
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE FUNCTION products_app_product_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := products_app_product_search_vector(
+            NEW.title, NEW.description, NEW."fullDescription"
+        );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_app_product_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description, "fullDescription"
+    ON products_app_product
+    FOR EACH ROW EXECUTE FUNCTION products_app_product_search_vector_trigger()
+    """,
+    """
+    UPDATE products_app_product SET search_vector = products_app_product_search_vector(
+        title, description, "fullDescription"
+    )
+    """,
+    """
+    CREATE INDEX products_app_product_search_vector_idx
+    ON products_app_product USING gin (search_vector)
+    """,
+    """
+    CREATE INDEX products_app_product_title_trgm_idx
+    ON products_app_product USING gin (title gin_trgm_ops)
+    """,
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS products_app_product_title_trgm_idx",
+    "DROP TRIGGER IF EXISTS products_app_product_search_vector_update "
+    "ON products_app_product",
+    "DROP FUNCTION IF EXISTS products_app_product_search_vector_trigger()",
+    "DROP FUNCTION IF EXISTS products_app_product_search_vector(text, text, text)",
+    "ALTER TABLE products_app_product DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE products_app_product_fts USING fts5(
+        title, description, fullDescription, tokenize = 'unicode61'
+    )
+    """,
+    """
+    INSERT INTO products_app_product_fts (rowid, title, description, fullDescription)
+    SELECT id, COALESCE(title, ''), COALESCE(description, ''),
+        COALESCE("fullDescription", '')
+    FROM products_app_product
+    """,
+]
+
+SQLITE_REVERSE_SQL = [
+    "DROP TABLE IF EXISTS products_app_product_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Создание поискового индекса товаров
+
+    * PostgreSQL: столбец tsvector с триггером, GIN и триграммный индексы
+    * SQLite: таблица FTS5 (если SQLite собран без FTS5, поиск работает
+      по вхождению подстроки)
+    """
+
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for sql in POSTGRES_FORWARD_SQL:
+            schema_editor.execute(sql)
+    elif vendor == "sqlite":
+        try:
+            for sql in SQLITE_FORWARD_SQL:
+                schema_editor.execute(sql)
+        except OperationalError as exc:
+            logger.warning("FTS5 search index is not created: %s", exc)
+
+
+def drop_search_index(apps, schema_editor):
+    """Удаление поискового индекса товаров"""
+
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for sql in POSTGRES_REVERSE_SQL:
+            schema_editor.execute(sql)
+    elif vendor == "sqlite":
+        for sql in SQLITE_REVERSE_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products_app", "0006_product_rating"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, reverse_code=drop_search_index),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.11 on 2026-10-17 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products_app", "0007_product_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["title"], name="product_title_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["price"], name="product_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["date"], name="product_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["rating_avg"], name="product_rating_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["review_count"], name="product_review_count_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["category", "title"],
+                name="product_avail_category_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True)),
+                fields=["price"],
+                name="product_avail_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("available", True), ("limited", True)),
+                fields=["title"],
+                name="product_avail_limited_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="saleitems",
+            index=models.Index(
+                fields=["is_active", "dateFrom", "dateTo"],
+                name="saleitems_active_dates_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.11 on 2026-10-17 06:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_products_popularity(apps, schema_editor):
+    """Заполнение популярности товаров по существующим заказам"""
+
+    OrderProduct = apps.get_model("orders_app", "OrderProduct")
+    ProductPopularity = apps.get_model("products_app", "ProductPopularity")
+
+    rows = (
+        OrderProduct.objects.filter(added_at__isnull=False)
+        .annotate(day=TruncDate("added_at"))
+        .order_by()
+        .values("product", "day")
+        .annotate(orders_count=Count("pk"))
+    )
+    ProductPopularity.objects.bulk_create(
+        [
+            ProductPopularity(
+                product_id=row["product"],
+                day=row["day"],
+                orders_count=row["orders_count"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders_app", "0014_order_indexes"),
+        ("products_app", "0008_product_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductPopularity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "orders_count",
+                    models.IntegerField(default=0, verbose_name="Количество заказов"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="popularity",
+                        to="products_app.product",
+                        verbose_name="Товар",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Популярность товара за день",
+                "verbose_name_plural": "Популярность товаров по дням",
+                "indexes": [
+                    models.Index(
+                        fields=["day", "product"], name="popularity_day_product_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "day"), name="unique_product_popularity_day"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            fill_products_popularity, reverse_code=migrations.RunPython.noop
+        ),
+    ]
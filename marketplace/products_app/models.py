@@ -1,8 +1,11 @@
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 from typing import Any
 
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import FloatField, Value
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
 from django.utils import timezone
 from django.contrib.auth.models import User
 
@@ -16,6 +19,30 @@ class Product(models.Model):
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ("title",)
+        indexes = [
+            # Сортировки каталога (параметр 'sort' и сортировка по умолчанию)
+            models.Index(fields=["title"], name="product_title_idx"),
+            models.Index(fields=["price"], name="product_price_idx"),
+            models.Index(fields=["date"], name="product_date_idx"),
+            models.Index(fields=["rating_avg"], name="product_rating_idx"),
+            models.Index(fields=["review_count"], name="product_review_count_idx"),
+            # Частичные индексы по доступным товарам
+            models.Index(
+                fields=["category", "title"],
+                name="product_avail_category_idx",
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=["price"],
+                name="product_avail_price_idx",
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=["title"],
+                name="product_avail_limited_idx",
+                condition=models.Q(available=True, limited=True),
+            ),
+        ]
 
     category = models.ForeignKey(
         Category,
@@ -47,6 +74,13 @@ class Product(models.Model):
         max_length=100,
         verbose_name="Название товара",
     )
+    sku = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="Артикул товара",
+    )
     description = models.TextField(
         null=True,
         blank=True,
@@ -69,20 +103,48 @@ class Product(models.Model):
         default=True,
         verbose_name="Доступен",
     )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество отзывов",
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Сумма оценок товара",
+    )
+    rating_avg = models.DecimalField(
+        max_digits=2,
+        decimal_places=1,
+        default=Decimal("0.0"),
+        editable=False,
+        verbose_name="Рейтинг товара",
+    )
 
     @property
     def rating(self) -> float:
         """Рейтинг товара.
 
-        * Рассчитывается на основе оценок, указанных в 'review.rate'
+        * Хранится в поле 'rating_avg' и обновляется при изменении отзывов
+        """
+
+        return float(self.rating_avg)
+
+    @staticmethod
+    def get_rating_avg_expression(
+        rating_sum: Combinable, review_count: Combinable
+    ) -> Coalesce:
+        """
+        Выражение для расчета рейтинга товара на стороне базы данных
+
+        * при отсутствии отзывов рейтинг равен 0
         """
 
-        product_reviews = self.reviews.all()
-        rates = [review.rate for review in product_reviews]
-        if not rates:
-            return 0
-        avg_rate = round(sum(rates) / len(rates), 1)
-        return avg_rate
+        return Coalesce(
+            Round(Cast(rating_sum, FloatField()) / NullIf(review_count, 0), 1),
+            Value(0.0),
+            output_field=FloatField(),
+        )
 
     def delete(self, *args: Any, **kwargs: Any) -> None:
         """Вместо удаления помечаем как недоступный"""
@@ -223,6 +285,18 @@ class ProductReview(models.Model):
         verbose_name="Дата публикации отзыва",
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values) -> "ProductReview":
+        """Запоминаем загруженные из базы значения для пересчета рейтинга товара"""
+
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if value is not models.DEFERRED
+        }
+        return instance
+
     def __str__(self) -> str:
         return f"Review by {self.author})"
 
@@ -248,6 +322,59 @@ class Sales(models.Model):
     )
 
 
+class SaleItemsQuerySet(models.QuerySet):
+    """Набор запросов элементов распродажи с расчетом цен в базе данных"""
+
+    @staticmethod
+    def active_condition(day, prefix: str = "") -> models.Q:
+        """
+        Условие действия скидки на дату
+
+        * 'prefix' - путь к элементу распродажи от модели запроса
+        """
+
+        return models.Q(
+            **{
+                f"{prefix}is_active": True,
+                f"{prefix}sale__is_active": True,
+                f"{prefix}dateFrom__lte": day,
+                f"{prefix}dateTo__gte": day,
+            }
+        )
+
+    def active(self, day=None) -> "SaleItemsQuerySet":
+        """Элементы распродаж, действующие на дату (по умолчанию - сегодня)"""
+
+        return self.filter(self.active_condition(day or timezone.localdate()))
+
+    def with_sale_price(self, day=None) -> "SaleItemsQuerySet":
+        """
+        Аннотация признака действия скидки 'sale_active'
+        и цены товара с учетом скидки 'sale_price' на дату
+
+        * цена округляется до копеек
+        """
+
+        condition = self.active_condition(day or timezone.localdate())
+        discounted_price = Round(
+            models.F("product__price")
+            * (Value(100) - models.F("discount"))
+            * Value(Decimal("0.01")),
+            2,
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        return self.annotate(
+            sale_active=models.ExpressionWrapper(
+                condition, output_field=models.BooleanField()
+            ),
+            sale_price=models.Case(
+                models.When(condition, then=discounted_price),
+                default=models.F("product__price"),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+
 class SaleItems(models.Model):
     """Модель элементов распродажи"""
 
@@ -263,6 +390,12 @@ class SaleItems(models.Model):
             ),
         ]
         ordering = ["-discount"]
+        indexes = [
+            models.Index(
+                fields=["is_active", "dateFrom", "dateTo"],
+                name="saleitems_active_dates_idx",
+            ),
+        ]
 
     sale = models.ForeignKey(
         "Sales",
@@ -287,14 +420,73 @@ class SaleItems(models.Model):
         verbose_name="Активна",
     )
 
+    objects = SaleItemsQuerySet.as_manager()
+
     @property
     def salePrice(self) -> Decimal:
-        """Функция расчета стоимости товара с учетом скидки по распродаже"""
+        """
+        Функция расчета стоимости товара с учетом скидки по распродаже
+
+        * если цена рассчитана в запросе ('with_sale_price'), используется она
+        """
+
+        if hasattr(self, "sale_price"):
+            return self.sale_price
 
         sale_price = self.product.price
-        date_time_now = timezone.now().date()
+        today = timezone.localdate()
 
-        if self.is_active and self.dateFrom <= date_time_now <= self.dateTo:
-            sale_price -= sale_price * self.discount / 100
+        if (
+            self.is_active
+            and self.sale.is_active
+            and self.dateFrom <= today <= self.dateTo
+        ):
+            sale_price = self.get_discounted_price(sale_price, self.discount)
 
         return sale_price
+
+    @staticmethod
+    def get_discounted_price(price: Decimal, discount: int) -> Decimal:
+        """Цена со скидкой, округленная до копеек"""
+
+        return (price * (100 - discount) / 100).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+
+
+class ProductPopularity(models.Model):
+    """
+    Модель популярности товара за день
+
+    * хранит количество заказов с товаром за каждый день и обновляется
+      при добавлении и удалении товаров в заказах
+    * рейтинг популярных товаров строится по этой таблице без обращения
+      к истории заказов
+    """
+
+    class Meta:
+        verbose_name = "Популярность товара за день"
+        verbose_name_plural = "Популярность товаров по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "day"], name="unique_product_popularity_day"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["day", "product"], name="popularity_day_product_idx"),
+        ]
+
+    product = models.ForeignKey(
+        "Product",
+        on_delete=models.CASCADE,
+        related_name="popularity",
+        verbose_name="Товар",
+    )
+    day = models.DateField(verbose_name="День")
+    orders_count = models.IntegerField(
+        default=0,
+        verbose_name="Количество заказов",
+    )
+
+    def __str__(self) -> str:
+        return f"{self.product_id} {self.day}: {self.orders_count}"
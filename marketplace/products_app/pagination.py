@@ -1,4 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import date
+from decimal import Decimal
+from typing import Any
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
 
 
@@ -54,3 +63,213 @@ class SalesProductPagination(CustomPagination):
     """Sales Product pagination"""
 
     pass
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по курсору (keyset)
+
+    * страница выбирается условием по значениям полей сортировки крайнего
+      элемента соседней страницы, без OFFSET и COUNT(*)
+    * в конец сортировки всегда добавляется 'id', чтобы позиция была однозначной
+    * курсор передается клиенту в виде непрозрачной строки
+    """
+
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param: str | None = None
+    cursor_query_param = "cursor"
+    tie_breaker_field = "id"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None) -> list:
+        """Получение страницы по курсору из запроса"""
+
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position, reverse = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+
+        # При движении назад сортировка инвертируется, а результат переворачивается
+        ordering = [
+            (field, descending != reverse) for field, descending in self.ordering
+        ]
+        queryset = queryset.order_by(
+            *[("-" if descending else "") + field for field, descending in ordering]
+        )
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request) -> int:
+        """Получение размера страницы с учетом query-параметра"""
+
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+                if page_size > 0:
+                    return min(page_size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset) -> list[tuple[str, bool]]:
+        """
+        Получение полей сортировки в виде пар (поле, сортировка по убыванию)
+
+        * используется сортировка queryset или сортировка модели по умолчанию
+        """
+
+        query = queryset.query
+        ordering_terms = query.order_by or (
+            query.get_meta().ordering if query.default_ordering else ()
+        )
+
+        ordering: list[tuple[str, bool]] = []
+        for term in ordering_terms:
+            if not isinstance(term, str):
+                raise TypeError("Keyset pagination supports field name ordering only")
+            field = term.lstrip("-")
+            if field == "pk":
+                field = self.tie_breaker_field
+            ordering.append((field, term.startswith("-")))
+
+        if self.tie_breaker_field not in [field for field, _ in ordering]:
+            descending = ordering[0][1] if ordering else False
+            ordering.append((self.tie_breaker_field, descending))
+        return ordering
+
+    @staticmethod
+    def get_position_filter(ordering: list[tuple[str, bool]], position: list) -> Q:
+        """
+        Условие выборки элементов, следующих за позицией курсора:
+        (a > x) OR (a = x AND b > y) OR ... с учетом направления сортировки
+        """
+
+        condition = Q()
+        equal_condition = Q()
+        for (field, descending), value in zip(ordering, position):
+            lookup = "lt" if descending else "gt"
+            condition |= equal_condition & Q(**{f"{field}__{lookup}": value})
+            equal_condition &= Q(**{field: value})
+        return condition
+
+    def get_ordering_signature(self) -> str:
+        """Строковое представление сортировки для проверки курсора"""
+
+        return ",".join(
+            ("-" if descending else "") + field for field, descending in self.ordering
+        )
+
+    def encode_cursor(self, item: Any, reverse: bool) -> str:
+        """Кодирование позиции элемента в непрозрачную строку курсора"""
+
+        position = [
+            self.to_cursor_value(self.get_item_value(item, field))
+            for field, _ in self.ordering
+        ]
+        payload = {"o": self.get_ordering_signature(), "p": position, "r": reverse}
+        encoded = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return urlsafe_b64encode(encoded).decode("ascii")
+
+    def decode_cursor(self, cursor: str | None) -> tuple[list | None, bool]:
+        """Декодирование строки курсора в позицию и направление"""
+
+        if not cursor:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode("ascii")))
+            position, reverse = payload["p"], bool(payload["r"])
+            signature = payload["o"]
+        except (BinasciiError, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Курсор действителен только для той сортировки, в которой был получен
+        if signature != self.get_ordering_signature() or not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def get_item_value(item: Any, field: str) -> Any:
+        """Значение поля элемента страницы (объекта модели или строки '.values()')"""
+
+        if isinstance(item, dict):
+            return item[field]
+        return getattr(item, field)
+
+    @staticmethod
+    def to_cursor_value(value: Any) -> Any:
+        """Приведение значения поля к виду, пригодному для JSON"""
+
+        if isinstance(value, Decimal):
+            return str(value)
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+
+    def get_next_cursor(self) -> str | None:
+        """Получение курсора следующей страницы"""
+
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_cursor(self) -> str | None:
+        """Получение курсора предыдущей страницы"""
+
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        """Получаем ответ с курсорами соседних страниц"""
+
+        return Response(
+            {
+                "items": data,
+                "nextCursor": self.get_next_cursor(),
+                "prevCursor": self.get_previous_cursor(),
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        """Получаем схему ответа с курсорами соседних страниц"""
+
+        return {
+            "type": "object",
+            "required": ["items"],
+            "properties": {
+                "items": schema,
+                "nextCursor": {
+                    "type": "string",
+                    "nullable": True,
+                },
+                "prevCursor": {
+                    "type": "string",
+                    "nullable": True,
+                },
+            },
+        }
+
+
+class ProductCursorPagination(KeysetPagination):
+    """Пагинация товаров по курсору"""
+
+    page_size_query_param = "limit"
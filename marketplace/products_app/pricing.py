@@ -0,0 +1,87 @@
+from decimal import Decimal
+from typing import Iterable, NamedTuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from mainsite.cache_utils import get_models_versions
+from products_app.models import Product, Sales, SaleItems
+from products_app.sales import get_active_sales
+
+# Модели, от которых зависят цены товаров
+PRICES_CACHE_MODELS = (Product, Sales, SaleItems)
+PRICES_CACHE_KEY_PREFIX = "product_price"
+PRICES_CACHE_TIMEOUT = 60
+
+
+class ProductPrice(NamedTuple):
+    """Цена товара с учетом действующей скидки"""
+
+    product_id: int
+    base_price: Decimal
+    discount: int
+    price: Decimal
+    free_delivery: bool
+
+
+def get_price_cache_keys(product_ids: Iterable[int]) -> dict[str, int]:
+    """Ключи кэша цен товаров: {ключ: id товара}"""
+
+    prefix = "{prefix}:{day}:{versions}".format(
+        prefix=PRICES_CACHE_KEY_PREFIX,
+        day=timezone.localdate().isoformat(),
+        versions=":".join(get_models_versions(PRICES_CACHE_MODELS)),
+    )
+    return {f"{prefix}:{product_id}": product_id for product_id in product_ids}
+
+
+def get_product_prices(product_ids: Iterable[int]) -> dict[int, ProductPrice]:
+    """
+    Получение цен товаров с учетом действующих скидок: {id товара: цена}
+
+    * цены загружаются одним запросом для всех товаров, скидки берутся
+      из набора действующих скидок распродаж
+    * результат кэшируется на короткое время, изменение товаров
+      или распродаж сбрасывает кэш
+    * отсутствующие товары в результат не попадают
+    """
+
+    cache_keys = get_price_cache_keys(set(product_ids))
+    cached = cache.get_many(cache_keys)
+    prices: dict[int, ProductPrice] = {
+        cache_keys[key]: ProductPrice(*value) for key, value in cached.items()
+    }
+
+    missing_ids = [
+        product_id for key, product_id in cache_keys.items() if key not in cached
+    ]
+    if not missing_ids:
+        return prices
+
+    active_sales = get_active_sales()
+    for product_id, base_price, free_delivery in Product.objects.filter(
+        pk__in=missing_ids
+    ).values_list("pk", "price", "freeDelivery"):
+        _, discount = active_sales.get(product_id, (None, 0))
+        price = ProductPrice(
+            product_id=product_id,
+            base_price=base_price,
+            discount=discount,
+            price=(
+                SaleItems.get_discounted_price(base_price, discount)
+                if discount
+                else base_price
+            ),
+            free_delivery=free_delivery,
+        )
+        prices[product_id] = price
+
+    cache.set_many(
+        {
+            key: tuple(prices[product_id])
+            for key, product_id in cache_keys.items()
+            if key not in cached and product_id in prices
+        },
+        timeout=PRICES_CACHE_TIMEOUT,
+    )
+    return prices
@@ -0,0 +1,70 @@
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from mainsite.cache_utils import get_versioned_cache_key
+from products_app.models import Sales, SaleItems
+
+# Модели, от которых зависит набор действующих скидок
+ACTIVE_SALES_CACHE_MODELS = (Sales, SaleItems)
+ACTIVE_SALES_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_next_sales_boundary(day: datetime.date) -> datetime.date | None:
+    """
+    Ближайшая после 'day' дата, в которую меняется набор действующих скидок
+
+    * начало еще не действующей распродажи или день после окончания
+      действующей; None - если таких дат нет
+    """
+
+    candidates = SaleItems.objects.filter(is_active=True, sale__is_active=True)
+    boundaries = candidates.aggregate(
+        next_start=Min("dateFrom", filter=Q(dateFrom__gt=day)),
+        next_end=Min("dateTo", filter=Q(dateFrom__lte=day, dateTo__gte=day)),
+    )
+    dates = []
+    if boundaries["next_start"] is not None:
+        dates.append(boundaries["next_start"])
+    if boundaries["next_end"] is not None:
+        dates.append(boundaries["next_end"] + datetime.timedelta(days=1))
+    return min(dates, default=None)
+
+
+def get_active_sales(day: datetime.date | None = None) -> dict[int, tuple[int, int]]:
+    """
+    Получение действующих на дату скидок: {id товара: (id элемента, скидка)}
+
+    * набор хранится в кэше вместе с периодом, в течение которого он
+      не меняется, и пересчитывается только при переходе через дату
+      начала или окончания распродажи либо при изменении распродаж
+    """
+
+    day = day or timezone.localdate()
+    cache_key = get_versioned_cache_key("active_sales", {}, ACTIVE_SALES_CACHE_MODELS)
+    cached = cache.get(cache_key)
+    if (
+        cached is not None
+        and cached["valid_from"] <= day
+        and (cached["valid_until"] is None or day < cached["valid_until"])
+    ):
+        return cached["sales"]
+
+    sales = {
+        product_id: (sale_item_id, discount)
+        for sale_item_id, product_id, discount in SaleItems.objects.active(
+            day
+        ).values_list("pk", "product_id", "discount")
+    }
+    cache.set(
+        cache_key,
+        {
+            "valid_from": day,
+            "valid_until": get_next_sales_boundary(day),
+            "sales": sales,
+        },
+        timeout=ACTIVE_SALES_CACHE_TIMEOUT,
+    )
+    return sales
@@ -0,0 +1,282 @@
+import re
+from abc import ABC, abstractmethod
+
+from django.db import connections
+from django.db.models import Expression, FloatField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+from django.db.utils import DEFAULT_DB_ALIAS
+
+from mainsite.main_logger import logger
+from products_app.models import Product
+
+# Имя таблицы FTS5 для SQLite и столбца tsvector для PostgreSQL
+SQLITE_FTS_TABLE = "products_app_product_fts"
+POSTGRES_SEARCH_VECTOR_COLUMN = "search_vector"
+POSTGRES_SEARCH_VECTOR_FUNCTION = "products_app_product_search_vector"
+POSTGRES_SEARCH_CONFIG = "russian"
+
+# Поля товара, по которым выполняется поиск, и их веса в ранжировании
+SEARCH_FIELDS = ("title", "description", "fullDescription")
+SQLITE_FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def get_search_words(text: str) -> list[str]:
+    """Разбиение поисковой строки на слова"""
+
+    return WORD_PATTERN.findall(text.lower())
+
+
+class BaseTableColumn(Expression):
+    """
+    Ссылка на столбец основной таблицы запроса, не описанный в модели
+
+    * псевдоним таблицы определяется при компиляции, поэтому выражение
+      корректно работает и во вложенных запросах
+    """
+
+    def __init__(self, column: str, output_field=None):
+        super().__init__(output_field=output_field)
+        self.column = column
+
+    def as_sql(self, compiler, connection):
+        alias = compiler.query.get_initial_alias()
+        return (
+            "{table}.{column}".format(
+                table=compiler.quote_name_unless_alias(alias),
+                column=connection.ops.quote_name(self.column),
+            ),
+            [],
+        )
+
+
+class SqliteFtsRank(Expression):
+    """Релевантность товара по данным таблицы FTS5 (чем больше, тем выше)"""
+
+    output_field = FloatField()
+
+    def __init__(self, match: str):
+        super().__init__()
+        self.match = match
+
+    def as_sql(self, compiler, connection):
+        alias = compiler.query.get_initial_alias()
+        weights = ", ".join(str(weight) for weight in SQLITE_FTS_WEIGHTS)
+        sql = (
+            "(SELECT -bm25({fts}, {weights}) FROM {fts} "
+            "WHERE {fts} MATCH %s AND {fts}.rowid = {table}.{pk})"
+        ).format(
+            fts=SQLITE_FTS_TABLE,
+            weights=weights,
+            table=compiler.quote_name_unless_alias(alias),
+            pk=connection.ops.quote_name(Product._meta.pk.column),
+        )
+        return sql, [self.match]
+
+
+class BaseSearchBackend(ABC):
+    """
+    Базовый поисковый движок каталога
+
+    * 'search' фильтрует товары и добавляет аннотацию 'search_rank'
+    * 'index_products' и 'remove_products' синхронизируют поисковый индекс,
+      если он ведется на стороне приложения
+    """
+
+    vendor: str | None = None
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS):
+        self.using = using
+
+    @abstractmethod
+    def search(self, queryset: QuerySet, text: str) -> QuerySet:
+        """Поиск товаров по строке"""
+
+    def index_products(self, products: list[Product]) -> None:
+        """Добавление или обновление товаров в поисковом индексе"""
+
+    def remove_products(self, product_ids: list[int]) -> None:
+        """Удаление товаров из поискового индекса"""
+
+    def rebuild_index(self) -> None:
+        """Полное перестроение поискового индекса"""
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Поиск подстроки в названии товара (без индекса)"""
+
+    def search(self, queryset: QuerySet, text: str) -> QuerySet:
+        """Поиск товаров по вхождению строки в название"""
+
+        return queryset.filter(title__icontains=text).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Полнотекстовый и триграммный поиск для PostgreSQL
+
+    * столбец tsvector по названию и описаниям товара поддерживается триггером
+    * слова запроса ищутся по префиксу, опечатки в названии находятся
+      через триграммное сходство
+    * релевантность - сумма ts_rank и триграммного сходства с названием
+    """
+
+    vendor = "postgresql"
+
+    def search(self, queryset: QuerySet, text: str) -> QuerySet:
+        """Поиск товаров по строке с ранжированием по релевантности"""
+
+        from django.contrib.postgres.search import (
+            SearchQuery,
+            SearchRank,
+            SearchVectorField,
+            TrigramWordSimilarity,
+        )
+
+        words = get_search_words(text)
+        if not words:
+            return SimpleSearchBackend(self.using).search(queryset, text)
+
+        query = SearchQuery(
+            " & ".join(f"{word}:*" for word in words),
+            config=POSTGRES_SEARCH_CONFIG,
+            search_type="raw",
+        )
+        document = BaseTableColumn(
+            POSTGRES_SEARCH_VECTOR_COLUMN, output_field=SearchVectorField()
+        )
+        return (
+            queryset.alias(search_document=document)
+            .filter(Q(search_document=query) | Q(title__trigram_word_similar=text))
+            .annotate(
+                search_rank=SearchRank(document, query)
+                + TrigramWordSimilarity(text, "title")
+            )
+        )
+
+    def rebuild_index(self) -> None:
+        """Полное перестроение столбца tsvector"""
+
+        connection = connections[self.using]
+        source_columns = ", ".join(
+            connection.ops.quote_name(Product._meta.get_field(field).column)
+            for field in SEARCH_FIELDS
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Product._meta.db_table} "
+                f"SET {POSTGRES_SEARCH_VECTOR_COLUMN} = "
+                f"{POSTGRES_SEARCH_VECTOR_FUNCTION}({source_columns})"
+            )
+
+
+class SqliteSearchBackend(BaseSearchBackend):
+    """
+    Полнотекстовый поиск для SQLite на основе таблицы FTS5
+
+    * таблица FTS5 заполняется обработчиками сигналов сохранения товара
+    * слова запроса ищутся по префиксу, релевантность считается через bm25
+    """
+
+    vendor = "sqlite"
+
+    def is_available(self) -> bool:
+        """Проверка наличия таблицы FTS5 (SQLite может быть собран без FTS5)"""
+
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [SQLITE_FTS_TABLE],
+            )
+            return cursor.fetchone() is not None
+
+    def search(self, queryset: QuerySet, text: str) -> QuerySet:
+        """Поиск товаров по строке с ранжированием по релевантности"""
+
+        words = get_search_words(text)
+        if not words or not self.is_available():
+            return SimpleSearchBackend(self.using).search(queryset, text)
+
+        match = " ".join('"{word}"*'.format(word=word) for word in words)
+        matched_ids = RawSQL(
+            f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s",
+            [match],
+        )
+        return queryset.filter(pk__in=matched_ids).annotate(
+            search_rank=SqliteFtsRank(match)
+        )
+
+    def index_products(self, products: list[Product]) -> None:
+        """Добавление или обновление товаров в таблице FTS5"""
+
+        if not products or not self.is_available():
+            return
+
+        columns = ", ".join(SEARCH_FIELDS)
+        placeholders = ", ".join(["%s"] * (len(SEARCH_FIELDS) + 1))
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s",
+                [(product.pk,) for product in products],
+            )
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, {columns}) "
+                f"VALUES ({placeholders})",
+                [
+                    (product.pk,)
+                    + tuple(getattr(product, field) or "" for field in SEARCH_FIELDS)
+                    for product in products
+                ],
+            )
+
+    def remove_products(self, product_ids: list[int]) -> None:
+        """Удаление товаров из таблицы FTS5"""
+
+        if not product_ids or not self.is_available():
+            return
+
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s",
+                [(product_id,) for product_id in product_ids],
+            )
+
+    def rebuild_index(self) -> None:
+        """Полное перестроение таблицы FTS5 по таблице товаров"""
+
+        if not self.is_available():
+            logger.warning("FTS5 table %s not found", SQLITE_FTS_TABLE)
+            return
+
+        columns = ", ".join(SEARCH_FIELDS)
+        source_columns = ", ".join(
+            "COALESCE({column}, '')".format(
+                column=connections[self.using].ops.quote_name(
+                    Product._meta.get_field(field).column
+                )
+            )
+            for field in SEARCH_FIELDS
+        )
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, {columns}) "
+                f"SELECT id, {source_columns} FROM {Product._meta.db_table}"
+            )
+
+
+SEARCH_BACKENDS: dict[str, type[BaseSearchBackend]] = {
+    PostgresSearchBackend.vendor: PostgresSearchBackend,
+    SqliteSearchBackend.vendor: SqliteSearchBackend,
+}
+
+
+def get_search_backend(using: str = DEFAULT_DB_ALIAS) -> BaseSearchBackend:
+    """Выбор поискового движка по типу базы данных"""
+
+    vendor = connections[using].vendor
+    backend_class = SEARCH_BACKENDS.get(vendor, SimpleSearchBackend)
+    return backend_class(using)
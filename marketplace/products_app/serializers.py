@@ -43,20 +43,18 @@ class ProductShortSerializer(serializers.ModelSerializer):
             "rating",
         )
 
-    @staticmethod
-    def get_review_count(product: Product) -> int:
-        """Получение количества отзывов"""
-
-        return product.reviews.count()
-
-    reviews = serializers.SerializerMethodField(method_name="get_review_count")
+    reviews = serializers.IntegerField(source="review_count", read_only=True)
     price = serializers.DecimalField(
         max_digits=10, decimal_places=2, coerce_to_string=False
     )
     images = ProductImageSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     rating = serializers.DecimalField(
-        coerce_to_string=False, max_digits=5, decimal_places=2
+        source="rating_avg",
+        coerce_to_string=False,
+        max_digits=5,
+        decimal_places=2,
+        read_only=True,
     )
 
 
@@ -111,7 +109,7 @@ class ProductFullSerializer(serializers.ModelSerializer):
     tags = TagNameSerializer(many=True, read_only=True)
     reviews = ProductReviewSerializer(many=True, read_only=True)
     specifications = ProductSpecificationSerializer(many=True, read_only=True)
-    rating = serializers.FloatField(read_only=True)
+    rating = serializers.FloatField(source="rating_avg", read_only=True)
 
 
 class SaleItemsSerializer(serializers.ModelSerializer):
@@ -128,6 +126,13 @@ class SaleItemsSerializer(serializers.ModelSerializer):
             "title",
             "images",
         )
+        # Связи, используемые полями 'SerializerMethodField'
+        prefetch_hints = {
+            "id": [("product", None)],
+            "price": [("product", None)],
+            "title": [("product", None)],
+            "images": [("product__images", None)],
+        }
 
     id = serializers.SerializerMethodField(method_name="get_id")
     price = serializers.SerializerMethodField(method_name="get_price")
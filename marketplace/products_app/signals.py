@@ -0,0 +1,119 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalog_app.models import Category
+from mainsite.cache_utils import track_model_versions
+from orders_app.models import OrderProduct
+from products_app.models import (
+    Product,
+    ProductImage,
+    ProductReview,
+    Sales,
+    SaleItems,
+)
+from products_app.search import SEARCH_FIELDS, get_search_backend
+from products_app.utils import (
+    recalculate_products_rating,
+    update_product_popularity,
+    update_product_rating,
+)
+from tags_app.models import Tag
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_on_review_save(
+    sender, instance: ProductReview, created: bool, raw: bool, **kwargs
+) -> None:
+    """Обновление рейтинга товара при создании или изменении отзыва"""
+
+    if raw:
+        return
+
+    loaded_values = getattr(instance, "_loaded_values", {})
+    old_product_id = loaded_values.get("product_id")
+    old_rate = loaded_values.get("rate")
+
+    if created:
+        update_product_rating(instance.product_id, instance.rate, 1)
+    elif old_product_id is None or old_rate is None:
+        # Исходные значения отзыва неизвестны, пересчитываем рейтинг полностью
+        recalculate_products_rating([instance.product_id])
+    elif old_product_id != instance.product_id:
+        update_product_rating(old_product_id, -old_rate, -1)
+        update_product_rating(instance.product_id, instance.rate, 1)
+    elif old_rate != instance.rate:
+        update_product_rating(instance.product_id, instance.rate - old_rate, 0)
+
+    instance._loaded_values = {
+        "product_id": instance.product_id,
+        "rate": instance.rate,
+    }
+
+
+@receiver(post_delete, sender=ProductReview)
+def update_rating_on_review_delete(sender, instance: ProductReview, **kwargs) -> None:
+    """Обновление рейтинга товара при удалении отзыва"""
+
+    loaded_values = getattr(instance, "_loaded_values", {})
+    product_id = loaded_values.get("product_id", instance.product_id)
+    rate = loaded_values.get("rate", instance.rate)
+    update_product_rating(product_id, -rate, -1)
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(
+    sender, instance: Product, using: str, update_fields=None, **kwargs
+) -> None:
+    """Обновление поискового индекса при сохранении товара"""
+
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        return
+    get_search_backend(using).index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance: Product, using: str, **kwargs) -> None:
+    """Удаление товара из поискового индекса"""
+
+    get_search_backend(using).remove_products([instance.pk])
+
+
+def get_order_product_day(instance: OrderProduct):
+    """День заказа товара для таблицы популярности"""
+
+    if instance.added_at is None:
+        return timezone.localdate()
+    return timezone.localdate(instance.added_at)
+
+
+@receiver(post_save, sender=OrderProduct)
+def update_popularity_on_order_product_save(
+    sender, instance: OrderProduct, created: bool, **kwargs
+) -> None:
+    """
+    Учет товара в заказе в таблице популярности
+
+    * при загрузке фикстур (raw) итоги тоже обновляются,
+      так как используются только поля самой записи
+    """
+
+    if created:
+        update_product_popularity(
+            instance.product_id, get_order_product_day(instance), 1
+        )
+
+
+@receiver(post_delete, sender=OrderProduct)
+def update_popularity_on_order_product_delete(
+    sender, instance: OrderProduct, **kwargs
+) -> None:
+    """Исключение удаленного товара в заказе из таблицы популярности"""
+
+    update_product_popularity(instance.product_id, get_order_product_day(instance), -1)
+
+
+# Смена версий моделей для кэша ответов каталога
+track_model_versions(
+    Product, ProductImage, ProductReview, Sales, SaleItems, Tag, Category, OrderProduct
+)
@@ -1,7 +1,51 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from decimal import Decimal
+from unittest import skipUnless
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.db.utils import DEFAULT_DB_ALIAS
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 
-from products_app.models import Product
+from catalog_app.models import Category, CategoryClosure
+from mainsite.values_serializer import ValuesSerializer
+from orders_app.models import OrderProduct
+from products_app.banners import (
+    BANNERS_LIMIT,
+    get_banner_product_ids_by_subquery,
+    get_banner_product_ids_by_window,
+)
+from products_app.importer import ProductImporter
+from products_app.models import (
+    Product,
+    ProductImage,
+    ProductPopularity,
+    ProductReview,
+    Sales,
+    SaleItems,
+)
+from tags_app.models import Tag
+from products_app.pricing import get_product_prices
+from products_app.search import PostgresSearchBackend
+from products_app.sales import get_active_sales
+from products_app.serializers import ProductFullSerializer, ProductShortSerializer
+from products_app.views import PopularProductsListAPIView, ProductsShortListAPIView
 from django.contrib.auth.models import User
 
 
@@ -10,6 +54,9 @@ class ProductsApiViewTests(TestCase):
 
     fixtures = ["db_data_fixture.json"]
 
+    def setUp(self):
+        cache.clear()
+
     def test_can_get_all_products(self):
         """Тест - возможно получить все товары"""
 
@@ -69,6 +116,109 @@ class ProductsApiViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(len(response.json()) > 0)
 
+    def test_popular_products_are_served_from_rollups(self):
+        """
+        Тест - итоги популярности совпадают с товарами в заказах,
+        топ-товары сортируются по ним с учетом окна
+        """
+
+        actual = {
+            (row["product"], timezone.localdate(row["added_at"]))
+            for row in OrderProduct.objects.values("product", "added_at")
+        }
+        rollups = ProductPopularity.objects.filter(orders_count__gt=0)
+        self.assertEqual(
+            sum(rollups.values_list("orders_count", flat=True)),
+            OrderProduct.objects.count(),
+        )
+        self.assertEqual(set(rollups.values_list("product", "day")), actual)
+
+        today = timezone.localdate()
+        old_product, new_product = Product.objects.filter(available=True)[:2]
+        ProductPopularity.objects.create(
+            product=old_product,
+            day=today - datetime.timedelta(days=100),
+            orders_count=1000,
+        )
+        ProductPopularity.objects.create(
+            product=new_product, day=today, orders_count=500
+        )
+        path = reverse("products_app:popular_products_list")
+
+        for params, first_product in (
+            ({}, old_product),
+            ({"window": "7d"}, new_product),
+            ({"decay": 7}, new_product),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(path=path, query_params=params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()[0]["id"], first_product.pk)
+                self.assertEqual(
+                    len(response.json()), PopularProductsListAPIView.view_limit
+                )
+
+        for params in (
+            {"window": "1y"},
+            {"decay": "-1"},
+            {"decay": "x"},
+            {"decay": "7.0001"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(path=path, query_params=params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_product_popularity_command(self):
+        """Тест - команда пересчета восстанавливает итоги популярности"""
+
+        expected = set(
+            ProductPopularity.objects.values_list("product", "day", "orders_count")
+        )
+        ProductPopularity.objects.all().delete()
+
+        call_command("rebuild_product_popularity", stdout=StringIO())
+        self.assertEqual(
+            set(
+                ProductPopularity.objects.values_list("product", "day", "orders_count")
+            ),
+            expected,
+        )
+
+    def test_banner_products_are_selected_in_one_query(self):
+        """
+        Тест - товары баннеров выбираются одним запросом, способы выбора
+        совпадают с выбором по категориям, кэш сбрасывается при смене
+        избранных категорий
+        """
+
+        expected_ids = []
+        for category in Category.objects.filter(favorite=True)[:BANNERS_LIMIT]:
+            product = category.products.filter(available=True).first()
+            if product is not None:
+                expected_ids.append(product.pk)
+        self.assertTrue(expected_ids, "Favorite categories with products not found.")
+
+        for get_product_ids in (
+            get_banner_product_ids_by_window,
+            get_banner_product_ids_by_subquery,
+        ):
+            with self.subTest(get_product_ids=get_product_ids.__name__):
+                with self.assertNumQueries(1):
+                    product_ids = get_product_ids(BANNERS_LIMIT, DEFAULT_DB_ALIAS)
+                self.assertEqual(product_ids, expected_ids)
+
+        path = reverse("products_app:favorite_categories_products_list")
+        response = self.client.get(path=path)
+        self.assertEqual([item["id"] for item in response.json()], expected_ids)
+        with self.assertNumQueries(0):
+            self.client.get(path=path)
+
+        category = Product.objects.get(pk=expected_ids[0]).category
+        category.favorite = False
+        category.save()
+        response = self.client.get(path=path)
+        self.assertNotIn(expected_ids[0], [item["id"] for item in response.json()])
+
     def test_can_get_limited_products(self):
         """Тест - возможно получить лимитированные товары"""
 
@@ -115,3 +265,580 @@ class ProductsApiViewTests(TestCase):
         self.assertEqual(received_data["email"], user.email)
         self.assertEqual(received_data["text"], review_data["text"])
         self.assertEqual(received_data["rate"], review_data["rate"])
+
+    def test_review_updates_product_rating(self):
+        """Тест - создание, изменение и удаление отзыва обновляют рейтинг товара"""
+
+        user = User.objects.last()
+        product = Product.objects.filter(review_count=0).first()
+        self.assertTrue(product, "Product without reviews not found.")
+        if user is None or product is None:
+            return False
+
+        review = ProductReview.objects.create(
+            product=product,
+            user=user,
+            author="Author name",
+            email="first_email@mail.ru",
+            text="text",
+            rate=5,
+        )
+        ProductReview.objects.create(
+            product=product,
+            user=user,
+            author="Author name",
+            email="second_email@mail.ru",
+            text="text",
+            rate=4,
+        )
+        product.refresh_from_db()
+        self.assertEqual(product.review_count, 2)
+        self.assertEqual(product.rating_sum, 9)
+        self.assertEqual(product.rating, 4.5)
+
+        review.rate = 1
+        review.save()
+        product.refresh_from_db()
+        self.assertEqual(product.rating_sum, 5)
+        self.assertEqual(product.rating, 2.5)
+
+        review.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.review_count, 1)
+        self.assertEqual(product.rating, 4.0)
+
+    def test_product_ratings_are_consistent(self):
+        """Тест - сохраненный рейтинг товаров совпадает с отзывами"""
+
+        Product.objects.update(review_count=0, rating_sum=0)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_product_ratings", check=True, stdout=StringIO())
+
+        call_command("rebuild_product_ratings", stdout=StringIO())
+        call_command("rebuild_product_ratings", check=True, stdout=StringIO())
+
+    def test_can_walk_catalog_with_cursor(self):
+        """
+        Тест - возможно получить все товары каталога постранично по курсору
+        для каждого вида сортировки
+        """
+
+        sort_fields = {
+            "price": "price",
+            "date": "date",
+            "rating": "rating_avg",
+            "reviews": "review_count",
+        }
+        for sort, field in sort_fields.items():
+            for sort_type, direction in (("inc", ""), ("desc", "-")):
+                expected_ids = list(
+                    Product.objects.order_by(
+                        f"{direction}{field}", f"{direction}id"
+                    ).values_list("id", flat=True)
+                )
+                params = {"sort": sort, "sortType": sort_type, "limit": 7}
+
+                received_ids, pages, cursor = [], [], ""
+                while cursor is not None:
+                    response = self.client.get(
+                        path=reverse("products_app:products_short_list"),
+                        query_params={**params, "cursor": cursor},
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    data = response.json()
+                    self.assertNotIn("lastPage", data)
+                    pages.append([item["id"] for item in data["items"]])
+                    received_ids.extend(pages[-1])
+                    cursor = data["nextCursor"]
+
+                self.assertEqual(received_ids, expected_ids)
+
+                # Курсор предыдущей страницы возвращает ту же страницу
+                response = self.client.get(
+                    path=reverse("products_app:products_short_list"),
+                    query_params={**params, "cursor": data["prevCursor"]},
+                )
+                previous_ids = [item["id"] for item in response.json()["items"]]
+                self.assertEqual(previous_ids, pages[-2])
+
+    def test_invalid_cursor_returns_not_found(self):
+        """Тест - некорректный курсор приводит к ошибке 404"""
+
+        response = self.client.get(
+            path=reverse("products_app:products_short_list"),
+            query_params={"cursor": "not-a-cursor"},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_can_search_products(self):
+        """
+        Тест - поиск находит товары по названию и описаниям
+        и выводит совпадения в названии первыми
+        """
+
+        category = Product.objects.first().category
+        in_title = Product.objects.create(
+            category=category,
+            price=100,
+            title="Уникальныйтовар в названии",
+        )
+        in_description = Product.objects.create(
+            category=category,
+            price=100,
+            title="Другой товар",
+            fullDescription="Описание про уникальныйтовар",
+        )
+
+        response = self.client.get(
+            path=reverse("products_app:products_short_list"),
+            query_params={"filter[name]": "УНИКАЛЬНЫЙТОВ"},
+        )
+        self.assertEqual(response.status_code, 200)
+        received_ids = [item["id"] for item in response.json()["items"]]
+        self.assertEqual(received_ids, [in_title.pk, in_description.pk])
+
+        in_description.title = "Переименованный товар"
+        in_description.fullDescription = "Описание"
+        in_description.save()
+        response = self.client.get(
+            path=reverse("products_app:products_short_list"),
+            query_params={"filter[name]": "уникальныйтовар"},
+        )
+        received_ids = [item["id"] for item in response.json()["items"]]
+        self.assertEqual(received_ids, [in_title.pk])
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_postgres_search_queryset_compiles(self):
+        """Тест - запрос поиска PostgreSQL выполняется вместе с выборкой карточек"""
+
+        queryset = PostgresSearchBackend().search(Product.objects.all(), "товар")
+        self.assertIn("search_rank", queryset.query.annotation_select)
+        self.assertNotIn("search_document", queryset.query.annotation_select)
+
+        values_serializer = ValuesSerializer(ProductShortSerializer())
+        rows = values_serializer.get_rows(
+            queryset, *queryset.query.annotation_select
+        ).order_by("-search_rank")
+        self.assertIn("search_rank", str(rows.query))
+        list(rows)
+
+    def test_catalog_cache_is_invalidated_on_change(self):
+        """
+        Тест - повторный запрос каталога отдается из кэша,
+        а изменение товара сбрасывает кэш
+        """
+
+        product = Product.objects.first()
+        params = {"filter[category]": product.category_id, "limit": 100}
+        path = reverse("products_app:products_short_list")
+
+        first_response = self.client.get(path=path, query_params=params)
+        self.assertEqual(first_response.status_code, 200)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(path=path, query_params=params)
+        self.assertEqual(cached_response.json(), first_response.json())
+
+        product.title = "Новое название товара"
+        product.save()
+        response = self.client.get(path=path, query_params=params)
+        titles = {item["id"]: item["title"] for item in response.json()["items"]}
+        self.assertEqual(titles[product.pk], product.title)
+
+    def test_can_get_catalog_facets(self):
+        """Тест - фасеты каталога соответствуют отфильтрованным товарам"""
+
+        category = Category.objects.filter(parent__isnull=True).first()
+        products = Product.objects.filter(
+            category__in=CategoryClosure.objects.descendant_ids(category.pk)
+        )
+
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                path=reverse("products_app:products_facets"),
+                query_params={"filter[category]": category.pk},
+            )
+        self.assertEqual(response.status_code, 200)
+        facets = response.json()
+
+        self.assertEqual(facets["count"], products.count())
+        self.assertEqual(
+            sum(bucket["count"] for bucket in facets["price"]["histogram"]),
+            products.count(),
+        )
+        self.assertEqual(
+            facets["freeDelivery"]["true"],
+            products.filter(freeDelivery=True).count(),
+        )
+        for tag in facets["tags"]:
+            self.assertEqual(tag["count"], products.filter(tags=tag["id"]).count())
+
+        subcategories_count = sum(item["count"] for item in facets["categories"])
+        self.assertEqual(
+            subcategories_count, products.exclude(category=category).count()
+        )
+
+    def test_export_products_csv(self):
+        """Тест - каталог товаров выгружается в CSV"""
+
+        output = StringIO()
+        call_command("export_products", format="csv", chunk_size=2, stdout=output)
+
+        rows = list(csv.DictReader(StringIO(output.getvalue())))
+        self.assertEqual(len(rows), Product.objects.count())
+        product = Product.objects.select_related("category").order_by("pk").first()
+        self.assertEqual(rows[0]["id"], str(product.pk))
+        self.assertEqual(rows[0]["category_title"], product.category.title)
+
+
+class ValuesSerializerParityTests(TestCase):
+    """Тесты совпадения данных ValuesSerializer с данными сериализаторов товаров"""
+
+    fixtures = ["db_data_fixture.json"]
+
+    def assertSameJson(self, serializer_class, queryset):
+        """Проверка побайтового совпадения JSON сериализатора и ValuesSerializer"""
+
+        request = Request(RequestFactory().get("/", SERVER_NAME="localhost"))
+        context = {"request": request}
+        expected = serializer_class(queryset, many=True, context=context).data
+
+        values_serializer = ValuesSerializer(serializer_class(context=context))
+        received = values_serializer.to_representation(
+            values_serializer.get_rows(queryset)
+        )
+        self.assertEqual(
+            JSONRenderer().render(received), JSONRenderer().render(expected)
+        )
+
+    def test_product_short_serializer_parity(self):
+        """Тест - карточки товаров совпадают с ProductShortSerializer"""
+
+        self.assertSameJson(ProductShortSerializer, Product.objects.all())
+
+    def test_product_full_serializer_parity(self):
+        """Тест - полные данные товаров совпадают с ProductFullSerializer"""
+
+        self.assertSameJson(ProductFullSerializer, Product.objects.all())
+
+    def test_product_without_relations_parity(self):
+        """Тест - данные товара без изображений, меток и отзывов совпадают"""
+
+        product = Product.objects.create(
+            category=Product.objects.first().category,
+            price="10.5",
+            title="Товар без связей",
+            description=None,
+        )
+        queryset = Product.objects.filter(pk=product.pk)
+        self.assertSameJson(ProductShortSerializer, queryset)
+        self.assertSameJson(ProductFullSerializer, queryset)
+
+    def test_values_list_response_skips_aliases(self):
+        """Тест - имена из alias() не выбираются вместе с аннотациями"""
+
+        view = ProductsShortListAPIView()
+        view.request = view.initialize_request(RequestFactory().get("/"))
+        view.format_kwarg = None
+        view.args, view.kwargs = (), {}
+        queryset = (
+            Product.objects.alias(doubled_price=F("price") * 2)
+            .annotate(sort_price=F("doubled_price"))
+            .order_by("sort_price", "pk")
+        )
+
+        response = view.get_values_list_response(queryset)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["items"]), min(queryset.count(), 10))
+
+    def test_catalog_views_use_values_serializer(self):
+        """Тест - списки товаров формируются без загрузки связей по каждому товару"""
+
+        cache.clear()
+        paths = (
+            reverse("products_app:products_short_list"),
+            reverse("products_app:popular_products_list"),
+            reverse("products_app:limited_products_list"),
+            reverse("products_app:favorite_categories_products_list"),
+        )
+        for path in paths:
+            with self.subTest(path=path):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path=path, query_params={"limit": 100})
+                self.assertEqual(response.status_code, 200)
+                for table in ("products_app_productimage", "tags_app_tag"):
+                    related_queries = [
+                        query for query in queries if table in query["sql"]
+                    ]
+                    self.assertLessEqual(len(related_queries), 1)
+
+
+class SalesTests(TestCase):
+    """Тесты расчета цен и набора действующих скидок распродаж"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        category = Category.objects.create(title="Категория распродажи")
+        products = Product.objects.bulk_create(
+            [
+                Product(category=category, price=Decimal("99.99"), title=f"Товар {n}")
+                for n in range(4)
+            ]
+        )
+        sale = Sales.objects.create(name="Распродажа")
+        inactive_sale = Sales.objects.create(name="Завершенная", is_active=False)
+        day = datetime.timedelta(days=1)
+        cls.active_item = SaleItems.objects.create(
+            sale=sale,
+            product=products[0],
+            discount=15,
+            dateFrom=cls.today - day,
+            dateTo=cls.today + day,
+        )
+        cls.future_item = SaleItems.objects.create(
+            sale=sale,
+            product=products[1],
+            discount=20,
+            dateFrom=cls.today + 3 * day,
+            dateTo=cls.today + 5 * day,
+        )
+        SaleItems.objects.create(
+            sale=inactive_sale,
+            product=products[2],
+            discount=30,
+            dateFrom=cls.today - day,
+            dateTo=cls.today + day,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sale_price_is_calculated_in_query(self):
+        """Тест - цена со скидкой в запросе совпадает с расчетом в модели"""
+
+        items = SaleItems.objects.select_related("product", "sale")
+        for item in items.with_sale_price(self.today):
+            with self.subTest(item=item.pk):
+                expected = SaleItems.objects.get(pk=item.pk).salePrice
+                self.assertEqual(item.sale_price, expected)
+                self.assertEqual(item.sale_active, item.pk == self.active_item.pk)
+        self.assertEqual(
+            SaleItems.objects.with_sale_price(self.today)
+            .get(pk=self.active_item.pk)
+            .sale_price,
+            Decimal("84.99"),
+        )
+
+        response = self.client.get(reverse("products_app:sales_products_list"))
+        self.assertEqual(response.status_code, 200)
+        items = response.json()["items"]
+        self.assertEqual([item["id"] for item in items], [self.active_item.product_id])
+        self.assertEqual(items[0]["salePrice"], 84.99)
+
+    def test_active_sales_are_recomputed_at_boundaries(self):
+        """Тест - набор скидок пересчитывается только на границах распродаж"""
+
+        day = datetime.timedelta(days=1)
+        expected = {self.active_item.product_id: (self.active_item.pk, 15)}
+        self.assertEqual(get_active_sales(self.today), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_sales(self.today + day), expected)
+
+        self.assertEqual(get_active_sales(self.today + 2 * day), {})
+        with self.assertNumQueries(0):
+            get_active_sales(self.today + 2 * day)
+        self.assertEqual(
+            get_active_sales(self.today + 3 * day),
+            {self.future_item.product_id: (self.future_item.pk, 20)},
+        )
+
+        self.future_item.discount = 25
+        self.future_item.save()
+        self.assertEqual(
+            get_active_sales(self.today + 3 * day),
+            {self.future_item.product_id: (self.future_item.pk, 25)},
+        )
+
+    def test_product_prices_include_active_discounts(self):
+        """Тест - цены товаров рассчитываются пачкой и кэшируются"""
+
+        product_ids = list(Product.objects.values_list("pk", flat=True))
+        with self.assertNumQueries(3):
+            prices = get_product_prices(product_ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_product_prices(product_ids), prices)
+
+        self.assertEqual(set(prices), set(product_ids))
+        active_price = prices[self.active_item.product_id]
+        self.assertEqual(active_price.discount, 15)
+        self.assertEqual(active_price.price, Decimal("84.99"))
+        future_price = prices[self.future_item.product_id]
+        self.assertEqual(future_price.price, future_price.base_price)
+
+
+class ProductImportTests(TestCase):
+    """Тесты импорта товаров из манифеста и архива изображений"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+        self.category = Category.objects.create(title="Phones")
+        self.rows = [
+            {
+                "sku": "PH-1",
+                "title": "Phone 1",
+                "category": "Phones",
+                "price": "100.50",
+                "count": 5,
+                "tags": ["new", "sale"],
+                "images": ["ph1.png"],
+                "specifications": {"Color": "black"},
+            },
+            {"sku": "PH-2", "title": "Phone 2", "category": "Phones", "price": 20},
+            {"sku": "PH-3", "title": "Phone 3", "category": "Unknown", "price": 1},
+        ]
+
+    def get_manifest(self, rows: list[dict]) -> BytesIO:
+        return BytesIO("".join(json.dumps(row) + "\n" for row in rows).encode())
+
+    def get_images(self) -> BytesIO:
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("ph1.png", b"image")
+        archive.seek(0)
+        return archive
+
+    def test_import_products_with_images(self):
+        """Тест - товары создаются и обновляются по артикулу, изображения пишутся в хранилище"""
+
+        importer = ProductImporter(
+            self.get_manifest(self.rows), "ndjson", images=self.get_images()
+        )
+        batches = list(importer.run())
+
+        self.assertEqual(sum(batch.products for batch in batches), 2)
+        self.assertEqual(sum(batch.images for batch in batches), 1)
+        errors = [error for batch in batches for error in batch.errors]
+        self.assertEqual(len(errors), 1)
+        self.assertIn("Unknown", errors[0])
+
+        product = Product.objects.get(sku="PH-1")
+        self.assertEqual(product.price, Decimal("100.50"))
+        self.assertEqual(
+            set(product.tags.values_list("name", flat=True)), {"new", "sale"}
+        )
+        self.assertEqual(
+            list(product.specifications.values_list("name", "value")),
+            [("Color", "black")],
+        )
+        image = ProductImage.objects.get(product=product)
+        self.assertEqual(image.alt, "ph1.png")
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, image.src.name)))
+
+        manifest = StringIO()
+        writer = csv.DictWriter(
+            manifest,
+            fieldnames=["sku", "title", "category", "price", "tags", "images"],
+            delimiter=";",
+        )
+        writer.writeheader()
+        writer.writerow(
+            {
+                "sku": "PH-1",
+                "title": "Phone 1",
+                "category": "Phones",
+                "price": "90",
+                "tags": "sale",
+                "images": "ph1.png",
+            }
+        )
+        list(
+            ProductImporter(
+                BytesIO(manifest.getvalue().encode()),
+                "csv",
+                images=self.get_images(),
+            ).run()
+        )
+
+        self.assertEqual(Product.objects.filter(sku__startswith="PH-").count(), 2)
+        product.refresh_from_db()
+        self.assertEqual(product.price, Decimal("90"))
+        self.assertEqual(list(product.tags.values_list("name", flat=True)), ["sale"])
+        self.assertEqual(Tag.objects.filter(name="sale").count(), 1)
+        self.assertEqual(ProductImage.objects.filter(product=product).count(), 1)
+
+    def test_partial_manifest_keeps_missing_fields(self):
+        """Тест - повторный импорт без части колонок не сбрасывает остальные поля"""
+
+        product_row = {
+            **self.rows[1],
+            "count": 7,
+            "available": False,
+            "freeDelivery": True,
+            "description": "Описание",
+        }
+        list(ProductImporter(self.get_manifest([product_row]), "ndjson").run())
+
+        manifest = "sku;title;category;price\nPH-2;Phone 2;Phones;25\n"
+        batches = list(ProductImporter(BytesIO(manifest.encode()), "csv").run())
+        self.assertEqual(batches[0].errors, [])
+
+        product = Product.objects.get(sku="PH-2")
+        self.assertEqual(product.price, Decimal("25"))
+        self.assertEqual(product.count, 7)
+        self.assertFalse(product.available)
+        self.assertTrue(product.freeDelivery)
+        self.assertEqual(product.description, "Описание")
+
+    def test_import_resumes_from_checkpoint(self):
+        """Тест - прерванный импорт продолжается с последней сохраненной пачки"""
+
+        manifest = self.get_manifest(self.rows[:2])
+        batches = ProductImporter(manifest, "ndjson", batch_size=1).run()
+        next(batches)
+        batches.close()
+        self.assertEqual(Product.objects.filter(sku__startswith="PH-").count(), 1)
+
+        importer = ProductImporter(manifest, "ndjson", batch_size=1)
+        self.assertEqual(importer.resumed_from, 1)
+        self.assertEqual([batch.rows for batch in importer.run()], [1])
+        self.assertEqual(Product.objects.filter(sku__startswith="PH-").count(), 2)
+
+        self.assertEqual(
+            ProductImporter(manifest, "ndjson", batch_size=1).resumed_from, 0
+        )
+
+    def test_import_reports_out_of_range_price(self):
+        """Тест - цена, не помещающаяся в поле товара, дает ошибку строки"""
+
+        rows = [{**self.rows[1], "price": "123456789012"}, self.rows[0]]
+        batches = list(ProductImporter(self.get_manifest(rows), "ndjson").run())
+
+        errors = [error for batch in batches for error in batch.errors]
+        self.assertTrue(errors[0].startswith("line 1: invalid price"))
+        self.assertEqual(sum(batch.products for batch in batches), 1)
+
+    def test_admin_import_checks_permissions_and_archive(self):
+        """Тест - импорт доступен только с правами на товары, архив проверяется"""
+
+        url = reverse("admin:import_products")
+        staff = User.objects.create_user("staff", password="password", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        admin = User.objects.create_superuser("admin", "admin@mail.ru", "password")
+        self.client.force_login(admin)
+        response = self.client.post(
+            url,
+            {
+                "manifest": SimpleUploadedFile("products.ndjson", b"{}\n"),
+                "images": SimpleUploadedFile("images.zip", b"not a zip"),
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.context["form"].has_error("images"))
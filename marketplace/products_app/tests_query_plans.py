@@ -0,0 +1,224 @@
+import datetime
+import re
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.test import RequestFactory, TestCase
+from rest_framework.request import Request
+
+from catalog_app.models import Category
+from orders_app.models import Order
+from products_app.models import Product, Sales, SaleItems
+from products_app.views import (
+    LimitedProductsListAPIView,
+    ProductsShortListAPIView,
+    SalesProductsApiView,
+)
+
+# Признаки последовательного чтения таблицы в плане запроса
+SEQUENTIAL_SCAN_PATTERNS = {
+    "sqlite": r"\bSCAN {table}$",
+    "postgresql": r"\bSeq Scan on {table}\b",
+}
+
+# Признаки сортировки результатов без использования индекса
+SORT_PATTERNS = {
+    "sqlite": r"\bUSE TEMP B-TREE FOR ORDER BY\b",
+    "postgresql": r"\bSort\b",
+}
+
+
+class QueryPlansTests(TestCase):
+    """
+    Тесты планов запросов каталога и заказов
+
+    * запросы строятся теми же представлениями, что обслуживают API
+    * на синтетических данных проверяется, что основные таблицы
+      не читаются последовательным сканированием
+    """
+
+    products_count = 2000
+    orders_count = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        root = Category.objects.create(title="Корневая категория", favorite=True)
+        categories = [root] + [
+            Category.objects.create(title=f"Категория {number}", parent=root)
+            for number in range(20)
+        ]
+
+        Product.objects.bulk_create(
+            [
+                Product(
+                    category=categories[number % len(categories)],
+                    price=Decimal(number % 500 + 1),
+                    count=number % 10,
+                    title=f"Товар {number:05d}",
+                    limited=number % 50 == 0,
+                    available=number % 10 != 0,
+                    review_count=number % 7,
+                    rating_avg=Decimal(number % 5),
+                )
+                for number in range(cls.products_count)
+            ]
+        )
+
+        sale = Sales.objects.create(name="Распродажа")
+        today = datetime.date.today()
+        date_from = [
+            today - datetime.timedelta(days=number % 60) for number in range(500)
+        ]
+        SaleItems.objects.bulk_create(
+            [
+                SaleItems(
+                    sale=sale,
+                    product=product,
+                    discount=10,
+                    dateFrom=date_from[number],
+                    dateTo=date_from[number] + datetime.timedelta(days=number % 90 + 1),
+                    is_active=number % 3 != 0,
+                )
+                for number, product in enumerate(Product.objects.all()[:500])
+            ]
+        )
+
+        users = [
+            User.objects.create(username=f"plan_user_{number}") for number in range(50)
+        ]
+        cls.user = users[0]
+        Order.objects.bulk_create(
+            [
+                Order(user=users[number % len(users)], available=number % 20 != 0)
+                for number in range(cls.orders_count)
+            ]
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        if connection.vendor not in SEQUENTIAL_SCAN_PATTERNS:
+            self.skipTest(f"Query plans are not checked for {connection.vendor}")
+
+        if connection.vendor == "postgresql":
+            # На небольших таблицах PostgreSQL может предпочесть
+            # последовательное чтение, даже если подходящий индекс есть
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def get_view_queryset(self, view_class, query_params: dict | None = None):
+        """Получение отфильтрованного набора запросов представления"""
+
+        request = Request(RequestFactory().get("/", query_params or {}))
+        view = view_class(request=request, format_kwarg=None, kwargs={})
+        return view.filter_queryset(view.get_queryset())
+
+    def assertNoSequentialScan(
+        self, queryset: QuerySet, *tables: str, sorted_by_index: bool = False
+    ):
+        """
+        Проверка отсутствия последовательного чтения таблиц в плане запроса
+
+        * при 'sorted_by_index' также проверяется, что порядок строк
+          обеспечивается индексом, без отдельной сортировки
+        """
+
+        plan = queryset.explain()
+        patterns = [
+            SEQUENTIAL_SCAN_PATTERNS[connection.vendor].format(table=table)
+            for table in tables
+        ]
+        if sorted_by_index:
+            patterns.append(SORT_PATTERNS[connection.vendor])
+        for pattern in patterns:
+            for line in plan.splitlines():
+                self.assertIsNone(
+                    re.search(pattern, line), f"'{pattern}' found in plan:\n{plan}"
+                )
+
+    def test_catalog_sorting_uses_indexes(self):
+        """Тест - сортировки каталога выполняются по индексам"""
+
+        sorts = ("price", "date", "rating", "reviews", None)
+        for sort in sorts:
+            for available in (None, "true"):
+                query_params = {"sortType": "inc"}
+                if sort:
+                    query_params["sort"] = sort
+                if available:
+                    query_params["filter[available]"] = available
+                with self.subTest(query_params=query_params):
+                    queryset = self.get_view_queryset(
+                        ProductsShortListAPIView, query_params
+                    )
+                    self.assertNoSequentialScan(
+                        queryset[:20], Product._meta.db_table, sorted_by_index=True
+                    )
+
+    def test_catalog_filters_use_indexes(self):
+        """Тест - фильтры каталога по категории и цене используют индексы"""
+
+        category = Category.objects.filter(parent__isnull=False).first()
+        filters = (
+            {"filter[category]": category.pk},
+            {"filter[category]": category.pk, "filter[available]": "true"},
+            {"filter[minPrice]": 490, "filter[available]": "true"},
+            {"filter[minPrice]": 100, "filter[maxPrice]": 110, "sort": "price"},
+        )
+        for query_params in filters:
+            with self.subTest(query_params=query_params):
+                queryset = self.get_view_queryset(
+                    ProductsShortListAPIView, query_params
+                )
+                self.assertNoSequentialScan(queryset[:20], Product._meta.db_table)
+
+    def test_limited_products_use_partial_index(self):
+        """Тест - товары ограниченного тиража выбираются по частичному индексу"""
+
+        queryset = self.get_view_queryset(LimitedProductsListAPIView)
+        self.assertNoSequentialScan(
+            queryset, Product._meta.db_table, sorted_by_index=True
+        )
+
+    def test_banner_products_use_partial_index(self):
+        """Тест - товар избранной категории выбирается по частичному индексу"""
+
+        category = Category.objects.filter(parent__isnull=False).first()
+        queryset = category.products.filter(available=True)[:1]
+        self.assertNoSequentialScan(
+            queryset, Product._meta.db_table, sorted_by_index=True
+        )
+
+    def test_sale_items_use_index(self):
+        """Тест - активные элементы распродаж выбираются по индексу"""
+
+        queryset = self.get_view_queryset(SalesProductsApiView)
+        self.assertNoSequentialScan(queryset[:20], SaleItems._meta.db_table)
+
+    def test_user_orders_use_index(self):
+        """Тест - заказы пользователя выбираются и сортируются по индексу"""
+
+        queryset = Order.objects.filter(available=True).filter(user=self.user)
+        self.assertNoSequentialScan(
+            queryset, Order._meta.db_table, sorted_by_index=True
+        )
+
+    def test_user_orders_cursor_page_uses_index(self):
+        """Тест - страница истории заказов по курсору выбирается по индексу"""
+
+        last_order = Order.objects.filter(user=self.user).order_by("createdAt").first()
+        queryset = (
+            Order.objects.filter(available=True)
+            .filter(user=self.user)
+            .order_by("-createdAt", "-id")
+            .filter(
+                Q(createdAt__lt=last_order.createdAt)
+                | Q(createdAt=last_order.createdAt, id__lt=last_order.id)
+            )
+        )
+        self.assertNoSequentialScan(
+            queryset[:10], Order._meta.db_table, sorted_by_index=True
+        )
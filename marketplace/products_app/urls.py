@@ -4,6 +4,7 @@ from products_app.views import (
     LimitedProductsListAPIView,
     PopularProductsListAPIView,
     ProductDetailAPIView,
+    ProductFacetsAPIView,
     ProductReviewCreateAPIView,
     ProductsShortListAPIView,
     FavoriteCategoriesProducts,
@@ -19,6 +20,11 @@ urlpatterns = [
         ProductsShortListAPIView.as_view(),
         name="products_short_list",
     ),
+    path(
+        "catalog/facets",
+        ProductFacetsAPIView.as_view(),
+        name="products_facets",
+    ),
     path(
         "product/<int:pk>/reviews",
         ProductReviewCreateAPIView.as_view(),
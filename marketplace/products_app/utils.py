@@ -0,0 +1,353 @@
+import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Count,
+    DateField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import (
+    Cast,
+    Coalesce,
+    Floor,
+    Least,
+    Power,
+    TruncDate,
+)
+from django.utils import timezone
+
+from catalog_app.models import CategoryClosure
+from mainsite.cache_utils import invalidate_model_cache
+from mainsite.main_logger import logger
+from products_app.models import Product, ProductPopularity, ProductReview
+
+# Количество интервалов гистограммы цен в фасетах каталога
+PRICE_HISTOGRAM_BUCKETS = 10
+
+# Окна рейтинга популярных товаров в днях (None - за все время)
+POPULARITY_WINDOWS = {"7d": 7, "30d": 30, "all": None}
+# Допустимые периоды полураспада веса заказов в рейтинге популярности (в днях)
+POPULARITY_DECAYS = {"7": 7, "30": 30, "90": 90}
+
+
+def update_product_rating(product_id: int, rate_delta: int, count_delta: int) -> None:
+    """
+    Инкрементальное обновление рейтинга товара
+
+    * сумма оценок, количество отзывов и средний рейтинг обновляются
+      одним запросом UPDATE на стороне базы данных
+    """
+
+    rating_sum = F("rating_sum") + rate_delta
+    review_count = F("review_count") + count_delta
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=rating_sum,
+        review_count=review_count,
+        rating_avg=Product.get_rating_avg_expression(rating_sum, review_count),
+    )
+    logger.debug(
+        "Product %s rating updated: rate %+d, reviews %+d",
+        product_id,
+        rate_delta,
+        count_delta,
+    )
+
+
+def get_actual_rating_subqueries() -> tuple[Coalesce, Coalesce]:
+    """
+    Получение подзапросов фактической суммы оценок и количества отзывов товара,
+    рассчитанных по таблице отзывов
+    """
+
+    reviews = (
+        ProductReview.objects.filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+    )
+    rating_sum = Coalesce(
+        Subquery(reviews.annotate(total=Sum("rate")).values("total")),
+        Value(0),
+        output_field=IntegerField(),
+    )
+    review_count = Coalesce(
+        Subquery(reviews.annotate(total=Count("pk")).values("total")),
+        Value(0),
+        output_field=IntegerField(),
+    )
+    return rating_sum, review_count
+
+
+def recalculate_products_rating(product_ids: Iterable[int]) -> int:
+    """
+    Пересчет рейтинга товаров по таблице отзывов
+
+    * выполняется одним запросом UPDATE для всех переданных товаров
+    * возвращает количество обновленных товаров
+    """
+
+    rating_sum, review_count = get_actual_rating_subqueries()
+    updated = Product.objects.filter(pk__in=list(product_ids)).update(
+        rating_sum=rating_sum,
+        review_count=review_count,
+        rating_avg=Product.get_rating_avg_expression(rating_sum, review_count),
+    )
+    logger.debug("Rating recalculated for %s products", updated)
+    return updated
+
+
+def get_price_histogram(
+    products: QuerySet, min_price: Decimal | None, max_price: Decimal | None
+) -> list[dict]:
+    """
+    Гистограмма цен товаров
+
+    * диапазон цен делится на равные интервалы, количество товаров
+      в интервалах считается одним запросом с группировкой
+    """
+
+    if min_price is None or max_price is None:
+        return []
+
+    buckets_count = PRICE_HISTOGRAM_BUCKETS if max_price > min_price else 1
+    width = (max_price - min_price) / buckets_count or Decimal(1)
+    bucket = Least(
+        Cast(
+            Floor(
+                (Cast("price", FloatField()) - Value(float(min_price)))
+                / Value(float(width))
+            ),
+            IntegerField(),
+        ),
+        Value(buckets_count - 1),
+    )
+    counts = dict(
+        products.annotate(bucket=bucket)
+        .order_by()
+        .values("bucket")
+        .annotate(count=Count("pk"))
+        .values_list("bucket", "count")
+    )
+
+    cent = Decimal("0.01")
+    return [
+        {
+            "from": (min_price + width * number).quantize(cent, ROUND_HALF_UP),
+            "to": (
+                max_price
+                if number == buckets_count - 1
+                else min_price + width * (number + 1)
+            ).quantize(cent, ROUND_HALF_UP),
+            "count": counts.get(number, 0),
+        }
+        for number in range(buckets_count)
+    ]
+
+
+def get_products_facets(queryset: QuerySet, category_id: int | None = None) -> dict:
+    """
+    Фасеты каталога для отфильтрованного набора товаров
+
+    * количество товаров, диапазон цен и количество товаров с бесплатной
+      доставкой считаются одним агрегирующим запросом
+    * гистограмма цен, количество товаров по меткам и по подкатегориям
+      считаются отдельными запросами с группировкой
+    * подкатегории - прямые потомки категории 'category_id'
+      (или корневые категории), товары вложенных категорий учитываются
+    """
+
+    # Исходный запрос может содержать дубли строк и аннотации поиска
+    products = Product.objects.filter(pk__in=queryset.order_by().values("pk"))
+
+    summary = products.aggregate(
+        count=Count("pk"),
+        min_price=Min("price"),
+        max_price=Max("price"),
+        free_delivery=Count("pk", filter=Q(freeDelivery=True)),
+    )
+
+    tags = (
+        products.filter(tags__isnull=False)
+        .order_by("tags__name", "tags__id")
+        .values("tags__id", "tags__name")
+        .annotate(count=Count("pk", distinct=True))
+    )
+
+    subcategories = CategoryClosure.objects.filter(
+        descendant__products__in=products.values("pk")
+    )
+    if category_id is None:
+        subcategories = subcategories.filter(ancestor__parent__isnull=True)
+    else:
+        subcategories = subcategories.filter(ancestor__parent_id=category_id)
+    subcategories = (
+        subcategories.order_by("ancestor__title", "ancestor_id")
+        .values("ancestor_id", "ancestor__title")
+        .annotate(count=Count("descendant__products", distinct=True))
+    )
+
+    return {
+        "count": summary["count"],
+        "price": {
+            "min": summary["min_price"],
+            "max": summary["max_price"],
+            "histogram": get_price_histogram(
+                products, summary["min_price"], summary["max_price"]
+            ),
+        },
+        "freeDelivery": {
+            "true": summary["free_delivery"],
+            "false": summary["count"] - summary["free_delivery"],
+        },
+        "tags": [
+            {"id": tag["tags__id"], "name": tag["tags__name"], "count": tag["count"]}
+            for tag in tags
+        ],
+        "categories": [
+            {
+                "id": category["ancestor_id"],
+                "title": category["ancestor__title"],
+                "count": category["count"],
+            }
+            for category in subcategories
+        ],
+    }
+
+
+def update_product_popularity(product_id: int, day: datetime.date, delta: int) -> None:
+    """
+    Инкрементальное обновление количества заказов товара за день
+
+    * счетчик обновляется запросом UPDATE на стороне базы данных,
+      строка за день создается при первом заказе (уменьшение счетчика
+      не создает строк, например при каскадном удалении товара)
+    * UPDATE не вызывает сигналов, поэтому версия модели для кэша
+      ответов меняется явно
+    """
+
+    invalidate_model_cache(ProductPopularity)
+    rollup = ProductPopularity.objects.filter(product_id=product_id, day=day)
+    if rollup.update(orders_count=F("orders_count") + delta) or delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            ProductPopularity.objects.create(
+                product_id=product_id, day=day, orders_count=delta
+            )
+    except IntegrityError:
+        # Строку за этот день успел создать параллельный запрос
+        rollup.update(orders_count=F("orders_count") + delta)
+
+
+class DaysBefore(Func):
+    """Количество дней от даты 'expression' до даты 'day'"""
+
+    output_field = FloatField()
+
+    def __init__(self, expression, day: datetime.date):
+        super().__init__(Value(day, output_field=DateField()), expression)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # В PostgreSQL разность дат - целое количество дней
+        return super().as_sql(
+            compiler, connection, template="(%(expressions)s)", arg_joiner=" - "
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler,
+            connection,
+            template="(julianday(%(expressions)s))",
+            arg_joiner=") - julianday(",
+        )
+
+
+def get_popular_product_ids(
+    limit: int,
+    window_days: int | None = None,
+    decay_half_life: float | None = None,
+    today: datetime.date | None = None,
+) -> list[int]:
+    """
+    Получение id самых заказываемых доступных товаров
+
+    * 'window_days' ограничивает период последними днями (None - за все время)
+    * при 'decay_half_life' заказ учитывается с весом, который уменьшается
+      вдвое за каждые 'decay_half_life' дней; взвешенная сумма и сортировка
+      рассчитываются в базе данных
+    """
+
+    today = today or timezone.localdate()
+    rollups = ProductPopularity.objects.filter(
+        product__available=True, orders_count__gt=0
+    )
+    if window_days is not None:
+        rollups = rollups.filter(day__gt=today - datetime.timedelta(days=window_days))
+
+    if decay_half_life is None:
+        total = Sum("orders_count")
+    else:
+        total = Sum(
+            ExpressionWrapper(
+                F("orders_count")
+                * Power(
+                    Value(0.5),
+                    DaysBefore("day", today) / Value(float(decay_half_life)),
+                ),
+                output_field=FloatField(),
+            )
+        )
+    return list(
+        rollups.order_by()
+        .values("product")
+        .annotate(total=total)
+        .order_by("-total", "product")
+        .values_list("product", flat=True)[:limit]
+    )
+
+
+def rebuild_product_popularity() -> int:
+    """
+    Полный пересчет популярности товаров по таблице товаров в заказах
+
+    * возвращает количество созданных строк за день
+    """
+
+    from orders_app.models import OrderProduct
+
+    rows = (
+        OrderProduct.objects.filter(added_at__isnull=False)
+        .annotate(day=TruncDate("added_at"))
+        .order_by()
+        .values("product", "day")
+        .annotate(orders_count=Count("pk"))
+    )
+    with transaction.atomic():
+        ProductPopularity.objects.all().delete()
+        created = ProductPopularity.objects.bulk_create(
+            [
+                ProductPopularity(
+                    product_id=row["product"],
+                    day=row["day"],
+                    orders_count=row["orders_count"],
+                )
+                for row in rows.iterator()
+            ],
+            batch_size=1000,
+        )
+        invalidate_model_cache(ProductPopularity)
+    logger.debug("Popularity rebuilt: %s rows", len(created))
+    return len(created)
@@ -1,9 +1,9 @@
-import datetime
+from decimal import Decimal
 
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.db.models.aggregates import Count
+from django.db import transaction
 from django.db.utils import IntegrityError
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     OpenApiExample,
     OpenApiParameter,
@@ -11,41 +11,118 @@ from drf_spectacular.utils import (
     extend_schema,
 )
 from rest_framework import status
-from rest_framework import generics
+from rest_framework import generics, serializers
 from rest_framework.request import Request
 from rest_framework.response import Response
 
 from catalog_app.models import Category
+from mainsite.cache_utils import VersionedCacheMixin
 from mainsite.handle_errors import handle_serializer_not_valid
 from mainsite.main_logger import logger
-from products_app.filters import ProductFilter, ProductOrdering, ProductsFilterBackend
-from products_app.models import Product, ProductReview, SaleItems
-from products_app.pagination import ProductPagination, SalesProductPagination
+from mainsite.prefetch import SerializerPrefetchMixin
+from mainsite.values_serializer import ValuesSerializerMixin
+from products_app.banners import get_banners_data
+from products_app.filters import (
+    ProductFilter,
+    ProductOrdering,
+    ProductsFilterBackend,
+    normalize_query_params,
+)
+from products_app.models import (
+    Product,
+    ProductImage,
+    ProductPopularity,
+    ProductReview,
+    SaleItems,
+)
+from products_app.pagination import (
+    ProductCursorPagination,
+    ProductPagination,
+    SalesProductPagination,
+)
 from products_app.serializers import (
     ProductFullSerializer,
     ProductReviewSerializer,
     ProductShortSerializer,
     SaleItemsSerializer,
 )
+from products_app.utils import (
+    POPULARITY_DECAYS,
+    POPULARITY_WINDOWS,
+    get_popular_product_ids,
+    get_products_facets,
+)
+from tags_app.models import Tag
+
+# Модели, от которых зависят данные карточек товаров в списках
+PRODUCT_CARD_CACHE_MODELS = (Product, ProductImage, ProductReview, Tag, Category)
 
 
 @extend_schema(
     summary="Get catalog items",
     description="get catalog items",
     tags=["catalog"],
+    parameters=[
+        OpenApiParameter(
+            name="cursor",
+            type=str,
+            description="opaque cursor of the page, "
+            "pass an empty value to get the first page in cursor mode",
+        )
+    ],
 )
-class ProductsShortListAPIView(generics.ListAPIView):
+class ProductsShortListAPIView(
+    VersionedCacheMixin, ValuesSerializerMixin, generics.ListAPIView
+):
     """Представление для получения списка товаров"""
 
+    cache_models = PRODUCT_CARD_CACHE_MODELS
+
     queryset = Product.objects.all()
     serializer_class = ProductShortSerializer
     pagination_class = ProductPagination
+    cursor_pagination_class = ProductCursorPagination
     filter_backends = (
         ProductsFilterBackend,
         ProductOrdering,
     )
     filterset_class = ProductFilter
 
+    @property
+    def paginator(self):
+        """
+        Выбор пагинации товаров
+
+        * при наличии query-параметра 'cursor' (в том числе пустого для первой
+          страницы) используется пагинация по курсору без подсчета страниц
+        * в остальных случаях используется постраничная пагинация
+        """
+
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            cursor_param = self.cursor_pagination_class.cursor_query_param
+            if request is not None and cursor_param in request.query_params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_cache_key_params(self, request: Request) -> dict:
+        """
+        Параметры запроса для ключа кэша
+
+        * используются параметры, нормализованные так же, как для фильтрации
+        * пустой параметр 'cursor' отбрасывается при нормализации, но меняет
+          пагинацию, поэтому в ключ добавляется класс пагинации
+        """
+
+        query_params = normalize_query_params(request.query_params)
+        params = {
+            key: sorted(query_params.getlist(key)) for key in sorted(query_params)
+        }
+        params["paginator"] = type(self.paginator).__name__
+        return params
+
     def list(self, request: Request, *args, **kwargs) -> Response:
         """Получение списка товаров"""
 
@@ -58,17 +135,76 @@ class ProductsShortListAPIView(generics.ListAPIView):
             self.filter_queryset(self.get_queryset())
             .filter(tags__in=popular_tags_ids)
             .filter(available=True)
-            .select_related("category")
-            .prefetch_related("images", "tags", "reviews")
         )
+        return self.get_values_list_response(queryset)
+
+
+@extend_schema(
+    summary="Get catalog facets",
+    description="get facet counts of catalog items for the current filter state",
+    tags=["catalog"],
+    responses={
+        200: OpenApiResponse(
+            description="successful operation",
+            response=OpenApiTypes.OBJECT,
+            examples=[
+                OpenApiExample(
+                    "Example",
+                    value={
+                        "count": 2,
+                        "price": {
+                            "min": 100.0,
+                            "max": 300.0,
+                            "histogram": [
+                                {"from": 100.0, "to": 200.0, "count": 1},
+                                {"from": 200.0, "to": 300.0, "count": 1},
+                            ],
+                        },
+                        "freeDelivery": {"true": 1, "false": 1},
+                        "tags": [{"id": 1, "name": "Gaming", "count": 2}],
+                        "categories": [{"id": 2, "title": "Laptops", "count": 2}],
+                    },
+                    response_only=True,
+                ),
+            ],
+        )
+    },
+)
+class ProductFacetsAPIView(VersionedCacheMixin, generics.ListAPIView):
+    """
+    Представление для получения фасетов каталога
+
+    * товары фильтруются так же, как в списке товаров каталога
+    * фасеты считаются фиксированным числом запросов с группировкой
+    """
+
+    queryset = Product.objects.all()
+    pagination_class = None
+    filter_backends = (ProductsFilterBackend,)
+    filterset_class = ProductFilter
+    cache_models = PRODUCT_CARD_CACHE_MODELS
+
+    def get_cache_key_params(self, request: Request) -> dict:
+        """Параметры запроса для ключа кэша, нормализованные как для фильтрации"""
 
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        query_params = normalize_query_params(request.query_params)
+        return {key: sorted(query_params.getlist(key)) for key in sorted(query_params)}
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Получение фасетов каталога"""
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        popular_tags_ids = request.GET.getlist("tags[]")
+        if popular_tags_ids:
+            queryset = queryset.filter(tags__in=popular_tags_ids).filter(available=True)
+
+        # Значение категории уже проверено фильтром
+        category_id = normalize_query_params(request.query_params).get("category")
+        facets = get_products_facets(
+            queryset, int(Decimal(category_id)) if category_id else None
+        )
+        return Response(facets, status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -78,14 +214,10 @@ class ProductsShortListAPIView(generics.ListAPIView):
     parameters=[OpenApiParameter(name="id", location="path", type=int)],
     responses={200: ProductFullSerializer},
 )
-class ProductDetailAPIView(generics.RetrieveAPIView):
+class ProductDetailAPIView(SerializerPrefetchMixin, generics.RetrieveAPIView):
     """Представление для получения товара по его 'pk'"""
 
-    queryset = (
-        Product.objects.filter(available=True)
-        .select_related("category")
-        .prefetch_related("images", "tags", "specifications", "reviews")
-    )
+    queryset = Product.objects.filter(available=True)
     serializer_class = ProductFullSerializer
 
 
@@ -109,52 +241,100 @@ class FavoriteCategoriesProducts(generics.ListAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductShortSerializer
 
-    # @method_decorator(cache_page(timeout=60 * 2))
     def list(self, request, *args, **kwargs):
         """Получение списка товаров"""
 
-        # Ограничиваем количество отображаемых баннеров с товарами
-        view_limit = 3
-
-        products = []
-        favorite_categories = Category.objects.filter(favorite=True)[:view_limit]
-        for category in favorite_categories:
-            product = category.products.filter(available=True).first()
-            products.append(product)
-
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(get_banners_data(), status=status.HTTP_200_OK)
 
 
 @extend_schema(
     summary="Get catalog popular items",
     description="get catalog popular items",
     tags=["catalog"],
+    parameters=[
+        OpenApiParameter(
+            name="window",
+            type=str,
+            enum=list(POPULARITY_WINDOWS),
+            description="period of orders: last 7 days, 30 days or all time "
+            "(default: all)",
+        ),
+        OpenApiParameter(
+            name="decay",
+            type=str,
+            enum=list(POPULARITY_DECAYS),
+            description="half-life of an order weight in days (default: no decay)",
+        ),
+    ],
 )
-class PopularProductsListAPIView(generics.ListAPIView):
+class PopularProductsListAPIView(
+    VersionedCacheMixin, ValuesSerializerMixin, generics.ListAPIView
+):
     """
     Представление для получения списка топ-товаров
 
-    * Сортировка осуществляется по количеству покупок товаров
+    * Сортировка осуществляется по количеству заказов товаров
+      из таблицы популярности с дневными итогами
+    * Если заказанных товаров меньше лимита, список дополняется
+      другими доступными товарами
     """
 
     # Ограничиваем количество отображаемых товаров
     view_limit = 8
 
-    queryset = (
-        Product.objects.filter(available=True)
-        .annotate(product_in_order_count=Count("orderProduct"))
-        .order_by("-product_in_order_count")[:view_limit]
-        .select_related("category")
-        .prefetch_related("images", "tags", "reviews")
-    )
+    queryset = Product.objects.filter(available=True)
     serializer_class = ProductShortSerializer
+    cache_models = PRODUCT_CARD_CACHE_MODELS + (ProductPopularity,)
+
+    def get_popularity_params(self, request: Request) -> tuple[int | None, int | None]:
+        """Получение окна (в днях) и периода полураспада веса заказов"""
+
+        window = request.query_params.get("window", "all")
+        if window not in POPULARITY_WINDOWS:
+            raise serializers.ValidationError(
+                {"window": f"Must be one of: {', '.join(POPULARITY_WINDOWS)}"}
+            )
+
+        decay = request.query_params.get("decay")
+        if decay is not None and decay not in POPULARITY_DECAYS:
+            raise serializers.ValidationError(
+                {"decay": f"Must be one of: {', '.join(POPULARITY_DECAYS)}"}
+            )
+        return POPULARITY_WINDOWS[window], POPULARITY_DECAYS.get(decay)
+
+    def get_cache_key_params(self, request: Request) -> dict:
+        """Параметры рейтинга и текущая дата, от которой отсчитываются окна"""
+
+        window_days, decay = self.get_popularity_params(request)
+        return {
+            "window": window_days,
+            "decay": decay,
+            "today": timezone.localdate().isoformat(),
+        }
 
-    # @method_decorator(cache_page(timeout=60 * 2))
     def list(self, request, *args, **kwargs):
         """Получение списка топ-товаров"""
 
-        return super().list(request, *args, **kwargs)
+        window_days, decay = self.get_popularity_params(request)
+        product_ids = get_popular_product_ids(self.view_limit, window_days, decay)
+        if len(product_ids) < self.view_limit:
+            product_ids.extend(
+                self.get_queryset()
+                .exclude(pk__in=product_ids)
+                .values_list("pk", flat=True)[: self.view_limit - len(product_ids)]
+            )
+
+        values_serializer = self.get_values_serializer()
+        rows = {
+            row["id"]: row
+            for row in values_serializer.get_rows(
+                self.get_queryset().filter(pk__in=product_ids)
+            )
+        }
+        data = values_serializer.to_representation(
+            [rows[product_id] for product_id in product_ids if product_id in rows]
+        )
+        return Response(data, status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -162,21 +342,18 @@ class PopularProductsListAPIView(generics.ListAPIView):
     description="get catalog limited items",
     tags=["catalog"],
 )
-class LimitedProductsListAPIView(generics.ListAPIView):
+class LimitedProductsListAPIView(
+    VersionedCacheMixin, ValuesSerializerMixin, generics.ListAPIView
+):
     """Представление для получения списка товаров с ограниченным тиражом"""
 
     # Ограничиваем количество отображаемых товаров
     view_limit = 16
 
-    queryset = (
-        Product.objects.filter(available=True)
-        .filter(limited=True)[:view_limit]
-        .select_related("category")
-        .prefetch_related("images", "tags", "reviews")
-    )
+    queryset = Product.objects.filter(available=True).filter(limited=True)[:view_limit]
     serializer_class = ProductShortSerializer
+    cache_models = PRODUCT_CARD_CACHE_MODELS
 
-    # @method_decorator(cache_page(timeout=60 * 2))
     def list(self, request, *args, **kwargs):
         """Получение списка товаров"""
 
@@ -248,14 +425,16 @@ class ProductReviewCreateAPIView(generics.CreateAPIView):
             return handle_serializer_not_valid(serializer)
         logger.debug("Review data is valid")
 
-        # Проверяем уникальность создаваемого отзыва учитывая поля "product", "email"
+        # Проверяем уникальность создаваемого отзыва учитывая поля "product", "email".
+        # Отзыв и рейтинг товара сохраняются в одной транзакции
         try:
-            review: ProductReview = serializer.save(
-                product=product,
-                user=request.user,
-                author=request.user.get_full_name(),
-                email=request.user.email,
-            )
+            with transaction.atomic():
+                review: ProductReview = serializer.save(
+                    product=product,
+                    user=request.user,
+                    author=request.user.get_full_name(),
+                    email=request.user.email,
+                )
             logger.debug("Review by %s published", review.author)
         except IntegrityError as exc:
             logger.error("IntegrityError: %s", str(exc))
@@ -271,18 +450,18 @@ class ProductReviewCreateAPIView(generics.CreateAPIView):
     description="get sales items",
     tags=["catalog"],
 )
-class SalesProductsApiView(generics.ListAPIView):
-    """Представление для получения списка распродаж товаров"""
-
-    queryset = (
-        SaleItems.objects.filter(sale__is_active=True)
-        .filter(is_active=True)
-        .filter(dateFrom__lte=datetime.date.today())
-        .filter(dateTo__gte=datetime.date.today())
-        .prefetch_related(
-            "product",
-            "product__images",
-        )
-    )
+class SalesProductsApiView(SerializerPrefetchMixin, generics.ListAPIView):
+    """
+    Представление для получения списка распродаж товаров
+
+    * действующие элементы распродаж выбираются на дату запроса
+      по индексу дат, цена со скидкой рассчитывается в запросе
+    """
+
+    queryset = SaleItems.objects.all()
     serializer_class = SaleItemsSerializer
     pagination_class = SalesProductPagination
+
+    def get_queryset(self):
+        today = timezone.localdate()
+        return super().get_queryset().active(today).with_sale_price(today)
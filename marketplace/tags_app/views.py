@@ -3,7 +3,7 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from tags_app.models import Tag
 from tags_app.serializers import TagSerializer
-from catalog_app.models import Category
+from catalog_app.models import CategoryClosure
 
 
 @extend_schema(
@@ -24,11 +24,7 @@ class TagsListByCategoryApiView(ListAPIView):
         if not category_id:
             return Tag.objects.all()
 
-        category = Category.objects.get(pk=category_id)
-        if category.parent is not None:
-            queryset = Tag.objects.filter(products__category__id=category_id)
-        else:
-            queryset = Tag.objects.filter(
-                products__category__id__in=category.subcategories.all()
-            )
-        return queryset.prefetch_related("products__category").distinct()
+        queryset = Tag.objects.filter(
+            products__category__in=CategoryClosure.objects.descendant_ids(category_id)
+        )
+        return queryset.distinct()